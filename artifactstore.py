@@ -0,0 +1,256 @@
+"""
+Content-addressed cache for meeting artifacts.
+
+factory.py keys its work by committee/date folder, so the same video posted
+under two committees, or a renamed folder, used to be downloaded, transcribed
+and sent to the LLM all over again. This cache keys artifacts by what they were
+made from instead:
+
+  * audio by its bytes (SHA-256), reachable from its source URL and encoding profile;
+  * transcripts by the audio's hash plus the transcription recipe (backend, options, trimming, ...);
+  * structured LLM output by the transcript's hash plus the hints and model.
+
+Cached files live under wip/cache/objects and are hard-linked into each
+meeting folder that uses them (copied where links are not possible), so a
+reused artifact takes no extra disk space. Audio is evicted least recently used
+first once it exceeds ARTIFACT_CACHE_AUDIO_GB. Only the cache's own copy is
+always deleted. A meeting folder's link to evicted audio is deleted too only
+when the store's `in_use` hook (set by factory.py from its JobStore) says that
+meeting is finished, so audio still waiting to be transcribed is never taken
+away. Transcripts and LLM output are small and are kept.
+
+    python artifactstore.py --stats
+    python artifactstore.py --evict
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from jobstore import file_sha256
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wip", "cache")
+DEFAULT_MAX_AUDIO_GB = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key         TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_used   REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias       TEXT PRIMARY KEY,
+    key         TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    key         TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    PRIMARY KEY (key, path)
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries(kind, last_used);
+"""
+
+
+def recipe_key(*parts):
+    """Hash the inputs an artifact was derived from into a cache key."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(source, dest):
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    tmp_path = f"{dest}.link"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+class ArtifactStore:
+    """Thread-safe cache of audio, transcripts and LLM output under `root`."""
+
+    def __init__(self, root=DEFAULT_ROOT, max_audio_bytes=DEFAULT_MAX_AUDIO_GB * 1024 ** 3):
+        self.root = root
+        self.max_audio_bytes = max_audio_bytes
+        # in_use(path) -> bool: whether a meeting still needs its link at path; without it links are never deleted
+        self.in_use = None
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- Entries ---
+
+    def lookup(self, key):
+        """Path of the cached object for key, or None (an object missing from disk is forgotten)."""
+        rows = self._execute("SELECT path, size FROM entries WHERE key = ?", (key,))
+        if not rows:
+            return None
+        path = rows[0]["path"]
+        if not os.path.exists(path) or os.path.getsize(path) != rows[0]["size"]:
+            self._forget(key)
+            return None
+        return path
+
+    def fetch(self, key, dest):
+        """Link the object for key to dest. Returns True on a hit."""
+        path = self.lookup(key)
+        if path is None:
+            return False
+        if not (os.path.exists(dest) and os.path.samefile(path, dest)):
+            _link_or_copy(path, dest)
+        self._execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self._execute("INSERT OR IGNORE INTO refs (key, path) VALUES (?, ?)", (key, os.path.abspath(dest)))
+        return True
+
+    def put(self, kind, key, source):
+        """Add the file at source to the cache under key (linked, not copied, where possible)."""
+        if self.lookup(key):
+            self._execute("INSERT OR IGNORE INTO refs (key, path) VALUES (?, ?)", (key, os.path.abspath(source)))
+            return key
+        ext = os.path.splitext(source)[1]
+        path = os.path.join(self.root, "objects", kind, key[:2], f"{key}{ext}")
+        _link_or_copy(source, path)
+        now = time.time()
+        self._execute(
+            """
+            INSERT OR REPLACE INTO entries (key, kind, path, size, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (key, kind, path, os.path.getsize(path), now, now),
+        )
+        self._execute("INSERT OR IGNORE INTO refs (key, path) VALUES (?, ?)", (key, os.path.abspath(source)))
+        return key
+
+    def content_key(self, path):
+        """
+        SHA-256 of the file at path, taken from the index when path is a link to
+        cached audio (the one kind keyed by its own content), so a recording is
+        not re-hashed at every stage.
+        """
+        rows = self._execute(
+            "SELECT r.key FROM refs r JOIN entries e ON e.key = r.key WHERE r.path = ? AND e.kind = 'audio'",
+            (os.path.abspath(path),),
+        )
+        for row in rows:
+            cached = self.lookup(row["key"])
+            if cached and os.path.samefile(cached, path):
+                return row["key"]
+        return file_sha256(path)
+
+    def _forget(self, key):
+        self._execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._execute("DELETE FROM refs WHERE key = ?", (key,))
+        self._execute("DELETE FROM aliases WHERE key = ?", (key,))
+
+    # --- Audio ---
+
+    @staticmethod
+    def _source_alias(url, profile):
+        return "source:" + recipe_key(url, profile)
+
+    def fetch_audio(self, url, profile, dest):
+        """Link previously downloaded audio of url (in profile's encoding) to dest. Returns True on a hit."""
+        rows = self._execute("SELECT key FROM aliases WHERE alias = ?", (self._source_alias(url, profile),))
+        return bool(rows) and self.fetch(rows[0]["key"], dest)
+
+    def store_audio(self, url, profile, path):
+        """Cache downloaded audio by its content, reachable from url, and evict old audio if over budget."""
+        key = self.content_key(path)
+        self.put("audio", key, path)
+        self._execute(
+            "INSERT OR REPLACE INTO aliases (alias, key) VALUES (?, ?)", (self._source_alias(url, profile), key)
+        )
+        self.evict()
+        return key
+
+    def evict(self):
+        """
+        Delete least recently used audio until the total fits max_audio_bytes.
+        Returns the bytes of cached audio dropped. Meeting folders' links are
+        only deleted for meetings `in_use` reports as no longer needing them.
+        """
+        rows = self._execute("SELECT key, path, size FROM entries WHERE kind = 'audio' ORDER BY last_used")
+        total = sum(row["size"] for row in rows)
+        freed = 0
+        # The most recent recording is always kept, even if it alone exceeds the budget
+        for row in rows[:-1]:
+            if total - freed <= self.max_audio_bytes:
+                break
+            refs = self._execute("SELECT path FROM refs WHERE key = ?", (row["key"],))
+            for ref in refs:
+                if self.in_use is None or self.in_use(ref["path"]):
+                    continue
+                # Only links to this object; a meeting may since have other audio under the same name
+                if os.path.exists(ref["path"]) and os.path.exists(row["path"]) and os.path.samefile(ref["path"], row["path"]):
+                    os.remove(ref["path"])
+            if os.path.exists(row["path"]):
+                os.remove(row["path"])
+            self._forget(row["key"])
+            freed += row["size"]
+        return freed
+
+    # --- Reporting ---
+
+    def stats(self):
+        rows = self._execute(
+            "SELECT kind, COUNT(*) AS entries, SUM(size) AS bytes, SUM(hits) AS hits FROM entries GROUP BY kind"
+        )
+        return {
+            row["kind"]: {"entries": row["entries"], "mb": round((row["bytes"] or 0) / 1e6, 1), "hits": row["hits"]}
+            for row in rows
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide cache (root from ARTIFACT_CACHE_DIR, else wip/cache)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            max_gb = float(os.environ.get("ARTIFACT_CACHE_AUDIO_GB") or DEFAULT_MAX_AUDIO_GB)
+            _store = ArtifactStore(os.environ.get("ARTIFACT_CACHE_DIR") or DEFAULT_ROOT, int(max_gb * 1024 ** 3))
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the content-addressed artifact cache.")
+    parser.add_argument("--stats", action="store_true", help="Show entries, size and hits per kind.")
+    parser.add_argument("--evict", action="store_true", help="Evict audio down to ARTIFACT_CACHE_AUDIO_GB now.")
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.evict:
+        print(f"Freed {store.evict() / 1e6:.1f} MB of audio.")
+    if args.stats or not args.evict:
+        for kind, stats in store.stats().items():
+            print(f"{kind:<12} {stats['entries']:>6} entries {stats['mb']:>10} MB {stats['hits'] or 0:>6} hits")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the audio encoding profiles in videotools.AUDIO_PROFILES.
+
+Each profile encodes the same source (a local file or a stream URL), and the
+script reports the file size, the encode time and the estimated upload time at
+a given uplink speed, all relative to the "archive" profile. With --transcribe
+each result is also sent to Deepgram and the round trip is timed (this is
+billed, so it is opt-in).
+
+    python audiobenchmark.py --input meeting.mp4 --seconds 600 --uplink-mbps 20
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from videotools import AUDIO_PROFILES, DEFAULT_PROFILE, ffmpeg_audio_command
+
+
+def encode(source, output, profile, seconds=None):
+    """Encode `source` with `profile` into `output`; returns the elapsed seconds."""
+    cmd = ffmpeg_audio_command(source, output, profile)
+    if seconds:
+        cmd = cmd[:-1] + ['-t', str(seconds), cmd[-1]]
+    started = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def benchmark(source, profiles, uplink_mbps, seconds=None, transcribe=False):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for profile in profiles:
+            output = os.path.join(tmp_dir, f"{profile}.{AUDIO_PROFILES[profile]['ext']}")
+            encode_seconds = encode(source, output, profile, seconds)
+            size = os.path.getsize(output)
+            result = {
+                'profile': profile,
+                'bytes': size,
+                'encode_seconds': encode_seconds,
+                'upload_seconds': size * 8 / (uplink_mbps * 1_000_000),
+            }
+            if transcribe:
+                from transcription import transcribe_audio
+                started = time.perf_counter()
+                transcribe_audio(output)
+                result['transcribe_seconds'] = time.perf_counter() - started
+            results.append(result)
+    return results
+
+
+def print_results(results):
+    baseline = next((r for r in results if r['profile'] == DEFAULT_PROFILE), results[0])
+    header = f"{'profile':<10} {'size MB':>9} {'vs ' + baseline['profile']:>12} {'encode s':>9} {'upload s':>9}"
+    if any('transcribe_seconds' in r for r in results):
+        header += f" {'deepgram s':>11}"
+    print(header)
+    for r in results:
+        line = (
+            f"{r['profile']:<10} {r['bytes'] / 1_000_000:>9.2f} {r['bytes'] / baseline['bytes']:>11.1%} "
+            f"{r['encode_seconds']:>9.1f} {r['upload_seconds']:>9.1f}"
+        )
+        if 'transcribe_seconds' in r:
+            line += f" {r['transcribe_seconds']:>11.1f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark audio encoding profiles for ASR uploads.")
+    parser.add_argument('--input', required=True, help="Local media file or stream URL to encode.")
+    parser.add_argument('--profiles', nargs='+', choices=sorted(AUDIO_PROFILES), default=list(AUDIO_PROFILES), help="Profiles to compare.")
+    parser.add_argument('--seconds', type=float, help="Only encode the first N seconds of the input.")
+    parser.add_argument('--uplink-mbps', type=float, default=20.0, help="Upload bandwidth used to estimate transfer time.")
+    parser.add_argument('--transcribe', action='store_true', help="Also time a Deepgram transcription of each encoding (billed).")
+    args = parser.parse_args()
+
+    print_results(benchmark(args.input, args.profiles, args.uplink_mbps, args.seconds, args.transcribe))
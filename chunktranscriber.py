@@ -0,0 +1,322 @@
+"""
+Chunked, parallel transcription for long meetings.
+
+A multi-hour recording sent as one request makes one slow and fragile call:
+if it times out near the end, all of it is lost. Here the audio is split into
+overlapping chunks that are transcribed concurrently, and the results are
+stitched back into a single Deepgram-shaped result (words, utterances,
+paragraphs and sentences), so meetingreporter consumes it unchanged.
+
+Stitching works on the overlap between neighbouring chunks:
+  * the cut is placed at a sentence start both chunks agree on, near the
+    middle of the overlap, and each chunk contributes only its side of the cut;
+  * Deepgram numbers speakers per request, so each chunk's speaker IDs are
+    mapped to the running ones by matching the words both chunks heard in the
+    overlap. Speakers that never talk in an overlap get new IDs.
+
+    result_json = transcribe_chunked("audio.mp3", chunk_seconds=1200, overlap_seconds=30)
+
+`transcribe` can be any function with transcribe_audio's signature (path in,
+Deepgram JSON string out), e.g. a stand-in for testing.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import shutil
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from transcription import transcribe_audio
+from videotools import probe_duration
+
+DEFAULT_CHUNK_SECONDS = 20 * 60
+DEFAULT_OVERLAP_SECONDS = 30
+DEFAULT_WORKERS = 4
+SENTENCE_MATCH_SECONDS = 0.5  # sentence starts this close in both chunks count as the same
+WORD_MATCH_SECONDS = 0.3      # same for words when matching speakers
+PACKET_SEARCH_SECONDS = 5     # how far before a cut to look for the packet it falls in
+
+logger = logging.getLogger(__name__)
+
+
+def packet_start(audio_path, seconds):
+    """
+    Time of the last audio packet of audio_path starting at or before `seconds`,
+    via ffprobe; None if it can't be determined.
+    """
+    if seconds <= 0:
+        return 0.0
+    if shutil.which('ffprobe') is None:
+        return None
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+         '-read_intervals', f"{max(0.0, seconds - PACKET_SEARCH_SECONDS):.3f}%{seconds + 1:.3f}",
+         '-show_entries', 'packet=pts_time', '-of', 'csv=p=0', audio_path],
+        capture_output=True, text=True,
+    )
+    starts = []
+    for line in result.stdout.split():
+        try:
+            starts.append(float(line.strip(',')))
+        except ValueError:
+            continue
+    earlier = [start for start in starts if start <= seconds + 1e-6]
+    return max(earlier) if earlier else None
+
+
+def split_audio(audio_path, work_dir, total_duration, chunk_seconds, overlap_seconds):
+    """Cut audio_path into overlapping chunks; returns [(path, offset_seconds, length_seconds), ...]."""
+    os.makedirs(work_dir, exist_ok=True)
+    ext = audio_path.rsplit('.', 1)[-1]
+    chunks = []
+    offset = 0.0
+    index = 0
+    while offset < total_duration:
+        # A stream copy can only start on a packet (MP3 frame, Ogg page), so cut
+        # exactly at the packet ffprobe reports and use its time as the offset;
+        # cutting at `offset` itself would shift every word in the chunk.
+        start = packet_start(audio_path, offset)
+        if start is None:
+            start = offset
+        length = min(offset + chunk_seconds + overlap_seconds, total_duration) - start
+        path = os.path.join(work_dir, f"chunk_{index:03d}.{ext}")
+        cmd = [
+            'ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+            '-ss', f"{start:.6f}", '-t', f"{length:.3f}", '-i', audio_path,
+            '-c', 'copy', path,
+        ]
+        subprocess.run(cmd, check=True, capture_output=True)
+        chunks.append((path, start, length))
+        offset += chunk_seconds
+        index += 1
+    return chunks
+
+
+def _shift_times(data, offset):
+    """Add offset to every numeric "start" / "end" in a Deepgram result, in place."""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in ('start', 'end') and isinstance(value, (int, float)) and not isinstance(value, bool):
+                data[key] = round(value + offset, 3)
+            else:
+                _shift_times(value, offset)
+    elif isinstance(data, list):
+        for item in data:
+            _shift_times(item, offset)
+
+
+def _remap_speakers(data, mapping):
+    """Replace every "speaker" ID using mapping, in place."""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == 'speaker' and isinstance(value, int) and not isinstance(value, bool):
+                data[key] = mapping.get(value, value)
+            else:
+                _remap_speakers(value, mapping)
+    elif isinstance(data, list):
+        for item in data:
+            _remap_speakers(item, mapping)
+
+
+def _alternative(result):
+    return result['results']['channels'][0]['alternatives'][0]
+
+
+def _paragraphs(result):
+    return _alternative(result).get('paragraphs', {}).get('paragraphs', [])
+
+
+def _sentence_starts(result, lo, hi):
+    return [
+        sentence['start']
+        for paragraph in _paragraphs(result)
+        for sentence in paragraph.get('sentences', [])
+        if lo <= sentence['start'] <= hi
+    ]
+
+
+def choose_cut(previous, current, lo, hi):
+    """
+    Pick the time where `previous` hands over to `current` within their overlap
+    [lo, hi]: a sentence start both agree on, closest to the middle of the overlap.
+    """
+    middle = (lo + hi) / 2
+    previous_starts = _sentence_starts(previous, lo, hi)
+    current_starts = _sentence_starts(current, lo, hi)
+    agreed = [
+        start for start in current_starts
+        if any(abs(start - other) <= SENTENCE_MATCH_SECONDS for other in previous_starts)
+    ]
+    candidates = agreed or current_starts
+    if not candidates:
+        return middle
+    return min(candidates, key=lambda start: abs(start - middle))
+
+
+def _word_text(word):
+    return (word.get('word') or '').lower()
+
+
+def match_speakers(previous, current, lo, hi, next_speaker):
+    """
+    Map current's speaker IDs onto previous's (already global) ones, using the
+    words both heard in the overlap [lo, hi]. Returns (mapping, next_speaker).
+    """
+    previous_words = [w for w in _alternative(previous).get('words', []) if lo <= w['start'] <= hi]
+    votes = Counter()
+    for word in _alternative(current).get('words', []):
+        if not lo <= word['start'] <= hi or word.get('speaker') is None:
+            continue
+        for other in previous_words:
+            if (abs(other['start'] - word['start']) <= WORD_MATCH_SECONDS
+                    and _word_text(other) == _word_text(word) and other.get('speaker') is not None):
+                votes[(word['speaker'], other['speaker'])] += 1
+                break
+
+    mapping = {}
+    taken = set()
+    for (local, global_id), _ in votes.most_common():
+        if local not in mapping and global_id not in taken:
+            mapping[local] = global_id
+            taken.add(global_id)
+    local_speakers = {w['speaker'] for w in _alternative(current).get('words', []) if w.get('speaker') is not None}
+    for local in sorted(local_speakers - set(mapping)):
+        mapping[local] = next_speaker
+        next_speaker += 1
+    return mapping, next_speaker
+
+
+def _keep_paragraphs(result, start, end):
+    """The paragraphs of result cut down to sentences starting in [start, end)."""
+    kept = []
+    for paragraph in _paragraphs(result):
+        sentences = [s for s in paragraph.get('sentences', []) if start <= s['start'] < end]
+        if not sentences:
+            continue
+        paragraph = dict(paragraph, sentences=sentences)
+        paragraph['start'] = sentences[0]['start']
+        paragraph['end'] = sentences[-1]['end']
+        paragraph['num_words'] = sum(len(s.get('text', '').split()) for s in sentences)
+        kept.append(paragraph)
+    return kept
+
+
+def stitch_results(results, total_duration):
+    """
+    Merge per-chunk Deepgram results, already shifted to meeting time and paired
+    with their (offset, length), into one Deepgram-shaped result.
+    """
+    words, utterances, paragraphs = [], [], []
+    confidences = []
+    next_speaker = 0
+    previous = None
+    start = float('-inf')
+
+    for index, (result, offset, length) in enumerate(results):
+        if previous is None:
+            speakers = {w.get('speaker') for w in _alternative(result).get('words', []) if w.get('speaker') is not None}
+            mapping = {s: s for s in speakers}
+            next_speaker = max(speakers, default=-1) + 1
+        else:
+            prev_offset, prev_length = results[index - 1][1], results[index - 1][2]
+            lo, hi = offset, prev_offset + prev_length
+            mapping, next_speaker = match_speakers(previous, result, lo, hi, next_speaker)
+        _remap_speakers(result, mapping)
+
+        if index + 1 < len(results):
+            next_result, next_offset, _ = results[index + 1]
+            end = choose_cut(result, next_result, next_offset, offset + length)
+        else:
+            end = float('inf')
+
+        alternative = _alternative(result)
+        words.extend(w for w in alternative.get('words', []) if start <= w['start'] < end)
+        utterances.extend(u for u in result['results'].get('utterances', []) if start <= u['start'] < end)
+        for paragraph in _keep_paragraphs(result, start, end):
+            if paragraphs and paragraphs[-1].get('speaker') == paragraph.get('speaker') and not paragraphs[-1]['end'] < start - 2:
+                # A paragraph split by the cut: join the halves back together
+                paragraphs[-1]['sentences'].extend(paragraph['sentences'])
+                paragraphs[-1]['end'] = paragraph['end']
+                paragraphs[-1]['num_words'] += paragraph['num_words']
+            else:
+                paragraphs.append(paragraph)
+        if 'confidence' in alternative:
+            confidences.append(alternative['confidence'])
+        previous = result
+        start = end
+
+    paragraph_text = "".join(
+        f"\nSpeaker {p.get('speaker', 0)}: " + " ".join(s.get('text', '') for s in p['sentences']) + "\n"
+        for p in paragraphs
+    )
+    metadata = copy.deepcopy(results[0][0].get('metadata', {}))
+    metadata['duration'] = total_duration
+    return {
+        'metadata': metadata,
+        'results': {
+            'channels': [{
+                'alternatives': [{
+                    'transcript': " ".join(w.get('punctuated_word') or w.get('word', '') for w in words),
+                    'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+                    'words': words,
+                    'paragraphs': {'transcript': paragraph_text, 'paragraphs': paragraphs},
+                }],
+            }],
+            'utterances': utterances,
+        },
+    }
+
+
+def transcribe_chunked(
+    audio_path,
+    output_file=None,
+    chunk_seconds=DEFAULT_CHUNK_SECONDS,
+    overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+    workers=DEFAULT_WORKERS,
+    transcribe=transcribe_audio,
+):
+    """
+    Transcribe audio_path as overlapping chunks in parallel and return the
+    stitched result as JSON, like transcribe_audio. Audio no longer than one
+    chunk (or of unknown length) is sent in a single request.
+    """
+    total_duration = probe_duration(audio_path)
+    if not total_duration or total_duration <= chunk_seconds + overlap_seconds:
+        return transcribe(audio_path, output_file)
+
+    work_dir = f"{audio_path.rsplit('.', 1)[0]}.chunks"
+    try:
+        chunks = split_audio(audio_path, work_dir, total_duration, chunk_seconds, overlap_seconds)
+        logger.info(f"Transcribing {len(chunks)} chunks of {audio_path}, {workers} at a time")
+
+        def run(chunk):
+            path, offset, length = chunk
+            result = json.loads(transcribe(path))
+            _shift_times(result, offset)
+            return result, offset, length
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(run, chunks))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    merged = json.dumps(stitch_results(results, total_duration))
+    if output_file:
+        with open(output_file, 'w') as f:
+            f.write(merged)
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe a long recording as parallel overlapping chunks.")
+    parser.add_argument("--audio", required=True, help="Path to input audio file.")
+    parser.add_argument("--output", required=True, help="Path to write the stitched Deepgram JSON.")
+    parser.add_argument("--chunk-minutes", type=float, default=DEFAULT_CHUNK_SECONDS / 60, help="Length of each chunk.")
+    parser.add_argument("--overlap", type=float, default=DEFAULT_OVERLAP_SECONDS, help="Seconds shared by neighbouring chunks.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Chunks transcribed at once.")
+    args = parser.parse_args()
+
+    transcribe_chunked(args.audio, args.output, args.chunk_minutes * 60, args.overlap, args.workers)
@@ -0,0 +1,311 @@
+"""
+Compact columnar form of a Deepgram transcript.
+
+deepgram_raw.json holds every word of a meeting with its timing, confidence and
+speaker: tens of MB for a six-hour meeting. The structure and render stages
+only need the paragraphs and sentences, yet they parsed the whole file each
+time a page was rebuilt. This module converts the raw result once into a
+transcript.npz of plain arrays:
+
+  * paragraphs: speaker, start, end, word count and the index of their first sentence;
+  * sentences: start, end and text (one UTF-8 blob plus offsets).
+
+Words go in a separate transcript.words.npz that is only read when asked for.
+Each file records the size and modification time of the raw JSON it came from,
+and ensure() converts again if the raw file has changed since, e.g. after a
+re-transcription. The raw file is read incrementally (ijson) for that, as it
+is by read_paragraphs() for callers that want paragraphs straight from it.
+
+    transcript = ensure("deepgram_raw.json", "transcript.npz")
+    transcript.paragraphs()      # Deepgram-shaped paragraph dicts, as meetingreporter expects
+    transcript.words["start"]    # loaded on first use
+    read_paragraphs("deepgram_raw.json")  # only the paragraphs, without building words or utterances
+
+    python compacttranscript.py deepgram_raw.json [transcript.npz]
+"""
+import os
+import sys
+
+import ijson
+import numpy as np
+
+FORMAT_VERSION = 1
+COMPACT_FILE = "transcript.npz"
+NO_SPEAKER = -1
+
+
+def words_path(compact_path):
+    base, _ = os.path.splitext(compact_path)
+    return f"{base}.words.npz"
+
+
+def _pack_text(texts):
+    """Strings as one UTF-8 byte array plus offsets (text i is blob[offsets[i]:offsets[i + 1]])."""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_text(blob, offsets):
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _source_stamp(raw_path):
+    if not raw_path or not os.path.exists(raw_path):
+        return np.array([0, 0], dtype=np.int64)
+    stat = os.stat(raw_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def _save(path, arrays):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _speaker(value):
+    return NO_SPEAKER if value is None else int(value)
+
+
+WORD_CHUNK = 16384  # words gathered in lists before they are packed into arrays
+
+
+class _WordColumns:
+    """Word fields collected column by column, packed into arrays every WORD_CHUNK words."""
+
+    NUMERIC = {"start": np.float64, "end": np.float64, "confidence": np.float32, "speaker": np.int32}
+    TEXT = ("word", "punctuated_word")
+
+    def __init__(self):
+        self._pending = {name: [] for name in (*self.NUMERIC, *self.TEXT)}
+        self._chunks = {name: [] for name in self._pending}
+
+    def add(self, w):
+        pending = self._pending
+        pending["start"].append(w.get("start", 0))
+        pending["end"].append(w.get("end", 0))
+        pending["confidence"].append(w.get("confidence", 0))
+        pending["speaker"].append(_speaker(w.get("speaker")))
+        pending["word"].append(w.get("word", ""))
+        pending["punctuated_word"].append(w.get("punctuated_word", w.get("word", "")))
+        if len(pending["start"]) >= WORD_CHUNK:
+            self._pack()
+
+    def _pack(self):
+        for name, dtype in self.NUMERIC.items():
+            self._chunks[name].append(np.array(self._pending[name], dtype=dtype))
+        for name in self.TEXT:
+            blob, offsets = _pack_text(self._pending[name])
+            self._chunks[name].append((blob, offsets))
+        self._pending = {name: [] for name in self._pending}
+
+    def arrays(self):
+        """{name: array} for the numeric fields and {name: (blob, offsets)} for the text ones."""
+        self._pack()
+        columns = {name: np.concatenate(self._chunks[name]) for name in self.NUMERIC}
+        for name in self.TEXT:
+            blobs = [blob for blob, _ in self._chunks[name]]
+            offsets, base = [np.zeros(1, dtype=np.int64)], 0
+            for blob, chunk_offsets in self._chunks[name]:
+                offsets.append(chunk_offsets[1:] + base)
+                base += len(blob)
+            columns[name] = (np.concatenate(blobs), np.concatenate(offsets))
+        return columns
+
+
+def _write(compact_path, paragraphs, words, duration, raw_path):
+    sentences = [s for p in paragraphs for s in p.get("sentences", [])]
+    stamp = _source_stamp(raw_path)
+
+    first_sentence = np.zeros(len(paragraphs) + 1, dtype=np.int64)
+    np.cumsum([len(p.get("sentences", [])) for p in paragraphs], out=first_sentence[1:])
+    sentence_text, sentence_offsets = _pack_text([s.get("text", "") for s in sentences])
+    _save(compact_path, {
+        "version": np.array(FORMAT_VERSION),
+        "source": stamp,
+        "duration": np.array(float(duration or 0.0)),
+        "paragraph_speaker": np.array([_speaker(p.get("speaker")) for p in paragraphs], dtype=np.int32),
+        "paragraph_start": np.array([p.get("start", 0) for p in paragraphs], dtype=np.float64),
+        "paragraph_end": np.array([p.get("end", 0) for p in paragraphs], dtype=np.float64),
+        "paragraph_num_words": np.array([p.get("num_words", 0) for p in paragraphs], dtype=np.int32),
+        "paragraph_first_sentence": first_sentence,
+        "sentence_start": np.array([s.get("start", 0) for s in sentences], dtype=np.float64),
+        "sentence_end": np.array([s.get("end", 0) for s in sentences], dtype=np.float64),
+        "sentence_text": sentence_text,
+        "sentence_offsets": sentence_offsets,
+    })
+
+    columns = words.arrays()
+    word_text, word_offsets = columns["word"]
+    punctuated, punctuated_offsets = columns["punctuated_word"]
+    _save(words_path(compact_path), {
+        "source": stamp,
+        "start": columns["start"],
+        "end": columns["end"],
+        "confidence": columns["confidence"],
+        "speaker": columns["speaker"],
+        "word_text": word_text,
+        "word_offsets": word_offsets,
+        "punctuated_text": punctuated,
+        "punctuated_offsets": punctuated_offsets,
+    })
+    return load(compact_path)
+
+
+def convert(result, compact_path, raw_path=None):
+    """Write the compact form of a Deepgram result (dict) and return it loaded."""
+    results = result.get("results", result)
+    alternative = results.get("channels", [{}])[0].get("alternatives", [{}])[0]
+    words = _WordColumns()
+    for w in alternative.get("words", []):
+        words.add(w)
+    duration = (result.get("metadata") or {}).get("duration")
+    return _write(compact_path, alternative.get("paragraphs", {}).get("paragraphs", []), words, duration, raw_path)
+
+
+# --- Streaming reads ---
+# A raw result is read event by event (ijson), building only the paragraphs
+# and, when converting, one word at a time into packed array chunks, so no
+# Python object per word outlives its chunk.
+
+_ALTERNATIVE = "channels.item.alternatives.item"
+_PARAGRAPH = f"{_ALTERNATIVE}.paragraphs.paragraphs.item"
+_WORD = f"{_ALTERNATIVE}.words.item"
+
+
+def _scan(raw_path):
+    """(paragraphs, word columns, duration) of channel 0, alternative 0 of the result at raw_path."""
+    paragraphs, words, duration = [], _WordColumns(), 0.0
+    channel = alternative = -1
+    builder = target = None
+    with open(raw_path, "rb") as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix.startswith("results."):
+                prefix = prefix[len("results."):]
+            if builder is not None:
+                builder.event(event, value)
+                if event == "end_map" and prefix == target:
+                    if target == _PARAGRAPH:
+                        paragraphs.append(builder.value)
+                    else:
+                        words.add(builder.value)
+                    builder = None
+            elif event == "start_map":
+                if prefix == "channels.item":
+                    channel, alternative = channel + 1, -1
+                elif prefix == _ALTERNATIVE:
+                    alternative += 1
+                elif channel == 0 and alternative == 0 and prefix in (_PARAGRAPH, _WORD):
+                    builder, target = ijson.ObjectBuilder(), prefix
+                    builder.event(event, value)
+            elif event == "end_map" and prefix == _ALTERNATIVE and channel == 0 and alternative == 0:
+                break  # the rest (other channels, utterances) is not needed
+            elif prefix == "metadata.duration" and event == "number":
+                duration = value
+    return paragraphs, words, duration
+
+
+def read_paragraphs(raw_path):
+    """The paragraphs of the Deepgram result at raw_path, without loading the rest of it."""
+    # The first paragraphs object is channel 0, alternative 0; ijson builds it
+    # in C and reading stops there
+    for root in ("results.", ""):
+        with open(raw_path, "rb") as f:
+            found = next(ijson.items(f, f"{root}{_ALTERNATIVE}.paragraphs", use_float=True), None)
+        if found is not None:
+            return found.get("paragraphs", [])
+    return []
+
+
+def convert_file(raw_path, compact_path):
+    """convert() for a result on disk, read incrementally."""
+    paragraphs, words, duration = _scan(raw_path)
+    return _write(compact_path, paragraphs, words, duration, raw_path)
+
+
+class CompactTranscript:
+    """A loaded transcript.npz; words are read from transcript.words.npz on first access."""
+
+    def __init__(self, compact_path):
+        self.path = compact_path
+        with np.load(compact_path, allow_pickle=False) as data:
+            self.arrays = {name: data[name] for name in data.files}
+        self.duration = float(self.arrays["duration"])
+        self._words = None
+
+    @property
+    def source(self):
+        return tuple(int(v) for v in self.arrays["source"])
+
+    def sentence_texts(self):
+        return _unpack_text(self.arrays["sentence_text"], self.arrays["sentence_offsets"])
+
+    def paragraphs(self):
+        """The paragraphs in Deepgram's shape: speaker, start, end, num_words and sentences."""
+        a = self.arrays
+        texts = self.sentence_texts()
+        starts, ends = a["sentence_start"].tolist(), a["sentence_end"].tolist()
+        first = a["paragraph_first_sentence"].tolist()
+        paragraphs = []
+        for i, speaker in enumerate(a["paragraph_speaker"].tolist()):
+            paragraph = {
+                "start": float(a["paragraph_start"][i]),
+                "end": float(a["paragraph_end"][i]),
+                "num_words": int(a["paragraph_num_words"][i]),
+                "sentences": [
+                    {"text": texts[j], "start": starts[j], "end": ends[j]} for j in range(first[i], first[i + 1])
+                ],
+            }
+            if speaker != NO_SPEAKER:
+                paragraph["speaker"] = speaker
+            paragraphs.append(paragraph)
+        return paragraphs
+
+    @property
+    def words(self):
+        """Word arrays: start, end, confidence, speaker, and the word / punctuated_word lists."""
+        if self._words is None:
+            with np.load(words_path(self.path), allow_pickle=False) as data:
+                words = {name: data[name] for name in ("start", "end", "confidence", "speaker")}
+                words["word"] = _unpack_text(data["word_text"], data["word_offsets"])
+                words["punctuated_word"] = _unpack_text(data["punctuated_text"], data["punctuated_offsets"])
+            self._words = words
+        return self._words
+
+
+def load(compact_path):
+    return CompactTranscript(compact_path)
+
+
+def is_current(raw_path, compact_path):
+    """Whether compact_path exists, is this version, and was made from raw_path as it is now."""
+    if not os.path.exists(compact_path) or not os.path.exists(words_path(compact_path)):
+        return False
+    try:
+        with np.load(compact_path, allow_pickle=False) as data:
+            version, source = int(data["version"]), data["source"]
+    except (OSError, ValueError, KeyError):
+        return False
+    return version == FORMAT_VERSION and np.array_equal(source, _source_stamp(raw_path))
+
+
+def ensure(raw_path, compact_path):
+    """The compact transcript for raw_path, converting (once) if it is missing or out of date."""
+    if is_current(raw_path, compact_path):
+        return load(compact_path)
+    return convert_file(raw_path, compact_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python compacttranscript.py deepgram_raw.json [transcript.npz]")
+        sys.exit(1)
+    raw = sys.argv[1]
+    compact = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(raw)), "transcript.npz")
+    transcript = ensure(raw, compact)
+    sizes = os.path.getsize(compact) + os.path.getsize(words_path(compact))
+    print(f"{len(transcript.arrays['paragraph_speaker'])} paragraphs, {len(transcript.arrays['sentence_start'])} sentences")
+    print(f"{os.path.getsize(raw) / 1e6:.1f} MB JSON -> {os.path.getsize(compact) / 1e6:.2f} MB + {os.path.getsize(words_path(compact)) / 1e6:.1f} MB words ({sizes / 1e6:.1f} MB)")
@@ -1,9 +1,98 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 import json
 import argparse
+import copy
+import os
 import re
+import threading
+
+from httpcache import HTTPCache
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36'
+}
+MAX_PLAYER_FETCHES = 8      # concurrent player-page fetches per get_recent_meetings call
+MAX_REQUESTS_PER_HOST = 4   # politeness limit shared by every thread in the process
+REQUEST_TIMEOUT = 30
+
+# Archived meetings never change, so player pages can be cached for a long time;
+# the archive listing gains new rows and is revalidated much sooner.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wip', 'http_cache')
+CACHE_TTLS = [
+    (r'MediaPlayer\.php', 30 * 24 * 3600),
+    (r'ViewPublisher\.php', 15 * 60),
+]
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+_cache = None
+_cache_enabled = True
+
+
+def configure_cache(enabled=True, cache_dir=CACHE_DIR):
+    """Turn the on-disk page cache on or off, or point it at another folder."""
+    global _cache, _cache_enabled
+    with _session_lock:
+        _cache_enabled = enabled
+        _cache = HTTPCache(cache_dir, ttl_rules=CACHE_TTLS, max_bytes=CACHE_MAX_BYTES) if enabled else None
+
+
+def get_cache():
+    global _cache
+    with _session_lock:
+        if _cache is None and _cache_enabled:
+            _cache = HTTPCache(CACHE_DIR, ttl_rules=CACHE_TTLS, max_bytes=CACHE_MAX_BYTES)
+        return _cache
+
+
+def cache_stats():
+    """Hit/miss counts of the page cache for this process."""
+    cache = get_cache()
+    return cache.stats() if cache else None
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_REQUESTS_PER_HOST * 2)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def _host_slot(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+        return _host_slots[host]
+
+
+def fetch(url):
+    """
+    GET a URL over the shared session, holding one of its host's politeness slots.
+    Goes through the page cache unless it has been disabled.
+    """
+    cache = get_cache()
+    with _host_slot(url):
+        if cache:
+            response = cache.get(get_session(), url, timeout=REQUEST_TIMEOUT)
+        else:
+            response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response
+
 
 def get_video_url_from_player_page(player_url):
     """
@@ -11,11 +100,7 @@ def get_video_url_from_player_page(player_url):
     This logic is adapted from the proven code in lib/hosts/granicus.py.
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36'
-        }
-        response = requests.get(player_url, headers=headers)
-        response.raise_for_status()
+        response = fetch(player_url)
         
         m3u8_match = re.search(r'video_url="([^"]+\.m3u8[^"]*)"', response.text)
         video_url = m3u8_match.group(1) if m3u8_match else None
@@ -41,19 +126,92 @@ def get_video_url_from_player_page(player_url):
         return {'video_url': None, 'download_url': None}
 
 
-def get_recent_meetings(committee_id=10, start_date_str='2024_01_01', count=1):
+def _build_meeting_data(meeting_date, columns, links, player_page_url, urls):
+    """Assemble the meeting dict for one archive row once its player page is resolved."""
+    direct_video_url = urls.get('video_url')
+    download_url = urls.get('download_url')
+    
+    if not direct_video_url:
+        return None
+
+    meeting_data = {
+        "name": columns[0].get('headers', [''])[0],
+        "date": meeting_date.strftime('%Y-%m-%d'),
+        "duration": columns[1].text.strip().replace('\xa0', ' '),
+        "player_page_url": player_page_url,
+        "video_url": direct_video_url,
+        "download_url": download_url,
+        "agenda_url": None,
+        "minutes_url": None,
+        "transcript_url": None,
+        "mp3_url": None
+    }
+
+    for link in links:
+        href = link.get('href', '')
+        full_url = f"https:{href}" if href.startswith('//') else href
+
+        if 'agendaviewer.php' in href.lower():
+            meeting_data['agenda_url'] = full_url
+        elif 'minutesviewer.php' in href.lower():
+            meeting_data['minutes_url'] = full_url
+        elif 'transcriptviewer.php' in href.lower():
+            meeting_data['transcript_url'] = full_url
+
+        elif '.mp3' in href:
+            meeting_data['mp3_url'] = href
+        elif '.mp4' in href:
+             # Keep this as a backup if found in row, though player page is preferred
+            meeting_data['download_url'] = href
+
+    if not meeting_data.get('download_url'):
+        meeting_data['download_url'] = meeting_data['video_url']
+
+    return meeting_data
+
+
+def _parse_row_date(columns):
+    """Return the meeting date of an archive row's cells, or None if it has none."""
+    if len(columns) < 2:
+        return None
+
+    date_str = columns[0].text.strip()
+    try:
+        if columns[0].find('span'):
+            # Drop the span from a copy; the row's own cells are read again later
+            cell = copy.copy(columns[0])
+            cell.span.decompose()
+            date_str = cell.text.strip()
+
+        return datetime.strptime(date_str, '%m/%d/%y')
+    except ValueError:
+        try:
+            return datetime.strptime(date_str, '%b %d, %Y')
+        except ValueError:
+            return None
+
+
+def get_recent_meetings(committee_id=10, start_date_str='2024_01_01', count=1, skip=None, since=None):
     """
     Retrieves a list of the most recent meetings for a given committee, including
     the direct video URL.
+
+    Only the newest `count` archive rows have their player pages fetched. If `skip`
+    is given, it is called with each candidate's 'YYYY-MM-DD' date and rows for
+    which it returns True (e.g. already published) are left out without a fetch.
+
+    `since` is a 'YYYY-MM-DD' high-water mark: rows older than it are known to be
+    handled already, and since the archive lists newest first, parsing stops at
+    the first such row.
     """
     committee_url = f"https://sanfrancisco.granicus.com/ViewPublisher.php?view_id={committee_id}"
     start_date = datetime.strptime(start_date_str, '%Y_%m_%d')
+    watermark = datetime.strptime(since, '%Y-%m-%d') if since else None
     
     all_meetings = []
 
     try:
-        response = requests.get(committee_url)
-        response.raise_for_status()
+        response = fetch(committee_url)
         soup = BeautifulSoup(response.content, 'html.parser')
 
         meeting_table = soup.find('table', id='archive')
@@ -61,24 +219,27 @@ def get_recent_meetings(committee_id=10, start_date_str='2024_01_01', count=1):
             return []
 
         meeting_rows = meeting_table.find('tbody').find_all('tr')
-        
+
+        # First pass: parse the archive table without touching the network.
+        # With a watermark, parsing stops at the first already-known row, provided
+        # the table is ordered newest first (told by the first two distinct dates).
+        first_date = None
+        newest_first = None
+        candidates = []
         for row in meeting_rows:
             columns = row.find_all('td')
-            if len(columns) < 2:
+            meeting_date = _parse_row_date(columns)
+            if not meeting_date:
                 continue
+            if first_date is None:
+                first_date = meeting_date
+            elif newest_first is None and meeting_date != first_date:
+                newest_first = meeting_date < first_date
 
-            date_str = columns[0].text.strip()
-            try:
-                if columns[0].find('span'):
-                    columns[0].span.decompose()
-                    date_str = columns[0].text.strip()
-                
-                meeting_date = datetime.strptime(date_str, '%m/%d/%y')
-            except ValueError:
-                try:
-                    meeting_date = datetime.strptime(date_str, '%b %d, %Y')
-                except ValueError:
-                    continue
+            if watermark and meeting_date < watermark:
+                if newest_first:
+                    break
+                continue
 
             if meeting_date >= start_date:
                 player_page_url = None
@@ -92,50 +253,37 @@ def get_recent_meetings(committee_id=10, start_date_str='2024_01_01', count=1):
                 if not player_page_url:
                     continue
 
-                urls = get_video_url_from_player_page(player_page_url)
-                direct_video_url = urls.get('video_url')
-                download_url = urls.get('download_url')
-                
-                if not direct_video_url:
-                    continue
+                candidates.append((meeting_date, columns, links, player_page_url))
 
-                meeting_data = {
-                    "name": columns[0].get('headers', [''])[0],
-                    "date": meeting_date.strftime('%Y-%m-%d'),
-                    "duration": columns[1].text.strip().replace('\xa0', ' '),
-                    "player_page_url": player_page_url,
-                    "video_url": direct_video_url,
-                    "download_url": download_url,
-                    "agenda_url": None,
-                    "minutes_url": None,
-                    "transcript_url": None,
-                    "mp3_url": None
-                }
+        # Second pass: resolve player pages newest first, and only as many as are
+        # needed. A candidate whose page yields no video is replaced by the next
+        # older one; a candidate the caller has already completed just fills its slot.
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        slots_filled = 0
+        next_index = 0
+        while slots_filled < count and next_index < len(candidates):
+            batch = candidates[next_index:next_index + count - slots_filled]
+            next_index += len(batch)
 
-                for link in links:
-                    href = link.get('href', '')
-                    full_url = f"https:{href}" if href.startswith('//') else href
-
-                    if 'agendaviewer.php' in href.lower():
-                        meeting_data['agenda_url'] = full_url
-                    elif 'minutesviewer.php' in href.lower():
-                        meeting_data['minutes_url'] = full_url
-                    elif 'transcriptviewer.php' in href.lower():
-                        meeting_data['transcript_url'] = full_url
+            to_resolve = []
+            for candidate in batch:
+                if skip and skip(candidate[0].strftime('%Y-%m-%d')):
+                    slots_filled += 1
+                else:
+                    to_resolve.append(candidate)
 
-                    elif '.mp3' in href:
-                        meeting_data['mp3_url'] = href
-                    elif '.mp4' in href:
-                         # Keep this as a backup if found in row, though player page is preferred
-                        meeting_data['download_url'] = href
+            with ThreadPoolExecutor(max_workers=MAX_PLAYER_FETCHES) as executor:
+                resolved = list(executor.map(
+                    lambda candidate: get_video_url_from_player_page(candidate[3]), to_resolve
+                ))
 
-                if not meeting_data.get('download_url'):
-                    meeting_data['download_url'] = meeting_data['video_url']
+            for candidate, urls in zip(to_resolve, resolved):
+                meeting_data = _build_meeting_data(*candidate, urls)
+                if meeting_data:
+                    all_meetings.append(meeting_data)
+                    slots_filled += 1
 
-                all_meetings.append(meeting_data)
-
-        all_meetings.sort(key=lambda x: x['date'], reverse=True)
-        return all_meetings[:count]
+        return all_meetings
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
@@ -149,8 +297,11 @@ if __name__ == '__main__':
     parser.add_argument('--committee_id', type=int, default=10, help="The Granicus view_id for the committee.")
     parser.add_argument('--start_date', type=str, default='2025_07_01', help="The start date in YYYY_MM_DD format.")
     parser.add_argument('--count', type=int, default=1, help="The number of recent meetings to return.")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the on-disk page cache.")
     args = parser.parse_args()
 
+    configure_cache(enabled=not args.no_cache)
+
     meetings = get_recent_meetings(args.committee_id, args.start_date, args.count)
     
     if meetings:
@@ -160,3 +311,5 @@ if __name__ == '__main__':
         print(f"Successfully saved {len(meetings)} meeting(s) to {output_file}")
     else:
         print("No meetings found matching the criteria.")
+    if cache_stats():
+        print(f"Page cache: {cache_stats()}")
@@ -0,0 +1,178 @@
+"""
+Dead-air trimming before transcription.
+
+Meeting recordings often carry long stretches with nobody speaking: recesses,
+closed sessions, pre-roll slides. Deepgram bills them like speech. This module
+finds long silences with ffmpeg's silencedetect, writes a copy of the audio with
+them cut out, and keeps a trim map so every start/end time in the transcript
+of the shortened audio can be mapped back to the original recording, which is
+what the viewer seeks in.
+
+    trimmed_path, trim_map = trim_dead_air("audio.mp3", "audio.trimmed.mp3")
+    result = remap_times(deepgram_result, trim_map)
+
+A trim map is a list of [original_start, original_end, trimmed_start] for each
+kept span. Silence detection is by level only, so hold music is not removed.
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import subprocess
+
+from videotools import AUDIO_PROFILES, DEFAULT_PROFILE, probe_duration
+
+NOISE_DB = -40            # quieter than this counts as silence
+MIN_SILENCE_SECONDS = 20  # only gaps at least this long are cut
+PADDING_SECONDS = 1.0     # kept on each side of a cut so no word is clipped
+MIN_SAVINGS_SECONDS = 60  # below this, trimming is not worth a re-encode
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: ([\d.]+)")
+
+
+def detect_silences(audio_path, noise_db=NOISE_DB, min_silence=MIN_SILENCE_SECONDS):
+    """Return [(start, end), ...] of silences at least min_silence seconds long."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-hide_banner', '-i', audio_path,
+        '-af', f"silencedetect=noise={noise_db}dB:d={min_silence}",
+        '-f', 'null', '-',
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(f"silencedetect failed for {audio_path}")
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = _SILENCE_START.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None:
+        silences.append((start, None))  # silent through to the end of the file
+    return silences
+
+
+def build_trim_map(silences, total_duration, padding=PADDING_SECONDS):
+    """Turn silences into the spans to keep, as a trim map (see module docstring)."""
+    kept = []
+    position = 0.0
+    for start, end in silences:
+        cut_start = start + padding
+        # Silent through to the end of the file: nothing follows that needs padding
+        cut_end = total_duration if end is None else end - padding
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            kept.append((position, cut_start))
+        position = max(position, cut_end)
+    if position < total_duration:
+        kept.append((position, total_duration))
+
+    trim_map = []
+    trimmed_position = 0.0
+    for start, end in kept:
+        trim_map.append([round(start, 3), round(end, 3), round(trimmed_position, 3)])
+        trimmed_position += end - start
+    return trim_map
+
+
+def removed_seconds(trim_map, total_duration):
+    return total_duration - sum(end - start for start, end, _ in trim_map)
+
+
+def to_original(t, trim_map, starts=None):
+    """
+    Map a time in the trimmed audio back to the original recording. `starts`,
+    the trimmed_start column of trim_map, can be passed in when mapping many times.
+    """
+    if not trim_map:
+        return t
+    if starts is None:
+        starts = [trimmed_start for _, _, trimmed_start in trim_map]
+    index = max(0, bisect.bisect_right(starts, t) - 1)
+    start, end, trimmed_start = trim_map[index]
+    return round(min(start + (t - trimmed_start), end), 3)
+
+
+def _remap(data, trim_map, starts):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in ('start', 'end') and isinstance(value, (int, float)) and not isinstance(value, bool):
+                data[key] = to_original(value, trim_map, starts)
+            else:
+                _remap(value, trim_map, starts)
+    elif isinstance(data, list):
+        for item in data:
+            _remap(item, trim_map, starts)
+
+
+def remap_times(data, trim_map):
+    """
+    Rewrite every numeric "start" / "end" in a Deepgram result (words, utterances,
+    paragraphs, sentences, ...) from trimmed-audio time to original time, in place.
+    """
+    if trim_map:
+        _remap(data, trim_map, [trimmed_start for _, _, trimmed_start in trim_map])
+    return data
+
+
+def cut_audio(audio_path, output_path, trim_map, profile=DEFAULT_PROFILE):
+    """Write the kept spans of audio_path, back to back, to output_path."""
+    selection = '+'.join(f"between(t,{start},{end})" for start, end, _ in trim_map)
+    temp_path = f"{output_path}.part.{output_path.rsplit('.', 1)[-1]}"
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-hide_banner', '-loglevel', 'error', '-i', audio_path,
+        '-af', f"aselect='{selection}',asetpts=N/SR/TB",
+    ] + AUDIO_PROFILES[profile]['ffmpeg_args'] + [temp_path]
+    result = subprocess.run(cmd, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise RuntimeError(f"Trimming {audio_path} failed: {result.stderr.strip()[-300:]}")
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def trim_dead_air(audio_path, output_path, profile=DEFAULT_PROFILE, noise_db=NOISE_DB,
+                  min_silence=MIN_SILENCE_SECONDS, min_savings=MIN_SAVINGS_SECONDS):
+    """
+    Cut long silences out of audio_path into output_path.
+
+    Returns (output_path, trim_map), or (audio_path, None) when there is too
+    little dead air to be worth it, in which case the original should be used.
+    """
+    total_duration = probe_duration(audio_path)
+    if not total_duration:
+        return audio_path, None
+    silences = detect_silences(audio_path, noise_db, min_silence)
+    trim_map = build_trim_map(silences, total_duration)
+    removed = removed_seconds(trim_map, total_duration) if trim_map else 0
+    if removed < min_savings:
+        return audio_path, None
+    cut_audio(audio_path, output_path, trim_map, profile)
+    print(f"  - Trimmed {removed / 60:.1f} of {total_duration / 60:.0f} min of dead air from {audio_path}")
+    return output_path, trim_map
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show (and optionally cut) the dead air in a recording.")
+    parser.add_argument('--audio', required=True, help="Audio file to analyze.")
+    parser.add_argument('--output', help="Write the trimmed audio here.")
+    parser.add_argument('--noise-db', type=float, default=NOISE_DB, help="Level below which audio counts as silence.")
+    parser.add_argument('--min-silence', type=float, default=MIN_SILENCE_SECONDS, help="Shortest silence, in seconds, that is cut.")
+    args = parser.parse_args()
+
+    duration = probe_duration(args.audio)
+    trim_map = build_trim_map(detect_silences(args.audio, args.noise_db, args.min_silence), duration)
+    removed = removed_seconds(trim_map, duration)
+    print(json.dumps(trim_map, indent=2))
+    print(f"{removed:.0f}s of {duration:.0f}s ({removed / duration:.0%}) would be removed.")
+    if args.output:
+        cut_audio(args.audio, args.output, trim_map)
+        print(f"Trimmed audio written to {args.output}")
@@ -1,11 +1,24 @@
-import json, os, sys
+import functools, json, os, re, sys, threading, time
 from datetime import datetime
 import importlib.util
+import inspect
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import check_ffmpeg
 
-from videotools import download_audio
-from transcription import transcribe_audio
+from factorydaemon import FactoryDaemon
+from jobstore import JobStore
+from pipeline import Deferred, Pipeline, Stage
+from ratelimit import get_limiter
+from resilience import get_breaker
+from videotools import AUDIO_PROFILES, DEFAULT_PROFILE, audio_filename, download_audio, stream_audio
+from transcription import BACKENDS, TRANSCRIBE_OPTIONS, close_clients, submit_transcription, transcribe_audio, transcribe_stream
 import meetingreporter
+import deadair
+import webhook
+from artifactstore import get_store, recipe_key
+import fingerprint
+import compacttranscript
+from chunktranscriber import DEFAULT_WORKERS as DEFAULT_CHUNK_WORKERS, transcribe_chunked
 
 # --- Defaults ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,9 +26,27 @@ WIP_DIR = os.path.join(BASE_DIR, 'wip')
 MEETINGS_DIR = os.path.join(BASE_DIR,'localhost', 'meetings')
 COMMITTEES_FILE = os.path.join(BASE_DIR, 'committees.json')
 TEMPLATE_FILE = os.path.join(BASE_DIR, 'viewer_template.html')
+MAX_RETRY_DELAY = 30 * 60
+CALLBACK_POLL_SECONDS = 15
 
 
-def process_single_meeting(
+def meeting_paths(committee_name, meeting_date, parent_committee=None, wip_dir=WIP_DIR, meetings_dir=MEETINGS_DIR):
+    """Return the (wip, final) folders for a meeting in the hierarchical folder structure."""
+    committee_folder = committee_name.replace(" ", "_")
+    parent_dir = parent_committee.replace(" ", "_") if parent_committee else None
+
+    if parent_dir:
+        return (
+            os.path.join(wip_dir, parent_dir, committee_folder, meeting_date),
+            os.path.join(meetings_dir, parent_dir, committee_folder, meeting_date),
+        )
+    return (
+        os.path.join(wip_dir, committee_folder, meeting_date),
+        os.path.join(meetings_dir, committee_folder, meeting_date),
+    )
+
+
+def prepare_meeting(
     video_url: str,
     meeting_date: str,
     committee_name: str,
@@ -26,21 +57,25 @@ def process_single_meeting(
     structured_only: bool = False,
     jurisdiction: str = '',
     download_url: str = None,
+    duration_seconds: float = None,
+    priority: float = 0,
+    audio_profile: str = DEFAULT_PROFILE,
+    trim_silence: bool = False,
+    chunk_seconds: float = 0,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+    asr_backend: str = None,
+    use_cache: bool = True,
 ):
-    """Run the full pipeline for a single meeting and return output paths."""
-    committee_folder = committee_name.replace(" ", "_")
-    parent_dir = parent_committee.replace(" ", "_") if parent_committee else None
-
+    """
+    Create the working folders for a meeting and return a job dict describing it,
+    or None if its final transcript.html already exists.
+    """
     # Use download_url if provided, otherwise fallback to video_url
     actual_download_url = download_url if download_url else video_url
 
-    # Hierarchical folder structure
-    if parent_dir:
-        wip_meeting_path = os.path.join(wip_dir, parent_dir, committee_folder, meeting_date)
-        final_meeting_path = os.path.join(meetings_dir, parent_dir, committee_folder, meeting_date)
-    else:
-        wip_meeting_path = os.path.join(wip_dir, committee_folder, meeting_date)
-        final_meeting_path = os.path.join(meetings_dir, committee_folder, meeting_date)
+    wip_meeting_path, final_meeting_path = meeting_paths(
+        committee_name, meeting_date, parent_committee, wip_dir, meetings_dir
+    )
 
     os.makedirs(wip_meeting_path, exist_ok=True)
     os.makedirs(final_meeting_path, exist_ok=True)
@@ -59,61 +94,701 @@ def process_single_meeting(
     with open(os.path.join(wip_meeting_path, "meta.json"), "w") as f:
         json.dump(meta, f, indent=4)
 
-    # --- Download ---
-    audio_path = os.path.join(wip_meeting_path, "audio.mp3")
-    if not os.path.exists(audio_path):
-        print(f"  - Downloading audio for {meeting_date}...")
-        download_audio(actual_download_url, audio_path)
-    else:
-        print(f"  - Audio already exists for {meeting_date}.")
-
-    # --- Transcribe ---
-    transcript_path = os.path.join(wip_meeting_path, "deepgram_raw.json")
-    if not os.path.exists(transcript_path):
-        print(f"  - Transcribing {meeting_date}...")
-        transcript_json = transcribe_audio(audio_path)
-        if not transcript_json:
-            raise RuntimeError(f"Transcription failed for {meeting_date}")
-        with open(transcript_path, "w") as f:
-            f.write(json.dumps(json.loads(transcript_json), indent=4))
-    else:
-        print(f"  - Transcription already exists for {meeting_date}.")
-
-    # --- Generate structured transcript and optional HTML ---
-    with open(transcript_path, "r") as f:
-        deepgram_data = json.load(f)
-
     hint_text = ""
     if members:
         hint_text = "\n".join(f"{m['name']} ({m.get('title','')})" for m in members)
 
-    structured_path = os.path.join(wip_meeting_path, "structured.json")
-    html_path = os.path.join(final_meeting_path, "transcript.html")
+    job_id = os.path.relpath(wip_meeting_path, wip_dir).replace(os.sep, "/")
+    return {
+        "job_id": job_id,
+        "scope": job_id.rsplit("/", 1)[0],
+        "video_url": video_url,
+        "download_url": actual_download_url,
+        "date": meeting_date,
+        "committee": committee_name,
+        "jurisdiction": jurisdiction,
+        "hint_text": hint_text,
+        "structured_only": structured_only,
+        "duration_seconds": duration_seconds,
+        "priority": priority,
+        "audio_profile": audio_profile,
+        "trim_silence": trim_silence,
+        "chunk_seconds": chunk_seconds,
+        "chunk_workers": chunk_workers,
+        "asr_backend": asr_backend,
+        "use_cache": use_cache,
+        "audio_path": audio_filename(os.path.join(wip_meeting_path, "audio"), audio_profile),
+        "transcript_path": os.path.join(wip_meeting_path, "deepgram_raw.json"),
+        "compact_path": os.path.join(wip_meeting_path, compacttranscript.COMPACT_FILE),
+        "structured_path": os.path.join(wip_meeting_path, "structured.json"),
+        "html_path": os.path.join(final_meeting_path, "transcript.html"),
+    }
+
+
+# --- Pipeline stages ---
+# Each stage takes the job dict from prepare_meeting, produces one artifact and
+# returns the job for the next stage. Whether a stage can be skipped is decided
+# by run_stage, not by the stage itself.
+
+def write_atomic(path, text):
+    """Write text to path via a temp file so a crash never leaves a truncated artifact."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _write_transcript(job, result):
+    """
+    Write a Deepgram result to deepgram_raw.json (unindented; it is only read
+    by machines) and convert it to the compact form the later stages read.
+    """
+    write_atomic(job["transcript_path"], json.dumps(result))
+    compacttranscript.convert(result, job["compact_path"], job["transcript_path"])
+
+
+# Latest progress update of each running download, by job_id (see videotools.report_progress)
+_download_progress = {}
+_download_progress_lock = threading.Lock()
+
+
+def download_progress():
+    """Snapshot of the downloads currently running in this process."""
+    with _download_progress_lock:
+        return {job_id: dict(update) for job_id, update in _download_progress.items()}
+
+
+# --- Artifact cache ---
+# Audio, transcripts and LLM output are shared through artifactstore by what
+# they were made from, so a meeting seen before (under another committee, or
+# before a folder rename) reuses them instead of paying for them again.
+
+def _cache(job):
+    return get_store() if job.get("use_cache", True) else None
+
+
+def _transcript_key(cache, job):
+    """Cache key of a meeting's transcript: its audio plus everything that shapes the transcription."""
+    backend = job.get("asr_backend") or os.environ.get("TRANSCRIBE_BACKEND") or "deepgram"
+    engine = TRANSCRIBE_OPTIONS if backend == "deepgram" else os.environ.get("LOCAL_ASR_MODEL")
+    return recipe_key(
+        "transcript", cache.content_key(job["audio_path"]), backend, engine,
+        bool(job.get("trim_silence")), job.get("chunk_seconds") or 0,
+    )
+
+
+def _fetch_cached_transcript(cache, job):
+    if cache and os.path.exists(job["audio_path"]) and cache.fetch(_transcript_key(cache, job), job["transcript_path"]):
+        print(f"  - Reusing cached transcript for {job['date']}.")
+        compacttranscript.ensure(job["transcript_path"], job["compact_path"])
+        return True
+    return False
+
+
+def _remember_transcript(cache, job):
+    if cache and os.path.exists(job["audio_path"]) and os.path.exists(job["transcript_path"]):
+        cache.put("transcript", _transcript_key(cache, job), job["transcript_path"])
+
+
+def _fetch_cached_audio(cache, job):
+    if cache and cache.fetch_audio(job["download_url"], job.get("audio_profile", DEFAULT_PROFILE), job["audio_path"]):
+        print(f"  - Reusing cached audio for {job['date']}.")
+        return True
+    return False
+
+
+def _remember_audio(cache, job):
+    if cache and os.path.exists(job["audio_path"]):
+        cache.store_audio(job["download_url"], job.get("audio_profile", DEFAULT_PROFILE), job["audio_path"])
+
+
+# --- Re-post detection ---
+# A meeting re-uploaded under a new URL, re-encoded or trimmed differently,
+# misses the cache above. Its audio fingerprint (fingerprint.py) still matches
+# the earlier recording, whose transcript is reused shifted by the offset.
+
+def _fingerprint(job):
+    """Fingerprint of the meeting's audio, or None if it could not be decoded."""
+    try:
+        return fingerprint.fingerprint_file(job["audio_path"])
+    except Exception as e:
+        print(f"  - Could not fingerprint {job['date']}: {e}")
+        return None
+
+
+def _reuse_repost(job, fp):
+    """Write the shifted transcript of an earlier recording this one is a copy of. Returns True if it did."""
+    if fp is None:
+        return False
+    match = fingerprint.get_index().find_match(fp, exclude_source=job["job_id"])
+    if not match or match["coverage"] < fingerprint.MIN_COVERAGE:
+        return False
+    if not match["transcript_path"] or not os.path.exists(match["transcript_path"]):
+        return False
+    with open(match["transcript_path"], "r", encoding="utf-8") as f:
+        result = json.load(f)
+    fingerprint.shift_transcript(result, match["offset_seconds"], fp["duration"])
+    _write_transcript(job, result)
+    print(f"  - {job['date']} is a re-post of {match['source']} (offset {match['offset_seconds']:+.1f}s, {match['windows']} windows, score {match['score']}); reusing its transcript.")
+    return True
+
+
+def _register_fingerprint(job, fp=None):
+    """Index the meeting's audio so later re-posts of it can reuse its transcript."""
+    if not os.path.exists(job["audio_path"]) or not os.path.exists(job["transcript_path"]):
+        return
+    index = fingerprint.get_index()
+    if fp is None:
+        if index.has(job["job_id"]):
+            return
+        fp = _fingerprint(job)
+    if fp is not None:
+        index.add(job["job_id"], fp, job["audio_path"], job["transcript_path"])
+
+
+def _audio_in_use(store, wip_dir, path):
+    """Whether the meeting owning the audio at path may still need it: anything but a finished job does."""
+    job_id = os.path.relpath(os.path.dirname(os.path.abspath(path)), os.path.abspath(wip_dir)).replace(os.sep, "/")
+    job = store.get_job(job_id)
+    return job is None or job["status"] != "done"
+
+
+def download_stage(job):
+    cache = _cache(job)
+    if _fetch_cached_audio(cache, job):
+        return job
+    print(f"  - Downloading audio for {job['date']}...")
+    downloads = {}
+
+    def on_progress(update):
+        with _download_progress_lock:
+            _download_progress[job["job_id"]] = update
+        downloads[update["phase"]] = update
+
+    try:
+        # Each download logs to its own file next to the audio, so any number can run side by side
+        ok = download_audio(
+            job["download_url"], job["audio_path"], job.get("audio_profile", DEFAULT_PROFILE),
+            expected_duration=job.get("duration_seconds"), progress=on_progress,
+        )
+    finally:
+        with _download_progress_lock:
+            _download_progress.pop(job["job_id"], None)
+    if not ok:
+        raise RuntimeError(f"Download failed for {job['date']}")
+    _remember_audio(cache, job)
+    fetched = downloads.get("download")
+    if fetched and fetched["bytes_per_second"]:
+        print(f"  - Downloaded {job['date']}: {(fetched['bytes'] or 0) / 1e6:.0f} MB at {fetched['bytes_per_second'] / 1e6:.1f} MB/s")
+    return job
+
+
+def _audio_for_transcription(job):
+    """The audio to send to Deepgram and, if it was trimmed, the trim map to put its times back."""
+    if not job.get("trim_silence"):
+        return job["audio_path"], None
+    # Send Deepgram a copy without the long silences, then map its times back
+    base, ext = os.path.splitext(job["audio_path"])
+    return deadair.trim_dead_air(
+        job["audio_path"], f"{base}.trimmed{ext}", job.get("audio_profile", DEFAULT_PROFILE)
+    )
+
+
+def transcribe_stage(job):
+    cache = _cache(job)
+    if _fetch_cached_transcript(cache, job):
+        return job
+    fp = _fingerprint(job) if cache else None
+    if _reuse_repost(job, fp):
+        _remember_transcript(cache, job)
+        _register_fingerprint(job, fp)
+        return job
+    print(f"  - Transcribing {job['date']}...")
+    audio_path, trim_map = _audio_for_transcription(job)
+    transcribe = functools.partial(transcribe_audio, backend=job.get("asr_backend"))
+    if job.get("chunk_seconds"):
+        transcript_json = transcribe_chunked(
+            audio_path, chunk_seconds=job["chunk_seconds"],
+            workers=job.get("chunk_workers", DEFAULT_CHUNK_WORKERS), transcribe=transcribe,
+        )
+    else:
+        transcript_json = transcribe(audio_path)
+    if not transcript_json:
+        raise RuntimeError(f"Transcription failed for {job['date']}")
+    result = json.loads(transcript_json)
+    if trim_map:
+        deadair.remap_times(result, trim_map)
+        os.remove(audio_path)
+    _write_transcript(job, result)
+    _remember_transcript(cache, job)
+    if cache:
+        _register_fingerprint(job, fp)
+    return job
+
+
+def stream_transcribe_stage(job):
+    """
+    Download and transcribe in one pass (--stream-asr): ffmpeg's audio is
+    uploaded to Deepgram as it is extracted and teed to the audio file, so the
+    transcription no longer waits for the whole download.
+    """
+    cache = _cache(job)
+    if os.path.exists(job["audio_path"]) or _fetch_cached_audio(cache, job):
+        return transcribe_stage(job)
+    print(f"  - Streaming audio for {job['date']} into transcription...")
+    chunks = stream_audio(job["download_url"], job["audio_path"], profile=job.get("audio_profile", DEFAULT_PROFILE))
+    transcript_json = transcribe_stream(chunks)
+    if not transcript_json:
+        raise RuntimeError(f"Transcription failed for {job['date']}")
+    # Streamed audio is neither trimmed nor chunked; cache the transcript as what it is
+    job["trim_silence"] = False
+    job["chunk_seconds"] = 0
+    _write_transcript(job, json.loads(transcript_json))
+    _remember_audio(cache, job)
+    _remember_transcript(cache, job)
+    return job
+
+
+def callback_transcribe_stage(job, base_url):
+    """
+    Transcribe in Deepgram's callback mode (--callback-url): submit the audio and
+    give the worker back. webhook.WebhookReceiver writes deepgram_raw.json when
+    Deepgram posts the result; until then the job is deferred and looked at again.
+    """
+    # The whole file goes in one request, so the transcript must not be cached as chunked
+    job["chunk_seconds"] = 0
+    folder = os.path.dirname(job["transcript_path"])
+    pending = webhook.read_pending(folder)
+    if pending is None:
+        if os.path.exists(job["transcript_path"]):
+            return job  # the callback arrived between two looks
+        cache = _cache(job)
+        if _fetch_cached_transcript(cache, job):
+            return job
+        if cache and _reuse_repost(job, _fingerprint(job)):
+            return job
+        audio_path, trim_map = _audio_for_transcription(job)
+        pending = {
+            "request_id": None,
+            "submitted_at": time.time(),
+            "trim_map": trim_map,
+            "upload_path": audio_path if trim_map else None,
+        }
+        # Recorded before submitting, so even an immediate callback finds it
+        webhook.write_pending(folder, pending)
+        print(f"  - Submitting {job['date']} to Deepgram (callback mode)...")
+        try:
+            pending["request_id"] = submit_transcription(audio_path, webhook.callback_url(base_url, job["job_id"]))
+        except Exception:
+            webhook.clear_pending(folder)
+            raise
+        if webhook.read_pending(folder) is not None:
+            webhook.write_pending(folder, pending)
+            if os.path.exists(job["transcript_path"]):
+                # The callback landed between the check and the write: don't leave it pending
+                webhook.clear_pending(folder)
+                return job
+    elif pending.get("error") or time.time() - pending["submitted_at"] > webhook.CALLBACK_TIMEOUT_SECONDS:
+        webhook.clear_pending(folder)
+        raise RuntimeError(f"Deepgram callback for {job['date']} failed: {pending.get('error') or 'timed out'}")
+    raise Deferred(CALLBACK_POLL_SECONDS, "waiting for Deepgram callback")
+
+
+def _run_reporter(job, output_path):
+    # The compact form is written where transcripts arrive; should it be missing
+    # or stale, the reporter streams just the paragraphs out of the raw JSON
+    paragraphs = None
+    if compacttranscript.is_current(job["transcript_path"], job["compact_path"]):
+        paragraphs = compacttranscript.load(job["compact_path"]).paragraphs()
 
-    print(f"  - Generating structured transcript for {meeting_date}...")
     meetingreporter.video_to_static_transcript(
-        deepgram_data=deepgram_data,
+        deepgram_data=None,
+        paragraphs=paragraphs,
+        transcript_path=job["transcript_path"],
         hints_file_path=None,
-        hints_text=hint_text,
+        hints_text=job["hint_text"],
         template_path=TEMPLATE_FILE,
-        output_path=None if structured_only else html_path,
-        meeting_title=f"{committee_name} - {meeting_date}",
-        video_url=video_url,
-        structured_out_path=structured_path,
-        jurisdiction=jurisdiction,
+        output_path=output_path,
+        meeting_title=f"{job['committee']} - {job['date']}",
+        video_url=job["video_url"],
+        structured_out_path=job["structured_path"],
+        jurisdiction=job["jurisdiction"],
     )
 
-    if structured_only:
-        print(f"✅ Structured data only: {structured_path}")
+
+def structure_stage(job):
+    """Run the LLM pass and cache its result in structured.json."""
+    cache = _cache(job)
+    if cache:
+        # Callback-mode and streamed transcripts arrive outside transcribe_stage, so are cached here
+        _remember_transcript(cache, job)
+        _register_fingerprint(job)
+        key = recipe_key(
+            "structured", cache.content_key(job["transcript_path"]), job["hint_text"], meetingreporter.LLM_MODEL
+        )
+        if cache.fetch(key, job["structured_path"]):
+            print(f"  - Reusing cached LLM structure for {job['date']}.")
+            return job
+    print(f"  - Generating structured transcript for {job['date']}...")
+    _run_reporter(job, output_path=None)
+    if cache:
+        cache.put("structured", key, job["structured_path"])
+    return job
+
+
+def render_stage(job):
+    if job["structured_only"]:
+        print(f"✅ Structured data only: {job['structured_path']}")
+        return job
+    _run_reporter(job, output_path=job["html_path"])
+    print(f"✅ Full SmartTranscript created at {job['html_path']}")
+    return job
+
+
+# (stage name, function, job key of the artifact it produces)
+STAGES = [
+    ("download", download_stage, "audio_path"),
+    ("transcribe", transcribe_stage, "transcript_path"),
+    ("structure", structure_stage, "structured_path"),
+    ("render", render_stage, "html_path"),
+]
+
+# With --stream-asr, download and transcription overlap in a single stage
+STREAM_STAGES = [("transcribe", stream_transcribe_stage, "transcript_path")] + STAGES[2:]
+
+
+def callback_stages(base_url):
+    """STAGES with transcription in Deepgram's callback mode, posting results to base_url."""
+    stage = functools.partial(callback_transcribe_stage, base_url=base_url)
+    return STAGES[:1] + [("transcribe", stage, "transcript_path")] + STAGES[2:]
+
+
+def pipeline_stages(stream_asr=False, callback_url=None):
+    if stream_asr:
+        return STREAM_STAGES
+    if callback_url:
+        return callback_stages(callback_url)
+    return STAGES
+
+
+def _stage_artifact(job, name, artifact_key):
+    if name == "render" and job["structured_only"]:
+        return None
+    return job[artifact_key]
+
+
+# External service each stage depends on; repeated failures trip its circuit breaker
+STAGE_SERVICES = {"download": "video", "transcribe": "deepgram", "structure": "openai"}
+SERVICE_FAILURE_THRESHOLD = 5
+COMMITTEE_FAILURE_THRESHOLD = 3
+BREAKER_RESET_SECONDS = 300
+
+
+def _stage_breakers(job, name):
+    breakers = []
+    service = STAGE_SERVICES.get(name)
+    if name == "transcribe" and job.get("asr_backend"):
+        service = job["asr_backend"]  # a local engine failing says nothing about Deepgram
+    if service:
+        breakers.append(get_breaker(service, SERVICE_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS))
+    if job.get("scope"):
+        breakers.append(get_breaker(f"committee:{job['scope']}", COMMITTEE_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS))
+    return breakers
+
+
+def _check_breakers(job, name):
+    """Raise Deferred if the service or committee behind this stage is currently tripped."""
+    admitted = []
+    for breaker in _stage_breakers(job, name):
+        wait = breaker.retry_after()
+        if wait:
+            for other in admitted:
+                other.cancel_trial()
+            raise Deferred(wait, f"{breaker.name} circuit open")
+        admitted.append(breaker)
+
+
+def _call_guarded(job, name, func, checked=False, first_attempt=True):
+    """
+    Run a stage function, feeding its outcome to the relevant circuit breakers.
+    Retries of one stubborn meeting do not count against its committee's
+    breaker, which should only trip when several different meetings fail.
+    """
+    if not checked:
+        _check_breakers(job, name)
+    breakers = _stage_breakers(job, name)
+    try:
+        result = func(job)
+    except Deferred:
+        # The service took the work (or the job is waiting on it); not a failure
+        for breaker in breakers:
+            breaker.record_success()
+        raise
+    except Exception:
+        for breaker in breakers:
+            if first_attempt or not breaker.name.startswith("committee:"):
+                breaker.record_failure()
+        raise
+    for breaker in breakers:
+        breaker.record_success()
+    return result
+
+
+def run_stage(job, name, func, artifact_key, store=None, stages=STAGES):
+    """
+    Run one stage for a job unless it is already complete.
+
+    With a JobStore, completion is what the store recorded (with the artifact's
+    size and modification time re-checked); an artifact on disk that the store
+    does not vouch for is deleted and rebuilt. Without a store, an existing
+    artifact counts as done.
+    """
+    artifact = _stage_artifact(job, name, artifact_key)
+
+    if store is None:
+        if artifact and os.path.exists(artifact):
+            print(f"  - {name} already done for {job['date']}.")
+            return job
+        return _call_guarded(job, name, func)
+
+    job_id = job["job_id"]
+    if store.stage_done(job_id, name, artifact):
+        print(f"  - {name} already done for {job['date']}.")
     else:
-        print(f"✅ Full SmartTranscript created at {html_path}")
+        _check_breakers(job, name)
+        row = store.get_stage(job_id, name)
+        if row and row["status"] == "waiting":
+            # Handed off to an outside service on an earlier pass; keep what it delivered
+            started_at = row["started_at"]
+        else:
+            if artifact and os.path.exists(artifact):
+                os.remove(artifact)
+            started_at = store.start_stage(job_id, name)
+        first_attempt = store.get_stage(job_id, name)["attempts"] == 1
+        try:
+            _call_guarded(job, name, func, checked=True, first_attempt=first_attempt)
+        except Deferred:
+            store.wait_stage(job_id, name)
+            raise
+        except Exception as e:
+            store.fail_stage(job_id, name, e)
+            raise
+        store.finish_stage(job_id, name, artifact, started_at=started_at)
+        # Everything downstream was built from the old artifact
+        names = [stage_name for stage_name, _, _ in stages]
+        store.invalidate_stages(job_id, names[names.index(name) + 1:])
+
+    if name == stages[-1][0]:
+        store.set_job_status(job_id, "done")
+    return job
+
+
+def tracked_stages(store=None, stages=STAGES):
+    """STAGES (or STREAM_STAGES) as (name, callable) pairs with run_stage bookkeeping applied."""
+    return [
+        (name, lambda job, name=name, func=func, key=key: run_stage(job, name, func, key, store, stages))
+        for name, func, key in stages
+    ]
+
 
+def job_output(job):
     return {
-        "structured": structured_path,
-        "html": None if structured_only else html_path,
+        "structured": job["structured_path"],
+        "html": None if job["structured_only"] else job["html_path"],
     }
 
 
+def process_single_meeting(
+    video_url: str,
+    meeting_date: str,
+    committee_name: str,
+    members: list = None,
+    wip_dir: str = WIP_DIR,
+    meetings_dir: str = MEETINGS_DIR,
+    parent_committee: str = None,
+    structured_only: bool = False,
+    jurisdiction: str = '',
+    download_url: str = None,
+    store: JobStore = None,
+    stream_asr: bool = False,
+    audio_profile: str = DEFAULT_PROFILE,
+    trim_silence: bool = False,
+    chunk_seconds: float = 0,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+    callback_url: str = None,
+    asr_backend: str = None,
+    use_cache: bool = True,
+):
+    """Run the full pipeline for a single meeting and return output paths."""
+    job = prepare_meeting(
+        video_url=video_url,
+        meeting_date=meeting_date,
+        committee_name=committee_name,
+        members=members,
+        wip_dir=wip_dir,
+        meetings_dir=meetings_dir,
+        parent_committee=parent_committee,
+        structured_only=structured_only,
+        jurisdiction=jurisdiction,
+        download_url=download_url,
+        audio_profile=audio_profile,
+        trim_silence=trim_silence,
+        chunk_seconds=chunk_seconds,
+        chunk_workers=chunk_workers,
+        asr_backend=asr_backend,
+        use_cache=use_cache,
+    )
+    if job is None:
+        return None
+    if store:
+        store.upsert_job(job)
+
+    for _, stage_func in tracked_stages(store, pipeline_stages(stream_asr, callback_url)):
+        while True:
+            try:
+                stage_func(job)
+                break
+            except Deferred as e:
+                time.sleep(e.delay)
+
+    return job_output(job)
+
+
+def parse_duration(text):
+    """Parse a listed meeting length ('02h 15m', '1:05:30', '95m') into seconds, or None."""
+    if not text:
+        return None
+    text = str(text).strip().lower()
+    if re.fullmatch(r"\d+(:\d+){1,2}", text):
+        seconds = 0
+        for part in text.split(":"):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    units = {"h": 3600, "m": 60, "s": 1}
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*([hms])", text)
+    if not parts:
+        return None
+    return sum(float(value) * units[unit] for value, unit in parts)
+
+
+# Scheduling policies: each maps a job to a sort key, lowest first. Committee
+# "priority" weights from committees.json always come first (higher runs sooner).
+ORDER_POLICIES = {
+    "fifo": lambda job: 0,
+    "newest": lambda job: tuple(-int(part) for part in job["date"].split("-")),
+    "shortest": lambda job: job.get("duration_seconds") if job.get("duration_seconds") is not None else float("inf"),
+}
+
+
+def job_priority(policy):
+    """Return the pipeline sort key for a scheduling policy name."""
+    order_key = ORDER_POLICIES[policy]
+    return lambda job: (-(job.get("priority") or 0), order_key(job))
+
+
+def load_getter(getter_script):
+    """Import a getter script by path and return the module."""
+    getter_script_path = os.path.abspath(getter_script)
+    spec = importlib.util.spec_from_file_location("custom_meeting_getter", getter_script_path)
+    custom_getter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(custom_getter)
+    print(f"Dynamically loaded meeting getter from: {getter_script_path}")
+    return custom_getter
+
+
+def committee_scope(committee, wip_dir=WIP_DIR):
+    """The job-store scope (wip-relative folder) of a committee's meetings."""
+    wip_path, _ = meeting_paths(
+        committee.get("name", "UnknownCommittee"), "", committee.get("parent_committee"), wip_dir
+    )
+    return os.path.relpath(wip_path, wip_dir).replace(os.sep, "/")
+
+
+def make_discoverer(get_recent_meetings_func, store, args):
+    """
+    Wrap a getter's get_recent_meetings as discover(committee), passing the
+    optional since/skip hints when the getter accepts them.
+    """
+    getter_params = inspect.signature(get_recent_meetings_func).parameters
+    getter_accepts_skip = "skip" in getter_params
+    getter_accepts_since = "since" in getter_params and not args.no_watermark
+
+    def discover(committee):
+        kwargs = {}
+        if getter_accepts_since:
+            # Rows older than the committee's watermark were all handled on earlier runs
+            kwargs["since"] = store.watermark(committee_scope(committee, args.wip))
+        if getter_accepts_skip:
+            # Let the getter avoid resolving meetings that are already published
+            def already_published(meeting_date):
+                _, final_path = meeting_paths(
+                    committee.get("name", "UnknownCommittee"), meeting_date,
+                    committee.get("parent_committee"), args.wip, args.meetings,
+                )
+                return os.path.exists(os.path.join(final_path, "transcript.html"))
+            kwargs["skip"] = already_published
+
+        return get_recent_meetings_func(
+            committee_id=committee.get("id"),
+            count=committee.get("process_count", 0),
+            **kwargs
+        )
+
+    return discover
+
+
+def jobs_for_meetings(committee, meetings, jurisdiction, args):
+    """Prepare job dicts for a committee's discovered meetings, dropping finished ones."""
+    jobs = []
+    for meeting in meetings:
+        job = prepare_meeting(
+            video_url=meeting.get("video_url"),
+            meeting_date=meeting.get("date"),
+            committee_name=committee.get("name", "UnknownCommittee"),
+            members=committee.get("members", []),
+            wip_dir=args.wip,
+            meetings_dir=args.meetings,
+            parent_committee=committee.get("parent_committee"),
+            structured_only=args.structured_only,
+            jurisdiction=jurisdiction,
+            download_url=meeting.get("download_url"),
+            duration_seconds=parse_duration(meeting.get("duration")),
+            priority=committee.get("priority", 0),
+            audio_profile=args.audio_profile,
+            trim_silence=args.trim_silence,
+            chunk_seconds=args.chunk_minutes * 60,
+            chunk_workers=args.chunk_workers,
+            asr_backend=args.asr_backend,
+            use_cache=not args.no_cache,
+        )
+        if job:
+            jobs.append(job)
+    return jobs
+
+
+def _on_job_done(job):
+    print(f"  - Done: {job_output(job)}")
+
+
+def _on_job_error(job, stage, e, store, max_attempts, retry_base):
+    """
+    Decide what happens to a failed meeting: retry the stage after an
+    exponential backoff, or move it to the dead-letter list once it has used
+    up its attempts. Returns the retry delay in seconds, or None.
+    """
+    print(f"  - ERROR ({stage}, {job['committee']} {job['date']}): {e}")
+    row = store.get_stage(job["job_id"], stage)
+    attempts = row["attempts"] if row else 1
+    if attempts >= max_attempts:
+        store.mark_dead(job["job_id"])
+        print(f"  - Giving up on {job['job_id']} after {attempts} attempt(s); see `python jobstore.py --dead`.")
+        return None
+    delay = min(retry_base * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    store.schedule_retry(job["job_id"], time.time() + delay)
+    print(f"  - Will retry {stage} for {job['job_id']} in {delay:.0f}s (attempt {attempts + 1} of {max_attempts}).")
+    return delay
+
+
 def main():
     """
     Either run full committee factory (no args)
@@ -122,6 +797,7 @@ def main():
     Examples:
       python factory.py --url "..." --committee "Planning Commission" --date 2025-10-17
       python factory.py --url "..." --structured-only
+      python factory.py --daemon --status-port 8765
     """
     import argparse
 
@@ -136,9 +812,61 @@ def main():
     parser.add_argument("--structured-only", action="store_true", help="Skip HTML generation and only output structured.json")
     parser.add_argument("--jurisdiction", help="Jurisdiction name (e.g., 'San Francisco Government')", default="")
     parser.add_argument("--getter-script", default="customgetter.py", help="Script to use for getting recent meetings in batch mode.")
+    parser.add_argument("--audio-profile", choices=sorted(AUDIO_PROFILES), default=DEFAULT_PROFILE, help="Audio encoding for downloads; the asr-* profiles are 16 kHz mono and much smaller to upload (see audiobenchmark.py).")
+    parser.add_argument("--trim-silence", action="store_true", help="Cut long silences out of the audio before transcription (not with --stream-asr); transcript times still refer to the original video.")
+    parser.add_argument("--chunk-minutes", type=float, default=0, help="Transcribe meetings longer than this as overlapping chunks in parallel (0 = one request per meeting; not with --stream-asr or --callback-url).")
+    parser.add_argument("--chunk-workers", type=int, default=DEFAULT_CHUNK_WORKERS, help="Chunks of one meeting transcribed at once with --chunk-minutes; each is a separate Deepgram request.")
+    parser.add_argument("--stream-asr", action="store_true", help="Upload audio to Deepgram while it is still being extracted instead of after the download finishes.")
+    parser.add_argument("--asr-backend", choices=sorted(BACKENDS), help="Transcription backend: deepgram (default, or TRANSCRIBE_BACKEND) or local (faster-whisper on the CPU, see localasr.py).")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or record audio, transcripts and LLM output in the shared artifact cache (see artifactstore.py), nor look for re-posts of earlier meetings (see fingerprint.py).")
+    parser.add_argument("--callback-url", help="Submit audio in Deepgram's callback mode; public URL that forwards to the webhook receiver (see webhook.py). Not with --stream-asr or --chunk-minutes.")
+    parser.add_argument("--webhook-port", type=int, default=8766, help="Local port of the Deepgram callback receiver.")
+    parser.add_argument("--webhook-host", default="127.0.0.1", help="Address the callback receiver listens on.")
+    parser.add_argument("--db", help="Job state database (default: <wip>/factory.db)")
+    parser.add_argument("--resume", action="store_true", help="In batch mode, also re-queue unfinished meetings recorded in the job database.")
+    parser.add_argument("--no-watermark", action="store_true", help="Re-list each committee's whole archive instead of stopping at the last processed meeting.")
+    parser.add_argument("--discovery-workers", type=int, default=8, help="Committees whose meeting lists are fetched in parallel in batch mode.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running, polling each committee on its own interval.")
+    parser.add_argument("--poll-interval", type=float, default=60, help="Default minutes between polls of a committee in daemon mode (per-committee 'poll_interval_minutes' overrides).")
+    parser.add_argument("--status-port", type=int, help="In daemon mode, serve status JSON on this localhost port.")
+    parser.add_argument("--order", choices=sorted(ORDER_POLICIES), default="fifo", help="Order in which queued meetings are processed (after committee 'priority' weights).")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per stage before a meeting is dead-lettered.")
+    parser.add_argument("--retry-base", type=float, default=60, help="Seconds before the first retry of a failed stage; doubles on each further failure.")
+    parser.add_argument("--download-workers", type=int, default=1, help="Concurrent downloads in batch mode (each logs to its own file, so they can safely run in parallel).")
+    parser.add_argument("--transcribe-workers", type=int, default=2, help="Concurrent transcriptions in batch mode.")
+    parser.add_argument("--structure-workers", type=int, default=2, help="Concurrent LLM structuring calls in batch mode.")
+    parser.add_argument("--render-workers", type=int, default=1, help="Concurrent HTML renders in batch mode.")
+    parser.add_argument("--queue-size", type=int, default=2, help="Max meetings waiting in front of each stage in batch mode.")
     args = parser.parse_args()
 
+    if args.callback_url and args.stream_asr:
+        parser.error("--callback-url and --stream-asr cannot be combined")
+    if args.stream_asr and (args.trim_silence or args.chunk_minutes):
+        parser.error("--stream-asr cannot be combined with --trim-silence or --chunk-minutes")
+    if args.callback_url and args.chunk_minutes:
+        # The callback stage submits the whole file; a chunked cache key would be a lie
+        parser.error("--chunk-minutes cannot be combined with --callback-url")
+    if args.asr_backend not in (None, "deepgram") and (args.callback_url or args.stream_asr):
+        parser.error("--callback-url and --stream-asr need the deepgram backend")
+
     check_ffmpeg.check_ffmpeg_installed() # Call the check here
+    store = JobStore(args.db or os.path.join(args.wip, "factory.db"))
+    # Cache eviction only takes audio away from meetings that are finished
+    get_store().in_use = functools.partial(_audio_in_use, store, args.wip)
+
+    receiver = None
+    if args.callback_url:
+        transcribe_at = [name for name, _, _ in STAGES].index("transcribe")
+        receiver = webhook.WebhookReceiver(
+            args.wip, args.webhook_port, args.webhook_host, store,
+            invalidates=[name for name, _, _ in STAGES[transcribe_at + 1:]],
+        ).start()
+
+    def close_all():
+        if receiver:
+            receiver.stop()
+        store.close()
+        close_clients()
 
     if args.url:
         members = None
@@ -154,19 +882,25 @@ def main():
             meetings_dir=args.meetings,
             structured_only=args.structured_only,
             jurisdiction=args.jurisdiction,
+            store=store,
+            stream_asr=args.stream_asr,
+            audio_profile=args.audio_profile,
+            trim_silence=args.trim_silence,
+            chunk_seconds=args.chunk_minutes * 60,
+            chunk_workers=args.chunk_workers,
+            callback_url=args.callback_url,
+            asr_backend=args.asr_backend,
+            use_cache=not args.no_cache,
         )
+        close_all()
         return
 
     # --- Batch mode ---
     print("--- Starting Factory Run ---")
     
     try:
-        getter_script_path = os.path.abspath(args.getter_script)
-        spec = importlib.util.spec_from_file_location("custom_meeting_getter", getter_script_path)
-        custom_getter = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(custom_getter)
+        custom_getter = load_getter(args.getter_script)
         get_recent_meetings_func = custom_getter.get_recent_meetings
-        print(f"Dynamically loaded meeting getter from: {getter_script_path}")
     except Exception as e:
         print(f"Error: Could not import get_recent_meetings from '{args.getter_script}'. {e}")
         sys.exit(1)
@@ -181,49 +915,119 @@ def main():
     jurisdiction = loaded_data.get("jurisdiction", "")
     committees = loaded_data.get("committees", [])
 
-    consecutive_failures = 0
-    for committee in committees:
-        if consecutive_failures >= 2:
-            print("Exiting after 2 consecutive failures.")
-            sys.exit(1)
+    # Meetings currently somewhere in the pipeline, so a re-poll never queues one twice
+    in_flight = set()
+    in_flight_lock = threading.Lock()
 
-        process_count = committee.get("process_count", 0)
-        if process_count == 0:
-            continue
+    def release(job):
+        with in_flight_lock:
+            in_flight.discard(job["job_id"])
 
-        committee_name = committee.get("name", "UnknownCommittee")
-        print(f"\n--- Processing Committee: {committee_name} ---")
+    dead_lettered = []
 
-        recent_meetings = get_recent_meetings_func(
-            committee_id=committee.get("id"),
-            count=process_count
-        )
+    def on_done(job):
+        release(job)
+        _on_job_done(job)
 
-        for meeting in recent_meetings:
+    def on_error(job, stage, e):
+        # A failure only ever affects its own meeting: it is retried with backoff
+        # or dead-lettered while everything else keeps flowing
+        delay = _on_job_error(job, stage, e, store, args.max_attempts, args.retry_base)
+        if delay is None:
+            release(job)
+            dead_lettered.append(job["job_id"])
+        return delay
+
+    priority = job_priority(args.order)
+    pipeline = Pipeline(
+        [
+            # The first queue only holds job descriptions, so it is unbounded and
+            # every discovered meeting competes for the next download slot by priority
+            Stage(
+                name, func,
+                workers=getattr(args, f"{name}_workers"),
+                queue_size=0 if index == 0 else args.queue_size,
+                priority=priority,
+            )
+            for index, (name, func) in enumerate(tracked_stages(store, pipeline_stages(args.stream_asr, args.callback_url)))
+        ],
+        on_done=on_done,
+        on_error=on_error,
+    )
+    pipeline.start()
+
+    if args.resume:
+        pending = store.pending_jobs(ready_only=True)
+        print(f"Resuming {len(pending)} unfinished meeting(s) from {store.db_path}")
+        for job in pending:
+            in_flight.add(job["job_id"])
+            pipeline.submit(job)
+
+    active_committees = [c for c in committees if c.get("process_count", 0)]
+    discover = make_discoverer(get_recent_meetings_func, store, args)
+
+    def enqueue(committee, meetings):
+        queued = 0
+        for job in jobs_for_meetings(committee, meetings, jurisdiction, args):
+            if store.is_blocked(job["job_id"]):
+                continue  # dead-lettered, or backing off from an earlier run
+            with in_flight_lock:
+                if job["job_id"] in in_flight:
+                    continue
+                in_flight.add(job["job_id"])
+            store.upsert_job(job)
+            if pipeline.submit(job):
+                queued += 1
+        return queued
+
+    if args.daemon:
+        FactoryDaemon(
+            active_committees,
+            discover,
+            enqueue,
+            pipeline,
+            default_interval_minutes=args.poll_interval,
+            status_path=os.path.join(args.wip, "status.json"),
+            status_port=args.status_port,
+            discovery_workers=args.discovery_workers,
+            downloads=download_progress,
+        ).run()
+        pipeline.abort()
+        pipeline.shutdown()
+        close_all()
+        return
+
+    # Discovery for every committee runs in parallel; meetings are queued as soon
+    # as their committee's listing comes back.
+    with ThreadPoolExecutor(max_workers=max(1, args.discovery_workers)) as executor:
+        futures = {executor.submit(discover, c): c for c in active_committees}
+        for future in as_completed(futures):
+            committee = futures[future]
+            committee_name = committee.get("name", "UnknownCommittee")
+            if pipeline.aborted:
+                continue
             try:
-                output = process_single_meeting(
-                    video_url=meeting.get("video_url"),
-                    meeting_date=meeting.get("date"),
-                    committee_name=committee_name,
-                    members=committee.get("members", []),
-                    wip_dir=args.wip,
-                    meetings_dir=args.meetings,
-                    parent_committee=committee.get("parent_committee"),
-                    structured_only=args.structured_only,
-                    jurisdiction=jurisdiction,
-                    download_url=meeting.get("download_url"),
-                )
-                if output:
-                    consecutive_failures = 0
-                    print(f"  - Done: {output}")
+                recent_meetings = future.result()
             except Exception as e:
-                print(f"  - ERROR: {e}")
-                consecutive_failures += 1
-                if consecutive_failures >= 2:
-                    print("  - Aborting batch run.")
-                    sys.exit(1)
+                print(f"  - ERROR discovering meetings for {committee_name}: {e}")
+                continue
+            print(f"\n--- Found {len(recent_meetings)} meeting(s) for committee: {committee_name} ---")
+            enqueue(committee, recent_meetings)
+
+    if hasattr(custom_getter, "cache_stats") and custom_getter.cache_stats():
+        print(f"Discovery page cache: {custom_getter.cache_stats()}")
+
+    pipeline.shutdown()
+    close_all()
 
     print("\n--- Factory Run Complete ---")
+    for provider, stats in get_limiter().stats().items():
+        print(f"API rate limits ({provider}): {stats}")
+    if not args.no_cache:
+        print(f"Artifact cache: {get_store().stats()}")
+    if dead_lettered:
+        print(f"{len(dead_lettered)} meeting(s) dead-lettered this run: {', '.join(dead_lettered)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
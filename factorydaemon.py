@@ -0,0 +1,183 @@
+"""
+Long-running poller behind `factory.py --daemon`.
+
+Instead of a cron job paying interpreter startup, imports and environment
+checks every few minutes, the daemon keeps one process (and one set of API
+clients) alive. Each committee in committees.json is polled on its own
+interval (`poll_interval_minutes`, falling back to --poll-interval), newly
+found meetings are fed into the running pipeline, and the current state —
+queue depth, busy workers and mean latency per stage, live download
+throughput, per-committee poll times and time spent waiting on API rate
+limits — is written to a status file and optionally served as JSON on a local
+port.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ratelimit import get_limiter
+from resilience import breaker_states
+
+
+class FactoryDaemon:
+    """
+    Polls committees on their own schedules.
+
+    discover(committee) returns the committee's recent meetings and
+    enqueue(committee, meetings) hands them to the pipeline, returning how many
+    were actually queued. Both are supplied by factory.py, as is downloads(),
+    which returns live progress of the running downloads for the status.
+    """
+
+    def __init__(
+        self,
+        committees,
+        discover,
+        enqueue,
+        pipeline,
+        default_interval_minutes=60,
+        status_path=None,
+        status_port=None,
+        discovery_workers=4,
+        tick_seconds=5,
+        downloads=None,
+    ):
+        self.discover = discover
+        self.enqueue = enqueue
+        self.pipeline = pipeline
+        self.status_path = status_path
+        self.status_port = status_port
+        self.tick_seconds = tick_seconds
+        self.downloads = downloads
+        self.started_at = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, discovery_workers))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._polls = {}
+        for committee in committees:
+            name = committee.get("name", "UnknownCommittee")
+            interval = committee.get("poll_interval_minutes", default_interval_minutes)
+            self._polls[name] = {
+                "committee": committee,
+                "interval_seconds": float(interval) * 60,
+                "next_poll": 0.0,
+                "last_poll": None,
+                "last_found": 0,
+                "last_queued": 0,
+                "last_error": None,
+                "polling": False,
+            }
+
+    def _poll(self, name):
+        entry = self._polls[name]
+        committee = entry["committee"]
+        try:
+            meetings = self.discover(committee)
+            queued = self.enqueue(committee, meetings)
+            error = None
+            if queued:
+                print(f"[daemon] {name}: queued {queued} new meeting(s)")
+        except Exception as e:
+            meetings, queued, error = [], 0, str(e)
+            print(f"[daemon] ERROR polling {name}: {e}")
+        with self._lock:
+            entry["last_poll"] = time.time()
+            entry["last_found"] = len(meetings)
+            entry["last_queued"] = queued
+            entry["last_error"] = error
+            entry["next_poll"] = entry["last_poll"] + entry["interval_seconds"]
+            entry["polling"] = False
+
+    def _schedule_due(self):
+        now = time.time()
+        with self._lock:
+            due = [
+                name for name, entry in self._polls.items()
+                if not entry["polling"] and entry["next_poll"] <= now
+            ]
+            for name in due:
+                self._polls[name]["polling"] = True
+        for name in due:
+            self._executor.submit(self._poll, name)
+
+    def status(self):
+        def stamp(ts):
+            return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+        with self._lock:
+            committees = {
+                name: {
+                    "interval_minutes": entry["interval_seconds"] / 60,
+                    "last_poll": stamp(entry["last_poll"]),
+                    "next_poll": stamp(entry["next_poll"]),
+                    "last_found": entry["last_found"],
+                    "last_queued": entry["last_queued"],
+                    "last_error": entry["last_error"],
+                }
+                for name, entry in self._polls.items()
+            }
+        stages = self.pipeline.stats()
+        return {
+            "updated": stamp(time.time()),
+            "uptime_seconds": round(time.time() - self.started_at),
+            "queue_depth": sum(stage["queued"] for stage in stages.values()),
+            "waiting_to_retry": self.pipeline.delayed,
+            "stages": stages,
+            "downloads": self.downloads() if self.downloads else {},
+            "breakers": breaker_states(),
+            "rate_limits": get_limiter().stats(),
+            "committees": committees,
+        }
+
+    def write_status(self):
+        if not self.status_path:
+            return
+        tmp_path = f"{self.status_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(tmp_path, self.status_path)
+
+    def _start_status_server(self):
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(daemon.status(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.status_port), StatusHandler)
+        threading.Thread(target=self._server.serve_forever, name="status-server", daemon=True).start()
+        print(f"[daemon] Status available at http://127.0.0.1:{self.status_port}/")
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Poll until stop() is called or the process is interrupted."""
+        if self.status_port:
+            self._start_status_server()
+        print(f"[daemon] Polling {len(self._polls)} committee(s). Press Ctrl+C to stop.")
+        try:
+            while not self._stop.is_set():
+                self._schedule_due()
+                self.write_status()
+                self._stop.wait(self.tick_seconds)
+        except KeyboardInterrupt:
+            print("\n[daemon] Stopping...")
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if self._server:
+                self._server.shutdown()
+            self.write_status()
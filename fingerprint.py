@@ -0,0 +1,368 @@
+"""
+Perceptual audio fingerprints for spotting re-posted meetings.
+
+Hosts often upload the same meeting again under a new URL, re-encoded or with a
+different amount trimmed from either end. Neither the URL nor the bytes match
+anything in the artifact cache, so it would be transcribed (and paid for)
+twice. This module fingerprints what the recording sounds like instead. It finds
+spectral peaks in the decoded audio and hashes pairs of nearby peaks by their two
+frequencies and the time between them. These landmark hashes survive re-encoding
+and volume changes. A new recording is then looked up in a local index
+(wip/fingerprints.db). Windows spread over the new recording are matched one
+by one. When they all agree on the same earlier recording and time offset, that
+recording's transcript is reused, shifted by the offset.
+
+    fp = fingerprint_file("audio.mp3")
+    match = get_index().find_match(fp)  # {"source", "transcript_path", "offset_seconds", "score", ...} or None
+
+Decoding is done by ffmpeg at 8 kHz mono, in blocks, and the peak picking is
+plain NumPy, so a six-hour meeting is fingerprinted in seconds on one core.
+
+    python fingerprint.py --audio audio.mp3 [--add SOURCE --transcript deepgram_raw.json]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wip", "fingerprints.db")
+
+RATE = 8000
+N_FFT = 1024
+HOP = 512                     # 64 ms per frame
+FREQ_NEIGHBOURHOOD = 21       # a peak is the loudest point within this many bins...
+TIME_NEIGHBOURHOOD = 15       # ...and this many frames (about a second)
+PEAKS_PER_SECOND = 12
+FAN_OUT = 6                   # each peak is paired with this many later ones
+MAX_PAIR_FRAMES = 63          # no further apart than this (about 4 s; fits 6 bits)
+BLOCK_SECONDS = 60
+
+EXCERPTS = 5                  # a lookup checks this many windows spread over the recording...
+EXCERPT_SECONDS = 60          # ...each up to this long
+MAX_HASH_ROWS = 500           # hashes this common carry no information and are skipped
+MIN_WINDOW_HASHES = 100       # windows with fewer hashes (silence) cannot vote either way
+MATCH_THRESHOLD = 0.03        # share of a window's hashes that must agree on the offset
+MIN_MATCHES = 20              # ...and at least this many of them
+MAX_MISSED_WINDOWS = 1        # informative windows allowed to disagree before it is no match
+MIN_COVERAGE = 0.97           # the earlier transcript must cover this much of the new recording
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    source          TEXT UNIQUE NOT NULL,
+    audio_path      TEXT,
+    transcript_path TEXT,
+    duration        REAL NOT NULL,
+    n_hashes        INTEGER NOT NULL,
+    created_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash            INTEGER NOT NULL,
+    recording       INTEGER NOT NULL,
+    t               INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes(hash);
+CREATE INDEX IF NOT EXISTS hashes_recording ON hashes(recording);
+"""
+
+
+def _max_filter(a, size, axis):
+    """Running maximum over `size` neighbours along axis (edges padded)."""
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (size // 2, size // 2)
+    windows = np.lib.stride_tricks.sliding_window_view(np.pad(a, pad, mode="edge"), size, axis=axis)
+    return windows.max(axis=-1)
+
+
+def _block_peaks(spectrum):
+    """(frame, bin) of the local maxima in a block of log-magnitude spectra, loudest first up to the per-second budget."""
+    neighbourhood_max = _max_filter(_max_filter(spectrum, FREQ_NEIGHBOURHOOD, 1), TIME_NEIGHBOURHOOD, 0)
+    floor = np.median(spectrum) + 1.0
+    frames, bins = np.nonzero((spectrum == neighbourhood_max) & (spectrum > floor))
+    budget = int(PEAKS_PER_SECOND * len(spectrum) * HOP / RATE) + 1
+    if len(frames) > budget:
+        loudest = np.argsort(spectrum[frames, bins])[-budget:]
+        frames, bins = frames[loudest], bins[loudest]
+    return frames, bins
+
+
+def fingerprint_pcm(blocks):
+    """
+    Fingerprint PCM given as an iterable of float32 blocks at RATE Hz.
+    Returns {"hashes", "times" (in frames), "duration" (seconds)}.
+    """
+    window = np.hanning(N_FFT).astype(np.float32)
+    carry = np.zeros(0, dtype=np.float32)
+    frame_offset = 0
+    samples_seen = 0
+    all_frames, all_bins = [], []
+    for block in blocks:
+        samples_seen += len(block)
+        samples = np.concatenate([carry, block])
+        n_frames = (len(samples) - N_FFT) // HOP + 1
+        if n_frames <= 0:
+            carry = samples
+            continue
+        frames = np.lib.stride_tricks.sliding_window_view(samples, N_FFT)[::HOP][:n_frames]
+        # Bin 0 (DC) is dropped, leaving 512 bins that fit 9 bits in a hash
+        spectrum = np.log(np.abs(np.fft.rfft(frames * window))[:, 1:N_FFT // 2 + 1] + 1e-6)
+        peak_frames, peak_bins = _block_peaks(spectrum)
+        all_frames.append(peak_frames + frame_offset)
+        all_bins.append(peak_bins)
+        frame_offset += n_frames
+        carry = samples[n_frames * HOP:]
+
+    times = np.concatenate(all_frames).astype(np.int64) if all_frames else np.zeros(0, dtype=np.int64)
+    bins = np.concatenate(all_bins).astype(np.int64) if all_bins else np.zeros(0, dtype=np.int64)
+    order = np.lexsort((bins, times))
+    times, bins = times[order], bins[order]
+
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = times[k:] - times[:-k]
+        ok = (dt > 0) & (dt <= MAX_PAIR_FRAMES)
+        hashes.append((bins[:-k][ok] << 15) | (bins[k:][ok] << 6) | dt[ok])
+        anchors.append(times[:-k][ok])
+    return {
+        "hashes": np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.int64),
+        "times": np.concatenate(anchors) if anchors else np.zeros(0, dtype=np.int64),
+        "duration": samples_seen / RATE,
+    }
+
+
+def decode_blocks(path, block_seconds=BLOCK_SECONDS):
+    """Decode path with ffmpeg to RATE Hz mono float32 blocks."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-i', path,
+        '-ac', '1', '-ar', str(RATE), '-f', 's16le', 'pipe:1',
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = int(block_seconds * RATE) * 2
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode("utf-8", errors="replace")
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not decode {path}: {stderr.strip()[-300:]}")
+
+
+def fingerprint_file(path):
+    return fingerprint_pcm(decode_blocks(path))
+
+
+def _windows(fp):
+    """The (hashes, times) of EXCERPTS windows centred on equal parts of the recording, used for lookups."""
+    frames_per_second = RATE / HOP
+    total = fp["duration"] * frames_per_second
+    length = min(EXCERPT_SECONDS * frames_per_second, total / EXCERPTS)
+    windows = []
+    for i in range(EXCERPTS):
+        start = (i + 0.5) * total / EXCERPTS - length / 2
+        keep = (fp["times"] >= start) & (fp["times"] < start + length)
+        windows.append((fp["hashes"][keep], fp["times"][keep]))
+    return windows
+
+
+def _support(votes, key):
+    # Re-encoding can move a peak by a frame, so neighbouring offsets count together
+    recording, offset = key
+    return sum(votes.get((recording, offset + d), 0) for d in (-1, 0, 1))
+
+
+class FingerprintIndex:
+    """SQLite index of recording fingerprints; safe to share between threads."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def has(self, source):
+        return bool(self._execute("SELECT 1 FROM recordings WHERE source = ?", (source,)))
+
+    def add(self, source, fp, audio_path=None, transcript_path=None):
+        """Record (or replace) the fingerprint of `source`, whose transcript is at transcript_path."""
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT id FROM recordings WHERE source = ?", (source,)).fetchall()
+            for row in old:
+                self._conn.execute("DELETE FROM hashes WHERE recording = ?", (row["id"],))
+                self._conn.execute("DELETE FROM recordings WHERE id = ?", (row["id"],))
+            cursor = self._conn.execute(
+                """
+                INSERT INTO recordings (source, audio_path, transcript_path, duration, n_hashes, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (source, audio_path, transcript_path, fp["duration"], len(fp["hashes"]), time.time()),
+            )
+            recording = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO hashes (hash, recording, t) VALUES (?, ?, ?)",
+                zip(fp["hashes"].tolist(), [recording] * len(fp["hashes"]), fp["times"].tolist()),
+            )
+
+    def _votes(self, hashes, times, excluded):
+        """Counter of (recording, offset in frames) over the index entries sharing a hash with (hashes, times)."""
+        query_times = {}
+        for h, t in zip(hashes.tolist(), times.tolist()):
+            query_times.setdefault(h, []).append(t)
+        votes = Counter()
+        unique = list(query_times)
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = self._execute(
+                f"SELECT hash, recording, t FROM hashes WHERE hash IN ({','.join('?' * len(batch))})", batch
+            )
+            per_hash = Counter(row["hash"] for row in rows)
+            for row in rows:
+                if per_hash[row["hash"]] > MAX_HASH_ROWS or row["recording"] in excluded:
+                    continue
+                for t in query_times[row["hash"]]:
+                    votes[(row["recording"], row["t"] - t)] += 1
+        return votes
+
+    def find_match(self, fp, exclude_source=None, threshold=MATCH_THRESHOLD):
+        """
+        Best earlier recording that `fp` is a copy of, or None. The returned
+        offset_seconds is how far into the earlier recording this one starts,
+        i.e. new_time = old_time - offset_seconds.
+
+        Each of the EXCERPTS windows is matched on its own, and all but
+        MAX_MISSED_WINDOWS of those with sound must agree on the same recording
+        and offset. Two meetings that only share an intro (or a recess slide
+        with music) agree in one window, not all of them. `coverage` is the
+        share of the windows that matched, capped by how much of this recording
+        the earlier one spans at that offset.
+        """
+        excluded = {row["id"] for row in self._execute("SELECT id FROM recordings WHERE source = ?", (exclude_source,))}
+        informative = [
+            (len(hashes), self._votes(hashes, times, excluded))
+            for hashes, times in _windows(fp)
+            if len(hashes) >= MIN_WINDOW_HASHES
+        ]
+        if len(informative) < 2:
+            return None
+
+        def agreeing(key):
+            return [
+                _support(votes, key) / n for n, votes in informative
+                if _support(votes, key) >= max(MIN_MATCHES, threshold * n)
+            ]
+
+        candidates = {key for _, votes in informative for key, _ in votes.most_common(3)}
+        if not candidates:
+            return None
+        best = max(candidates, key=lambda key: (len(agreeing(key)), sum(agreeing(key))))
+        scores = agreeing(best)
+        if len(scores) < 2 or len(scores) < len(informative) - MAX_MISSED_WINDOWS:
+            return None
+
+        recording, offset = best
+        rows = self._execute("SELECT * FROM recordings WHERE id = ?", (recording,))
+        if not rows:
+            return None
+        row = dict(rows[0])
+        offset_seconds = offset * HOP / RATE
+        spanned = (min(fp["duration"], row["duration"] - offset_seconds) - max(0.0, -offset_seconds)) / fp["duration"]
+        row.update(
+            offset_seconds=round(offset_seconds, 3),
+            score=round(min(scores), 3),
+            windows=f"{len(scores)}/{len(informative)}",
+            coverage=round(max(0.0, min(len(scores) / len(informative), spanned)), 3),
+        )
+        return row
+
+
+def shift_transcript(result, offset_seconds, duration):
+    """
+    Move a Deepgram-shaped result onto a recording that starts offset_seconds
+    into the one it was made from, dropping what falls outside [0, duration).
+    """
+    def shift(data):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if key in ("start", "end") and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    data[key] = round(value - offset_seconds, 3)
+                else:
+                    shift(value)
+        elif isinstance(data, list):
+            for item in data:
+                shift(item)
+
+    def inside(item):
+        return item.get("end", 0) > 0 and item.get("start", 0) < duration
+
+    shift(result)
+    results = result.get("results", result)
+    for channel in results.get("channels", []):
+        for alternative in channel.get("alternatives", []):
+            alternative["words"] = [w for w in alternative.get("words", []) if inside(w)]
+            paragraphs = alternative.get("paragraphs", {})
+            kept = []
+            for paragraph in paragraphs.get("paragraphs", []):
+                paragraph["sentences"] = [s for s in paragraph.get("sentences", []) if inside(s)]
+                if paragraph["sentences"]:
+                    paragraph["start"] = paragraph["sentences"][0]["start"]
+                    paragraph["end"] = paragraph["sentences"][-1]["end"]
+                    kept.append(paragraph)
+            if paragraphs:
+                paragraphs["paragraphs"] = kept
+    if "utterances" in results:
+        results["utterances"] = [u for u in results["utterances"] if inside(u)]
+    if "metadata" in result:
+        result["metadata"]["duration"] = duration
+    return result
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide index (database path from FINGERPRINT_DB, else wip/fingerprints.db)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex(os.environ.get("FINGERPRINT_DB") or DEFAULT_DB_PATH)
+        return _index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint a recording and look it up among earlier ones.")
+    parser.add_argument("--audio", required=True, help="Audio file to fingerprint.")
+    parser.add_argument("--add", metavar="SOURCE", help="Also add it to the index under this name.")
+    parser.add_argument("--transcript", help="With --add: the recording's transcript, for later reuse.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    fp = fingerprint_file(args.audio)
+    elapsed = time.perf_counter() - started
+    print(f"{len(fp['hashes'])} hashes for {fp['duration'] / 60:.1f} min in {elapsed:.1f}s ({fp['duration'] / elapsed:.0f}x realtime)")
+    print(json.dumps(get_index().find_match(fp, exclude_source=args.add), indent=2))
+    if args.add:
+        get_index().add(args.add, fp, args.audio, args.transcript)
+        print(f"Added {args.add} to {get_index().db_path}")
@@ -0,0 +1,277 @@
+"""
+Parallel downloader for HLS (m3u8) archive streams.
+
+yt-dlp and ffmpeg fetch an HLS playlist one segment after another, so a
+multi-hour Granicus archive is limited by per-request latency rather than
+bandwidth. This module parses the playlist itself, fetches segments with a
+bounded pool of workers (each retried on its own), and keeps finished segments
+in a work folder next to the output, so an interrupted download resumes where it
+stopped. The segments are then fed to a single ffmpeg run, in playlist order, that
+demuxes and encodes the audio.
+
+    python hlsfetch.py --url ".../playlist.m3u8" --output audio.mp3 --workers 8
+
+Encrypted and byte-range playlists are not handled; they raise HLSUnsupported
+so the caller can fall back to yt-dlp.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from videotools import (
+    DEFAULT_PROFILE, LISTED_DURATION_TOLERANCE, DownloadLog, IncompleteDownload,
+    audio_filename, check_audio, ffmpeg_audio_command, report_progress, run_ffmpeg,
+)
+
+DEFAULT_WORKERS = 8
+SEGMENT_RETRIES = 4
+REQUEST_TIMEOUT = 30
+
+
+class HLSUnsupported(Exception):
+    """The playlist uses a feature this downloader does not handle."""
+
+
+def _attributes(line):
+    """Parse 'KEY=value,KEY2="quoted,value"' from an #EXT tag line."""
+    attrs = {}
+    text = line.split(':', 1)[1] if ':' in line else ''
+    key, value, quoted, field = '', '', False, 'key'
+    for char in text + ',':
+        if field == 'key':
+            if char == '=':
+                field = 'value'
+            else:
+                key += char
+        elif char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            attrs[key.strip().upper()] = value
+            key, value, field = '', '', 'key'
+        else:
+            value += char
+    return attrs
+
+
+def parse_playlist(text, base_url):
+    """
+    Parse an m3u8 playlist.
+
+    Returns ('master', [(bandwidth, url), ...]) for a master playlist, or
+    ('media', {'segments': [(duration, url), ...], 'init': url or None}).
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or lines[0] != '#EXTM3U':
+        raise ValueError("Not an m3u8 playlist")
+
+    if any(line.startswith('#EXT-X-STREAM-INF') for line in lines):
+        variants = []
+        for i, line in enumerate(lines):
+            if line.startswith('#EXT-X-STREAM-INF') and i + 1 < len(lines):
+                bandwidth = int(_attributes(line).get('BANDWIDTH', 0) or 0)
+                variants.append((bandwidth, urljoin(base_url, lines[i + 1])))
+        return 'master', variants
+
+    segments = []
+    init = None
+    duration = None
+    for line in lines:
+        if line.startswith('#EXT-X-KEY'):
+            if _attributes(line).get('METHOD', 'NONE') != 'NONE':
+                raise HLSUnsupported("Encrypted HLS playlist")
+        elif line.startswith('#EXT-X-BYTERANGE'):
+            raise HLSUnsupported("Byte-range HLS playlist")
+        elif line.startswith('#EXT-X-MAP'):
+            init = urljoin(base_url, _attributes(line)['URI'])
+        elif line.startswith('#EXTINF'):
+            duration = float(line.split(':', 1)[1].split(',', 1)[0])
+        elif not line.startswith('#'):
+            segments.append((duration, urljoin(base_url, line)))
+            duration = None
+    return 'media', {'segments': segments, 'init': init}
+
+
+def _session(workers):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def resolve_media_playlist(session, playlist_url, variant='lowest'):
+    """Follow a master playlist to one media playlist ('lowest' or 'highest' bandwidth)."""
+    response = session.get(playlist_url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    kind, parsed = parse_playlist(response.text, response.url)
+    if kind == 'media':
+        return parsed
+    if not parsed:
+        raise ValueError(f"Master playlist has no variants: {playlist_url}")
+    # All variants of an archive carry the same audio, so the smallest one is enough
+    bandwidth, url = min(parsed) if variant == 'lowest' else max(parsed)
+    response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    kind, parsed = parse_playlist(response.text, response.url)
+    if kind != 'media':
+        raise HLSUnsupported("Nested master playlists")
+    return parsed
+
+
+def _fetch_segment(session, url, path, retries=SEGMENT_RETRIES):
+    """Download one segment to path via a .part file; an existing path is kept as complete."""
+    if os.path.exists(path):
+        return path
+    temp_path = f"{path}.part"
+    for attempt in range(1, retries + 1):
+        try:
+            with session.get(url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                expected = response.headers.get('Content-Length')
+                received = 0
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=256 * 1024):
+                        f.write(chunk)
+                        received += len(chunk)
+            if expected is not None and received != int(expected):
+                raise IncompleteDownload(f"segment {url}: got {received} of {expected} bytes")
+            os.replace(temp_path, path)
+            return path
+        except (requests.RequestException, OSError, IncompleteDownload):
+            if attempt == retries:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+# Wowza (Granicus) names segments per viewing session, e.g. media_w123456789_12.ts
+_SESSION_TOKEN = re.compile(r'_w\d+(?=[_./]|$)')
+
+
+def segment_key(url):
+    """A segment's URL without its query string and session token, stable across sessions."""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{_SESSION_TOKEN.sub('', parts.path)}"
+
+
+def _manifest(urls, durations):
+    return [[segment_key(url), duration] for url, duration in zip(urls, durations)]
+
+
+def fetch_segments(playlist_url, work_dir, workers=DEFAULT_WORKERS, variant='lowest', session=None, log=None, progress=None):
+    """
+    Download every segment of an HLS stream into work_dir. Returns their paths
+    in playlist order (init segment first, if any) and the playlist's total
+    duration in seconds (None if it lists none). Segments already in work_dir
+    from an earlier, interrupted run are not fetched again. Each finished
+    segment is reported to progress() as a 'download' update.
+    """
+    log = log or DownloadLog(None)
+    session = session or _session(workers)
+    media = resolve_media_playlist(session, playlist_url, variant)
+    urls = ([media['init']] if media['init'] else []) + [url for _, url in media['segments']]
+    if not urls:
+        raise ValueError(f"Playlist has no segments: {playlist_url}")
+
+    # The manifest ties the numbered segment files to their segments, by URL
+    # (minus the per-session token and query a resumed run gets new ones of)
+    # and duration; a different playlist means the files on disk are not ours to reuse.
+    os.makedirs(work_dir, exist_ok=True)
+    manifest_path = os.path.join(work_dir, 'segments.json')
+    manifest = _manifest(urls, ([None] if media['init'] else []) + [duration for duration, _ in media['segments']])
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous != manifest:
+            shutil.rmtree(work_dir)
+            os.makedirs(work_dir)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    paths = [os.path.join(work_dir, f"seg_{i:05d}") for i in range(len(urls))]
+    reused = [path for path in paths if os.path.exists(path)]
+    if reused:
+        log.write(f"Resuming HLS download: {len(reused)} of {len(urls)} segments already on disk.")
+
+    started = time.monotonic()
+    bytes_done = sum(os.path.getsize(path) for path in reused)
+    segments_done = len(reused)
+    new_bytes = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(_fetch_segment, session, url, path)
+            for url, path in zip(urls, paths) if path not in reused
+        ]
+        for future in as_completed(futures):
+            size = os.path.getsize(future.result())
+            bytes_done += size
+            new_bytes += size
+            segments_done += 1
+            report_progress(
+                progress, 'download', started, bytes_done=bytes_done, new_bytes=new_bytes,
+                segments_done=segments_done, segments_total=len(urls),
+            )
+
+    durations = [duration for duration, _ in media['segments']]
+    total_duration = sum(durations) if all(d is not None for d in durations) else None
+    return paths, total_duration
+
+
+def download_hls_audio(
+    playlist_url, output_filename, profile=DEFAULT_PROFILE, workers=DEFAULT_WORKERS,
+    expected_duration=None, log=None, progress=None,
+):
+    """
+    Fetch an HLS stream with parallel segment downloads and extract its audio
+    with `profile`. Returns the final file name. Finished segments are kept in
+    '<output>.segments/' until the audio has been written, so a failed run can
+    be resumed by calling this again. The audio must match the playlist's
+    total duration (or expected_duration, if the playlist has none) before it
+    is put in place. `log` and `progress` are as for videotools.download_audio.
+    """
+    final_filename = audio_filename(output_filename, profile)
+    base_filename = final_filename.rsplit('.', 1)[0]
+    work_dir = f"{base_filename}.segments"
+    temp_filename = f"{base_filename}.part.{final_filename.rsplit('.', 1)[1]}"
+
+    paths, playlist_duration = fetch_segments(playlist_url, work_dir, workers, log=log, progress=progress)
+
+    # The segments are concatenated into ffmpeg's stdin in playlist order, which
+    # works for MPEG-TS and for fMP4 with its init segment, without a joined copy on disk.
+    cmd = ffmpeg_audio_command('pipe:0', temp_filename, profile)
+    returncode = run_ffmpeg(cmd, log, progress, input_paths=paths)
+    if returncode != 0 or not os.path.exists(temp_filename):
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise RuntimeError(f"ffmpeg failed to extract audio from {len(paths)} HLS segments")
+    try:
+        if playlist_duration:
+            check_audio(temp_filename, playlist_duration)
+        else:
+            check_audio(temp_filename, expected_duration, LISTED_DURATION_TOLERANCE)
+    except IncompleteDownload:
+        os.remove(temp_filename)
+        raise
+
+    shutil.move(temp_filename, final_filename)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return final_filename
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Download the audio of an HLS stream with parallel segment fetches.")
+    parser.add_argument('--url', required=True, help="m3u8 playlist URL.")
+    parser.add_argument('--output', default="temp_audio.mp3", help="Output audio file.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Segments fetched in parallel.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = download_hls_audio(args.url, args.output, workers=args.workers)
+    print(f"Wrote {result} in {time.perf_counter() - started:.1f}s")
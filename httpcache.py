@@ -0,0 +1,196 @@
+"""
+Small on-disk HTTP cache for scraping pages that rarely change.
+
+Each cached URL is stored as a body file plus a JSON metadata file holding the
+validators (ETag / Last-Modified) and when it was last fetched. A response is
+served straight from disk while it is younger than the TTL of its URL class;
+after that the cache revalidates with If-None-Match / If-Modified-Since, so an
+unchanged page costs a 304 instead of a full download. The cache is bounded by
+total size and evicts the least recently used entries first.
+
+    cache = HTTPCache("wip/http_cache", ttl_rules=[(r"MediaPlayer\\.php", 30 * 86400)])
+    response = cache.get(session, url)
+    print(cache.stats())
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class CachedResponse:
+    """The subset of requests.Response that the scrapers use."""
+
+    def __init__(self, url, status_code, content, headers, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self):
+        """The charset requests would pick: Content-Type's, else its default for the media type."""
+        return requests.utils.get_encoding_from_headers(CaseInsensitiveDict(self.headers)) or 'utf-8'
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(self.encoding, errors='replace')
+        except LookupError:  # a charset Python does not know
+            return self.content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+
+class HTTPCache:
+    """
+    Conditional-request cache keyed by URL.
+
+    ttl_rules is a list of (regex, seconds) checked in order against the URL;
+    the first match decides how long an entry is served without revalidation.
+    """
+
+    def __init__(self, cache_dir, ttl_rules=None, default_ttl=0, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or [])]
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def stats(self):
+        total = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.revalidated) / total, 3) if total else 0.0,
+        }
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.body", f"{base}.json"
+
+    def _load(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _store(self, url, meta, body):
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        for path, data, mode in ((body_path, body, 'wb'), (meta_path, json.dumps(meta), 'w')):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(body) - old_size
+        self._evict_if_needed()
+
+    def _touch(self, url):
+        body_path, _ = self._paths(url)
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            if self._total_bytes <= self.max_bytes:
+                return
+            # Least recently used first (bodies are touched on every hit)
+            for mtime, size, body_path in sorted(self._entries()):
+                if self._total_bytes <= self.max_bytes * 0.9:
+                    break
+                for path in (body_path, body_path[:-len('.body')] + '.json'):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._total_bytes -= size
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.body'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def get(self, session, url, **kwargs):
+        """GET url through `session`, answering from the cache whenever possible."""
+        meta, body = self._load(url)
+        now = time.time()
+
+        if meta is not None and now - meta['fetched_at'] < self.ttl_for(url):
+            with self._lock:
+                self.hits += 1
+            self._touch(url)
+            return CachedResponse(url, meta['status_code'], body, meta['headers'], from_cache=True)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if meta is not None:
+            if meta['headers'].get('ETag'):
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            with self._lock:
+                self.revalidated += 1
+            meta['fetched_at'] = now
+            self._store(url, meta, body)
+            return CachedResponse(url, meta['status_code'], body, meta['headers'], from_cache=True)
+
+        with self._lock:
+            self.misses += 1
+        kept_headers = {
+            name: response.headers[name]
+            for name in ('Content-Type', 'ETag', 'Last-Modified')
+            if name in response.headers
+        }
+        cacheable = response.status_code == 200 and (
+            self.ttl_for(url) > 0 or 'ETag' in kept_headers or 'Last-Modified' in kept_headers
+        )
+        if cacheable:
+            self._store(
+                url,
+                {'url': url, 'status_code': 200, 'headers': kept_headers, 'fetched_at': now},
+                response.content,
+            )
+        return CachedResponse(url, response.status_code, response.content, kept_headers, from_cache=False)
@@ -0,0 +1,411 @@
+"""
+Persistent job/state store for factory runs.
+
+One row per meeting in `jobs` and one row per (meeting, stage) in `stages`,
+holding the stage status, attempt count, timings and the size/modification
+time of the artifact it produced. factory.py consults the store instead of trusting
+whatever happens to exist under wip/, so an artifact left half-written by a
+crash is redone rather than used, and pending work can be listed without
+walking the directory tree.
+
+Usage:
+    python jobstore.py --pending
+    python jobstore.py --report
+    python jobstore.py --dead
+    python jobstore.py --requeue all
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    scope       TEXT,
+    committee   TEXT,
+    date        TEXT,
+    spec        TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    retry_at    REAL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    job_id      TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    started_at  REAL,
+    finished_at REAL,
+    seconds     REAL,
+    artifact    TEXT,
+    size        INTEGER,
+    mtime       REAL,
+    sha256      TEXT,
+    error       TEXT,
+    PRIMARY KEY (job_id, stage)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+"""
+
+# Columns added after the first release, applied to older databases on open
+MIGRATIONS = [
+    ("jobs", "scope", "ALTER TABLE jobs ADD COLUMN scope TEXT"),
+    ("jobs", "retry_at", "ALTER TABLE jobs ADD COLUMN retry_at REAL"),
+    ("stages", "mtime", "ALTER TABLE stages ADD COLUMN mtime REAL"),
+]
+INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_scope ON jobs(scope, status, date);
+"""
+
+# Job dict keys that are not worth persisting (recomputed when the job is prepared)
+_TRANSIENT_KEYS = {"job_id"}
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _artifact_is_valid(path):
+    """Cheap sanity check used before adopting an artifact the store has never seen."""
+    if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    if path.endswith(".json"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                json.load(f)
+        except (ValueError, OSError):
+            return False
+    return True
+
+
+class JobStore:
+    """Thread-safe wrapper around the factory's SQLite state database."""
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            for table, column, sql in MIGRATIONS:
+                columns = [row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+                if column not in columns:
+                    self._conn.execute(sql)
+            self._conn.executescript(INDEXES)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- Jobs ---
+
+    def upsert_job(self, job):
+        """Record (or refresh) a meeting job. `job` is the dict built by factory.prepare_meeting."""
+        now = time.time()
+        spec = json.dumps({k: v for k, v in job.items() if k not in _TRANSIENT_KEYS})
+        self._execute(
+            """
+            INSERT INTO jobs (job_id, scope, committee, date, spec, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                scope = excluded.scope, spec = excluded.spec, updated_at = excluded.updated_at
+            """,
+            (job["job_id"], job.get("scope"), job.get("committee"), job.get("date"), spec, now, now),
+        )
+
+    def set_job_status(self, job_id, status):
+        self._execute(
+            """
+            UPDATE jobs SET status = ?, updated_at = ?,
+                retry_at = CASE WHEN ? IN ('running', 'done') THEN NULL ELSE retry_at END
+            WHERE job_id = ?
+            """,
+            (status, time.time(), status, job_id),
+        )
+
+    def get_job(self, job_id):
+        rows = self._execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def pending_jobs(self, ready_only=False):
+        """
+        Return the job dicts of every meeting that has not finished, oldest first.
+        Dead-lettered meetings are left out; with `ready_only`, so are meetings
+        still backing off after a failure.
+        """
+        rows = self._execute(
+            """
+            SELECT job_id, spec FROM jobs
+            WHERE status NOT IN ('done', 'dead') AND (? = 0 OR COALESCE(retry_at, 0) <= ?)
+            ORDER BY created_at
+            """,
+            (1 if ready_only else 0, time.time()),
+        )
+        jobs = []
+        for row in rows:
+            job = json.loads(row["spec"])
+            job["job_id"] = row["job_id"]
+            jobs.append(job)
+        return jobs
+
+    def is_blocked(self, job_id):
+        """True if a meeting is dead-lettered or still backing off after a failure."""
+        job = self.get_job(job_id)
+        if not job:
+            return False
+        return job["status"] == "dead" or (job["retry_at"] or 0) > time.time()
+
+    def schedule_retry(self, job_id, retry_at):
+        self._execute(
+            "UPDATE jobs SET status = 'failed', retry_at = ?, updated_at = ? WHERE job_id = ?",
+            (retry_at, time.time(), job_id),
+        )
+
+    def mark_dead(self, job_id):
+        """Move a meeting to the dead-letter list; it is not retried until requeued."""
+        self.set_job_status(job_id, "dead")
+
+    def dead_jobs(self):
+        rows = self._execute(
+            """
+            SELECT j.job_id, j.updated_at, s.stage, s.attempts, s.error
+            FROM jobs j LEFT JOIN stages s ON s.job_id = j.job_id AND s.status = 'failed'
+            WHERE j.status = 'dead' ORDER BY j.updated_at
+            """
+        )
+        return [dict(row) for row in rows]
+
+    def requeue(self, job_id=None):
+        """Return dead-lettered meetings (one, or all) to the pending list with fresh attempt counts."""
+        where, params = ("WHERE status = 'dead'", ()) if job_id is None else ("WHERE job_id = ? AND status = 'dead'", (job_id,))
+        with self._lock, self._conn:
+            ids = [row[0] for row in self._conn.execute(f"SELECT job_id FROM jobs {where}", params)]
+            for jid in ids:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'pending', retry_at = NULL, updated_at = ? WHERE job_id = ?",
+                    (time.time(), jid),
+                )
+                self._conn.execute(
+                    "UPDATE stages SET attempts = 0 WHERE job_id = ? AND status != 'done'", (jid,)
+                )
+        return ids
+
+    def watermark(self, scope):
+        """
+        The high-water mark for a committee folder (`scope`): the newest meeting
+        date that has finished with nothing older still unfinished, or None.
+
+        Meetings older than the watermark never need to be listed again; an
+        unfinished older meeting holds the mark back until it completes or is
+        dead-lettered.
+        """
+        rows = self._execute(
+            """
+            SELECT MAX(date) AS mark FROM jobs
+            WHERE scope = ? AND status = 'done' AND date < COALESCE(
+                (SELECT MIN(date) FROM jobs WHERE scope = ? AND status NOT IN ('done', 'dead')), '9999-99-99')
+            """,
+            (scope, scope),
+        )
+        return rows[0]["mark"] if rows else None
+
+    # --- Stages ---
+
+    def get_stage(self, job_id, stage):
+        rows = self._execute(
+            "SELECT * FROM stages WHERE job_id = ? AND stage = ?", (job_id, stage)
+        )
+        return dict(rows[0]) if rows else None
+
+    def stage_done(self, job_id, stage, artifact=None, verify=False):
+        """
+        True if `stage` completed for this job and its artifact is intact.
+
+        The artifact's size and modification time are always re-checked;
+        `verify=True` also hashes it. Hashing a multi-hour audio file is slow, so
+        it is only done when asked for: the first verify records the hash of the
+        unchanged file and later ones compare against it.
+        An artifact the store has no record of (e.g. produced before the store
+        existed) is adopted if it passes a basic validity check. A stage whose
+        recorded artifact is not the one asked for (e.g. audio of another
+        --audio-profile) is not done.
+        """
+        row = self.get_stage(job_id, stage)
+        if row is None:
+            if artifact and _artifact_is_valid(artifact):
+                self.finish_stage(job_id, stage, artifact, started_at=None)
+                return True
+            return False
+        if row["status"] != "done":
+            return False
+        path = row["artifact"]
+        if not path:
+            return True
+        if artifact and os.path.abspath(path) != os.path.abspath(artifact):
+            return False
+        if not os.path.exists(path) or os.path.getsize(path) != row["size"]:
+            return False
+        if row["mtime"] is not None and os.path.getmtime(path) != row["mtime"]:
+            return False
+        if verify:
+            sha = file_sha256(path)
+            if row["sha256"] is None:
+                self._execute(
+                    "UPDATE stages SET sha256 = ? WHERE job_id = ? AND stage = ?", (sha, job_id, stage)
+                )
+            elif sha != row["sha256"]:
+                return False
+        return True
+
+    def start_stage(self, job_id, stage):
+        now = time.time()
+        self._execute(
+            """
+            INSERT INTO stages (job_id, stage, status, attempts, started_at)
+            VALUES (?, ?, 'running', 1, ?)
+            ON CONFLICT(job_id, stage) DO UPDATE SET
+                status = 'running', attempts = attempts + 1, started_at = excluded.started_at,
+                finished_at = NULL, seconds = NULL, error = NULL
+            """,
+            (job_id, stage, now),
+        )
+        self.set_job_status(job_id, "running")
+        return now
+
+    def finish_stage(self, job_id, stage, artifact=None, started_at=None):
+        now = time.time()
+        size = mtime = None
+        if artifact and os.path.exists(artifact):
+            size = os.path.getsize(artifact)
+            mtime = os.path.getmtime(artifact)
+        else:
+            artifact = None
+        seconds = now - started_at if started_at else None
+        self._execute(
+            """
+            INSERT INTO stages (job_id, stage, status, attempts, started_at, finished_at, seconds, artifact, size, mtime)
+            VALUES (?, ?, 'done', 0, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id, stage) DO UPDATE SET
+                status = 'done', finished_at = excluded.finished_at, seconds = excluded.seconds,
+                artifact = excluded.artifact, size = excluded.size, mtime = excluded.mtime,
+                sha256 = NULL, error = NULL
+            """,
+            (job_id, stage, started_at, now, seconds, artifact, size, mtime),
+        )
+
+    def invalidate_stages(self, job_id, stages):
+        """Mark stages as stale (e.g. because an upstream artifact was rebuilt) so they rerun."""
+        for stage in stages:
+            self._execute(
+                "UPDATE stages SET status = 'stale' WHERE job_id = ? AND stage = ?",
+                (job_id, stage),
+            )
+
+    def wait_stage(self, job_id, stage):
+        """Mark a running stage as handed off to an outside service (e.g. a Deepgram callback) and not yet finished."""
+        self._execute(
+            "UPDATE stages SET status = 'waiting' WHERE job_id = ? AND stage = ? AND status = 'running'",
+            (job_id, stage),
+        )
+
+    def fail_stage(self, job_id, stage, error):
+        self._execute(
+            """
+            UPDATE stages SET status = 'failed', finished_at = ?, error = ?
+            WHERE job_id = ? AND stage = ?
+            """,
+            (time.time(), str(error)[:2000], job_id, stage),
+        )
+        self.set_job_status(job_id, "failed")
+
+    # --- Reporting ---
+
+    def stage_report(self):
+        """Per-stage counts, mean duration and artifact throughput for timed runs."""
+        rows = self._execute(
+            """
+            SELECT stage,
+                   SUM(status = 'done')    AS done,
+                   SUM(status = 'failed')  AS failed,
+                   SUM(status IN ('running', 'waiting')) AS running,
+                   SUM(attempts)           AS attempts,
+                   AVG(seconds)            AS mean_seconds,
+                   SUM(seconds)            AS total_seconds,
+                   SUM(CASE WHEN seconds IS NOT NULL THEN size END) AS timed_bytes
+            FROM stages GROUP BY stage
+            """
+        )
+        report = {}
+        for row in rows:
+            total = row["total_seconds"] or 0.0
+            timed_bytes = row["timed_bytes"] or 0
+            report[row["stage"]] = {
+                "done": row["done"],
+                "failed": row["failed"],
+                "running": row["running"],
+                "attempts": row["attempts"],
+                "mean_seconds": round(row["mean_seconds"] or 0.0, 1),
+                "jobs_per_hour": round(3600 * row["done"] / total, 2) if total else None,
+                "mb_per_second": round(timed_bytes / total / 1e6, 3) if total else None,
+            }
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the factory job database.")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "wip", "factory.db"))
+    parser.add_argument("--pending", action="store_true", help="List meetings that have not finished.")
+    parser.add_argument("--report", action="store_true", help="Show per-stage throughput.")
+    parser.add_argument("--dead", action="store_true", help="List dead-lettered meetings.")
+    parser.add_argument("--requeue", metavar="JOB_ID", help="Return a dead-lettered meeting (or 'all') to the pending list.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No job database at {args.db}")
+        return
+
+    store = JobStore(args.db)
+    if args.requeue:
+        ids = store.requeue(None if args.requeue == "all" else args.requeue)
+        print(f"Requeued {len(ids)} meeting(s).")
+    if args.dead:
+        dead = store.dead_jobs()
+        print(f"{len(dead)} dead-lettered meeting(s):")
+        for row in dead:
+            print(f"  {row['job_id']:<70} {row['stage'] or '-':<11} tries={row['attempts'] or 0}  {(row['error'] or '')[:80]}")
+    if args.pending or not (args.report or args.dead or args.requeue):
+        pending = store.pending_jobs()
+        print(f"{len(pending)} pending meeting(s):")
+        for job in pending:
+            row = store.get_job(job["job_id"])
+            updated = datetime.fromtimestamp(row["updated_at"]).strftime("%Y-%m-%d %H:%M")
+            print(f"  {job['job_id']:<70} {row['status']:<8} (updated {updated})")
+    if args.report:
+        print(f"{'stage':<12}{'done':>6}{'failed':>8}{'running':>9}{'tries':>7}{'mean s':>10}{'jobs/h':>12}{'MB/s':>10}")
+        for stage, r in store.stage_report().items():
+            print(
+                f"{stage:<12}{r['done']:>6}{r['failed']:>8}{r['running']:>9}{r['attempts']:>7}"
+                f"{r['mean_seconds']:>10}{str(r['jobs_per_hour'] or '-'):>12}{str(r['mb_per_second'] or '-'):>10}"
+            )
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Local CPU speech-to-text backend (transcription.transcribe_audio(..., backend="local")).
+
+Transcribes with faster-whisper (CTranslate2, int8 on the CPU) and labels
+speakers with a small NumPy diarizer. The result has the same shape as
+Deepgram's (words, utterances, and paragraphs of sentences with speaker
+numbers), so meetingreporter consumes it unchanged. Re-transcriptions then cost
+no API calls, and meetings can still be processed while Deepgram is down.
+
+faster-whisper is optional: `pip install faster-whisper`. Models are
+downloaded on first use. LOCAL_ASR_MODEL selects one (default small.en), and
+LOCAL_ASR_THREADS limits the cores used. The decoded audio is kept in memory,
+about 230 MB per hour of meeting (see load_audio).
+
+The diarizer is deliberately simple. It clusters 1.5 s windows of speech by
+their spectral envelope, with no neural speaker model. It separates voices
+well in a quiet council chamber but can merge similar ones. That is usually
+acceptable here, because speaker names are assigned later by the LLM from
+what is said.
+
+    python localasr.py --audio meeting.mp3 --output deepgram_raw.json
+    python localasr.py --audio meeting.mp3 --benchmark --seconds 600
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+DEFAULT_MODEL = "small.en"
+BATCH_SIZE = 8                 # audio windows decoded together per forward pass
+PARAGRAPH_GAP_SECONDS = 3.0    # a pause this long starts a new paragraph
+
+# Diarization
+FRAME = 400                    # 25 ms analysis frames...
+HOP = 160                      # ...every 10 ms
+N_FFT = 512
+N_BANDS = 32
+WINDOW_SECONDS = 1.5           # speaker labels are assigned per window
+SPEAKER_SIMILARITY = 0.55      # cosine similarity above which two clusters are one voice
+MIN_SPEAKER_SHARE = 0.02       # clusters smaller than this share of speech are folded into the nearest
+MAX_SPEAKERS = 20
+
+_SENTENCE_END = re.compile(r"[.?!][\"')\]]*$")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _threads():
+    return int(os.environ.get("LOCAL_ASR_THREADS") or os.cpu_count() or 1)
+
+
+def _faster_whisper():
+    try:
+        import faster_whisper
+    except ImportError:
+        raise ImportError("The local transcription backend needs faster-whisper: pip install faster-whisper")
+    return faster_whisper
+
+
+def get_model():
+    """Return the process-wide batched faster-whisper pipeline, loading the model on first use."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            faster_whisper = _faster_whisper()
+            model = faster_whisper.WhisperModel(
+                os.environ.get("LOCAL_ASR_MODEL") or DEFAULT_MODEL,
+                device="cpu", compute_type="int8", cpu_threads=_threads(),
+            )
+            _model = faster_whisper.BatchedInferencePipeline(model=model)
+        return _model
+
+
+def load_audio(path, seconds=None):
+    """
+    Decode path to 16 kHz mono float32 PCM (via faster-whisper's PyAV decoder).
+
+    The whole recording is held in memory, since recognize and diarize both
+    index into it: 64 KB per second of audio, about 230 MB an hour and 1.4 GB
+    for a six-hour meeting. Pass `seconds` (or split the audio first) to stay
+    under that on small machines.
+    """
+    pcm = _faster_whisper().decode_audio(path, sampling_rate=SAMPLE_RATE)
+    if seconds:
+        pcm = pcm[:int(seconds * SAMPLE_RATE)]
+    return pcm
+
+
+def recognize(pcm, batch_size=BATCH_SIZE):
+    """Run ASR over the PCM; returns Deepgram-style word dicts (without speakers) in time order."""
+    segments, _ = get_model().transcribe(pcm, batch_size=batch_size, word_timestamps=True)
+    words = []
+    for segment in segments:
+        for w in segment.words or []:
+            text = w.word.strip()
+            if not text:
+                continue
+            words.append({
+                "word": re.sub(r"[^\w'-]", "", text).lower() or text.lower(),
+                "start": round(w.start, 3),
+                "end": round(w.end, 3),
+                "confidence": round(w.probability, 4),
+                "punctuated_word": text,
+            })
+    return words
+
+
+# --- Diarization ---
+
+def _mel_filterbank(n_bands=N_BANDS, n_fft=N_FFT, sample_rate=SAMPLE_RATE, low=100.0, high=7600.0):
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    edges = to_hz(np.linspace(to_mel(low), to_mel(high), n_bands + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    bank = np.zeros((n_bands, len(bins)), dtype=np.float32)
+    for i in range(n_bands):
+        left, centre, right = edges[i], edges[i + 1], edges[i + 2]
+        rising = (bins - left) / (centre - left)
+        falling = (right - bins) / (right - centre)
+        bank[i] = np.clip(np.minimum(rising, falling), 0.0, None)
+    return bank
+
+
+def _log_bands(samples, n_frames, bank, taper):
+    """Log mel band energies of n_frames consecutive frames of samples (zero-padded as needed)."""
+    needed = (n_frames - 1) * HOP + FRAME
+    if len(samples) < needed:
+        samples = np.pad(samples, (0, needed - len(samples)))
+    frames = np.lib.stride_tricks.sliding_window_view(samples[:needed], FRAME)[::HOP]
+    power = np.abs(np.fft.rfft(frames * taper, n=N_FFT)) ** 2
+    return np.log(power @ bank.T + 1e-10)
+
+
+def _pool(bands):
+    """Mean and spread over frames (axis 1) of band energies, using only each row's louder half of frames."""
+    # Pauses between syllables carry no voice
+    energy = bands.max(axis=2)
+    voiced = (energy >= np.median(energy, axis=1, keepdims=True))[:, :, None]
+    n_voiced = voiced.sum(axis=1)
+    mean = (bands * voiced).sum(axis=1) / n_voiced
+    spread = np.sqrt(((bands - mean[:, None, :]) ** 2 * voiced).sum(axis=1) / n_voiced)
+    return np.concatenate([mean, spread], axis=1).astype(np.float32)
+
+
+def window_features(pcm, window_seconds=WINDOW_SECONDS, block_windows=200):
+    """
+    Spectral-envelope features for consecutive windows of the PCM: the mean and
+    spread of log mel band energies over each window's frames. Computed a
+    block of windows at a time, so memory does not grow with meeting length.
+    """
+    frames_per_window = int(window_seconds * SAMPLE_RATE / HOP)
+    window_samples = frames_per_window * HOP
+    n_windows = len(pcm) // window_samples
+    bank = _mel_filterbank()
+    taper = np.hanning(FRAME).astype(np.float32)
+    features = np.zeros((n_windows, 2 * N_BANDS), dtype=np.float32)
+
+    for first in range(0, n_windows, block_windows):
+        count = min(block_windows, n_windows - first)
+        block = pcm[first * window_samples:(first + count) * window_samples + FRAME]
+        bands = _log_bands(block, count * frames_per_window, bank, taper)
+        features[first:first + count] = _pool(bands.reshape(count, frames_per_window, N_BANDS))
+    return features
+
+
+def span_features(pcm, spans):
+    """window_features for arbitrary (start, end) spans in seconds, e.g. single words."""
+    bank = _mel_filterbank()
+    taper = np.hanning(FRAME).astype(np.float32)
+    features = np.zeros((len(spans), 2 * N_BANDS), dtype=np.float32)
+    for i, (start, end) in enumerate(spans):
+        first = max(0, int(start * SAMPLE_RATE))
+        n_frames = max(4, int((end - start) * SAMPLE_RATE / HOP))
+        features[i] = _pool(_log_bands(pcm[first:first + n_frames * HOP + FRAME], n_frames, bank, taper)[None])[0]
+    return features
+
+
+def _normalize(x):
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-8)
+
+
+def cluster_speakers(features, similarity=SPEAKER_SIMILARITY, min_share=MIN_SPEAKER_SHARE, max_speakers=MAX_SPEAKERS):
+    """
+    Label feature rows by speaker: leader clustering, k-means refinement, then
+    merging of near-duplicate clusters. Returns (labels, scores), where
+    scores(other_features) gives each row's similarity to every speaker.
+    """
+    if len(features) == 0:
+        return np.zeros(0, dtype=int), lambda other: np.zeros((len(other), 0))
+    centre, scale = features.mean(axis=0), features.std(axis=0) + 1e-8
+
+    def standardize(rows):
+        return _normalize((rows - centre) / scale)
+
+    x = standardize(features)
+
+    # One pass of leader clustering picks the initial voices and their number
+    centroids = [x[0]]
+    for row in x[1:]:
+        if max(np.dot(c, row) for c in centroids) < similarity and len(centroids) < max_speakers:
+            centroids.append(row)
+    centroids = np.array(centroids)
+
+    for _ in range(10):
+        labels = np.argmax(x @ centroids.T, axis=1)
+        counts = np.bincount(labels, minlength=len(centroids))
+        keep = counts >= max(1, min_share * len(x))
+        if not keep.any():
+            keep = counts == counts.max()
+        centroids = _normalize(np.array([x[labels == k].mean(axis=0) for k in np.flatnonzero(keep)]))
+
+        # Merge the closest pair of voices while they are too similar to tell apart
+        while len(centroids) > 1:
+            sims = centroids @ centroids.T
+            np.fill_diagonal(sims, -1.0)
+            i, j = np.unravel_index(np.argmax(sims), sims.shape)
+            if sims[i, j] < similarity:
+                break
+            merged = _normalize((centroids[i] + centroids[j])[None, :])[0]
+            centroids = np.vstack([np.delete(centroids, [i, j], axis=0), merged])
+
+    labels = np.argmax(x @ centroids.T, axis=1)
+    # Speakers take turns over seconds, not single windows: smooth isolated flips
+    for i in range(1, len(labels) - 1):
+        if labels[i - 1] == labels[i + 1] != labels[i]:
+            labels[i] = labels[i - 1]
+    # Number speakers in order of first appearance, as Deepgram does
+    order = []
+    for label in labels:
+        if label not in order:
+            order.append(label)
+    centroids = centroids[order]
+    labels = np.array([order.index(label) for label in labels], dtype=int)
+    return labels, lambda other: standardize(other) @ centroids.T
+
+
+def diarize(pcm, words, window_seconds=WINDOW_SECONDS):
+    """
+    Set a "speaker" on every word, from clustering the windows that contain
+    speech. Words in a window next to a change of speaker are then decided
+    one by one between the speakers on either side, since the window itself
+    straddles both voices.
+    """
+    if not words:
+        return words
+    features = window_features(pcm, window_seconds)
+    n_windows = len(features)
+    speech = np.zeros(n_windows, dtype=bool)
+    for w in words:
+        first = int(w["start"] / window_seconds)
+        last = int(w["end"] / window_seconds)
+        speech[max(0, first):min(n_windows, last + 1)] = True
+    speech_index = np.flatnonzero(speech)
+    if len(speech_index) == 0:
+        for w in words:
+            w["speaker"] = 0
+        return words
+
+    labels, scores = cluster_speakers(features[speech_index])
+    boundary_words, candidates = [], []
+    for w in words:
+        window = int((w["start"] + w["end"]) / 2 / window_seconds)
+        nearest = np.searchsorted(speech_index, window)
+        nearest = min(nearest, len(speech_index) - 1)
+        if nearest > 0 and abs(speech_index[nearest - 1] - window) < abs(speech_index[nearest] - window):
+            nearest -= 1
+        w["speaker"] = int(labels[nearest])
+        around = {int(labels[i]) for i in (nearest - 1, nearest, nearest + 1) if 0 <= i < len(labels)}
+        if len(around) > 1:
+            boundary_words.append(w)
+            candidates.append(sorted(around))
+
+    if boundary_words:
+        word_scores = scores(span_features(pcm, [(w["start"], w["end"]) for w in boundary_words]))
+        for w, options, row in zip(boundary_words, candidates, word_scores):
+            w["speaker"] = max(options, key=lambda speaker: row[speaker])
+    # Clusters of mixed boundary windows may end up with no words: renumber what is left
+    order = {}
+    for w in words:
+        w["speaker"] = order.setdefault(w["speaker"], len(order))
+    return words
+
+
+# --- Deepgram-shaped output ---
+
+def _sentences(words):
+    """Split words into sentences at sentence-ending punctuation or a change of speaker."""
+    sentences, current = [], []
+    for w in words:
+        if current and (w["speaker"] != current[-1]["speaker"] or w["start"] - current[-1]["end"] > PARAGRAPH_GAP_SECONDS):
+            sentences.append(current)
+            current = []
+        current.append(w)
+        if _SENTENCE_END.search(w["punctuated_word"]):
+            sentences.append(current)
+            current = []
+    if current:
+        sentences.append(current)
+    return sentences
+
+
+def to_deepgram(words, duration, model_name=None):
+    """Build a Deepgram-shaped result from diarized words."""
+    paragraphs = []
+    for sentence in _sentences(words):
+        text = " ".join(w["punctuated_word"] for w in sentence)
+        entry = {"text": text, "start": sentence[0]["start"], "end": sentence[-1]["end"]}
+        speaker = sentence[0]["speaker"]
+        last = paragraphs[-1] if paragraphs else None
+        if last and last["speaker"] == speaker and entry["start"] - last["end"] <= PARAGRAPH_GAP_SECONDS:
+            last["sentences"].append(entry)
+            last["end"] = entry["end"]
+            last["num_words"] += len(sentence)
+        else:
+            paragraphs.append({
+                "speaker": speaker, "start": entry["start"], "end": entry["end"],
+                "num_words": len(sentence), "sentences": [entry],
+            })
+
+    utterances = [
+        {
+            "start": p["start"], "end": p["end"], "channel": 0, "speaker": p["speaker"],
+            "transcript": " ".join(s["text"] for s in p["sentences"]),
+            "confidence": None,
+        }
+        for p in paragraphs
+    ]
+    paragraph_text = "".join(
+        f"\nSpeaker {p['speaker']}: " + " ".join(s["text"] for s in p["sentences"]) + "\n"
+        for p in paragraphs
+    )
+    confidences = [w["confidence"] for w in words]
+    return {
+        "metadata": {
+            "request_id": None,
+            "duration": duration,
+            "channels": 1,
+            "models": [f"faster-whisper/{model_name or os.environ.get('LOCAL_ASR_MODEL') or DEFAULT_MODEL}"],
+        },
+        "results": {
+            "channels": [{
+                "alternatives": [{
+                    "transcript": " ".join(w["punctuated_word"] for w in words),
+                    "confidence": round(sum(confidences) / len(confidences), 4) if confidences else 0.0,
+                    "words": words,
+                    "paragraphs": {"transcript": paragraph_text, "paragraphs": paragraphs},
+                }],
+            }],
+            "utterances": utterances,
+        },
+    }
+
+
+def transcribe_local(input_file, seconds=None):
+    """Transcribe and diarize input_file on this machine; returns a Deepgram-shaped dict."""
+    pcm = load_audio(input_file, seconds)
+    words = diarize(pcm, recognize(pcm))
+    return to_deepgram(words, round(len(pcm) / SAMPLE_RATE, 3))
+
+
+def benchmark(input_file, seconds=None):
+    """Time each step on input_file and report speed as a realtime factor (audio seconds per wall second)."""
+    started = time.perf_counter()
+    pcm = load_audio(input_file, seconds)
+    audio_seconds = len(pcm) / SAMPLE_RATE
+    decoded = time.perf_counter()
+    get_model()
+    loaded = time.perf_counter()
+    words = recognize(pcm)
+    recognized = time.perf_counter()
+    diarize(pcm, words)
+    diarized = time.perf_counter()
+
+    cores = _threads()
+    print(f"{audio_seconds / 60:.1f} min of audio, {len(words)} words, {cores} core(s), model {os.environ.get('LOCAL_ASR_MODEL') or DEFAULT_MODEL}")
+    print(f"{'step':<10} {'seconds':>9} {'x realtime':>11} {'x realtime/core':>16}")
+    steps = [
+        ("decode", decoded - started, 1),
+        ("asr", recognized - loaded, cores),
+        ("diarize", diarized - recognized, 1),
+        ("total", diarized - started - (loaded - decoded), cores),
+    ]
+    for name, elapsed, used in steps:
+        factor = audio_seconds / elapsed if elapsed else float("inf")
+        print(f"{name:<10} {elapsed:>9.1f} {factor:>11.1f} {factor / used:>16.2f}")
+    print(f"(model load {loaded - decoded:.1f}s, once per process)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe a recording locally on the CPU, in Deepgram's JSON format.")
+    parser.add_argument("--audio", required=True, help="Path to input audio file.")
+    parser.add_argument("--output", help="Path to write the Deepgram-shaped JSON.")
+    parser.add_argument("--seconds", type=float, help="Only use the first N seconds of the audio.")
+    parser.add_argument("--benchmark", action="store_true", help="Report the realtime factor of each step instead of writing output.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.audio, args.seconds)
+    else:
+        result = transcribe_local(args.audio, args.seconds)
+        text = json.dumps(result, indent=4)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text)
+        else:
+            print(text)
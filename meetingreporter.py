@@ -18,8 +18,13 @@ import json
 import os
 import pickle
 import logging
+import threading
 from datetime import datetime
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
+
+from compacttranscript import read_paragraphs
+from ratelimit import get_limiter, note_error, wait_retry_after
 
 
 # --- Logger Setup ---
@@ -32,19 +37,73 @@ if not logger.handlers:
     logger.addHandler(handler)
 
 
+LLM_MODEL = "gpt-5"
+
+# --- Shared Clients ---
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Return a process-wide OpenAI client so long-running factories reuse its connections."""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            if 'OPENAI_API_KEY' not in os.environ:
+                from dotenv import load_dotenv
+                load_dotenv()
+            _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _openai_client
+
+
+# Rough prompt size for the tokens-per-minute budget (~4 characters per token),
+# plus headroom for the completion, which is corrected from `usage` afterwards.
+CHARS_PER_TOKEN = 4
+COMPLETION_TOKEN_ALLOWANCE = 16000
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    stop=stop_after_attempt(4),
+    wait=wait_retry_after(),
+    reraise=True,
+)
+def create_completion(**kwargs):
+    """
+    chat.completions.create() behind the shared OpenAI rate limiter. The SDK's
+    own retries are turned off so that a 429 pauses every caller, not just this one.
+    """
+    prompt_chars = sum(len(m["content"]) for m in kwargs.get("messages", []))
+    estimated_tokens = prompt_chars // CHARS_PER_TOKEN + COMPLETION_TOKEN_ALLOWANCE
+    client = get_openai_client().with_options(max_retries=0)
+    with get_limiter().slot("openai", tokens=estimated_tokens) as usage:
+        try:
+            completion = client.chat.completions.create(**kwargs)
+        except Exception as e:
+            note_error("openai", e)
+            raise
+        if getattr(completion, "usage", None) is not None:
+            usage["actual_tokens"] = completion.usage.total_tokens
+    return completion
+
+
 # --- Core Data Processing ---
 
+def deepgram_paragraphs(result_dict):
+    """The paragraphs (with their sentences) of a raw Deepgram result."""
+    return result_dict.get('channels', [{}])[0].get('alternatives', [{}])[0].get('paragraphs', {}).get('paragraphs', [])
+
 def process_deepgram_output(result_dict):
     """
     Processes raw Deepgram output to produce formatted text and sentence timings
     with character offsets, which are crucial for interactivity.
     """
+    return process_paragraphs(deepgram_paragraphs(result_dict))
+
+def process_paragraphs(paragraphs):
+    """process_deepgram_output for paragraphs already extracted, e.g. from compacttranscript."""
     final_text = ""
     sentence_timings = []
-    char_offset = 0
-    
-    paragraphs = result_dict.get('channels', [{}])[0].get('alternatives', [{}])[0].get('paragraphs', {}).get('paragraphs', [])
-    
+
     for p in paragraphs:
         speaker_label = f"[Speaker {p.get('speaker', 'Unknown')}]: "
         final_text += speaker_label
@@ -67,10 +126,21 @@ def process_deepgram_output(result_dict):
 
     return final_text.strip(), sentence_timings
 
-def get_structured_data_from_llm(transcript_text, sentence_timings, hint_text):
+def _save_debug(debug_dir, name, text):
+    """Keep a copy of an LLM exchange in debug_dir (the meeting's wip folder), if one was given."""
+    if not debug_dir:
+        return
+    try:
+        with open(os.path.join(debug_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    except OSError as e:
+        logger.warning(f"Could not write {name} to {debug_dir}: {e}")
+
+def get_structured_data_from_llm(transcript_text, sentence_timings, hint_text, debug_dir=None):
     """
     Calls the LLM with a unified prompt to get both speaker names and a
     timestamped agenda in a single, structured JSON object.
+    The prompt, completion or error are saved as llm_*.txt in debug_dir, when given.
     """
     # 1. Create Timestamp-Injected Transcript for the Prompt
     insertions = []
@@ -137,18 +207,12 @@ The output MUST be a single, valid JSON object with two top-level keys: `speaker
     # 3. Call the API
     try:
         # Save the prompt for debugging
-        with open("temp_prompt.txt", "w", encoding="utf-8") as f:
-            f.write(prompt)
+        _save_debug(debug_dir, "llm_prompt.txt", prompt)
 
-        if 'OPENAI_API_KEY' not in os.environ:
-            from dotenv import load_dotenv
-            load_dotenv()
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
         logger.info("Sending unified prompt to GPT-5 for combined generation...")
         
-        completion = client.chat.completions.create(
-            model="gpt-5",
+        completion = create_completion(
+            model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": "You are an expert legislative aide. Your output must be a single, valid JSON object containing 'speakers' and 'agenda_items' keys."},
                 {"role": "user", "content": prompt}
@@ -160,16 +224,14 @@ The output MUST be a single, valid JSON object with two top-level keys: `speaker
         logger.info("Successfully received response from GPT-5.")
         
         # Save the completion for debugging
-        with open("temp_completion.txt", "w", encoding="utf-8") as f:
-            f.write(str(completion))
+        _save_debug(debug_dir, "llm_completion.txt", str(completion))
 
         response_content = completion.choices[0].message.content
         return json.loads(response_content)
     except Exception as e:
         logger.error(f"An error occurred with the OpenAI API call: {e}")
         # Save the exception for debugging
-        with open("temp_error.txt", "w", encoding="utf-8") as f:
-            f.write(str(e))
+        _save_debug(debug_dir, "llm_error.txt", str(e))
         return None
 
 def generate_static_html(template_path, output_path, meeting_data):
@@ -284,8 +346,11 @@ def generate_static_html(template_path, output_path, meeting_data):
         content = content.replace('{{TRANSCRIPT_HTML}}', rebuilt_transcript_html)
         content = content.replace('{{MEETING_DATA_JSON}}', json.dumps(meeting_data_for_island, indent=2))
 
-        with open(output_path, 'w', encoding='utf-8') as f:
+        # Write via a temp file so an interrupted run never leaves a partial page
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        os.replace(tmp_path, output_path)
             
         logger.info(f"Successfully generated static HTML: {output_path}")
 
@@ -314,11 +379,15 @@ def video_to_static_transcript(
     hints_file_path=None,
     hints_text=None,
     structured_out_path=None,   
+    paragraphs=None,
+    transcript_path=None,
 ):
 
     """
     Main factory function to orchestrate the creation of a single, static
     SmartTranscript HTML file from a cached Deepgram result.
+    Instead of deepgram_data, pass `paragraphs` (e.g. from compacttranscript) or
+    `transcript_path`, which is streamed so only its paragraphs are loaded.
     """
     logger.info(f"Starting static transcript generation for: {meeting_title}")
     
@@ -335,12 +404,16 @@ def video_to_static_transcript(
             # Continue without hints
     
     # 2. Process Deepgram Output
-    if 'results' in deepgram_data:
-        deepgram_results = deepgram_data['results']
-    else:
-        deepgram_results = deepgram_data
-        
-    transcript_text, sentence_timings = process_deepgram_output(deepgram_results)
+    if paragraphs is None and transcript_path:
+        paragraphs = read_paragraphs(transcript_path)
+    if paragraphs is None:
+        if 'results' in deepgram_data:
+            deepgram_results = deepgram_data['results']
+        else:
+            deepgram_results = deepgram_data
+        paragraphs = deepgram_paragraphs(deepgram_results)
+
+    transcript_text, sentence_timings = process_paragraphs(paragraphs)
 
     # 3. Get Structured Data from LLM
     if structured_out_path and os.path.exists(structured_out_path):
@@ -348,14 +421,18 @@ def video_to_static_transcript(
             structured_data = json.load(f)
             logger.info(f"Read structured LLM data from {structured_out_path}")
     else:
-        structured_data = get_structured_data_from_llm(transcript_text, sentence_timings, hint_text)
+        # Debug copies of the exchange go next to structured.json, so parallel meetings keep their own
+        debug_dir = os.path.dirname(os.path.abspath(structured_out_path)) if structured_out_path else None
+        structured_data = get_structured_data_from_llm(transcript_text, sentence_timings, hint_text, debug_dir)
     if not structured_data:
         logger.error("Failed to get structured data from LLM. Aborting.")
         raise ValueError("Failed to get structured data from LLM.")
     if structured_out_path and  not os.path.exists(structured_out_path):
         try:
-            with open(structured_out_path, "w", encoding="utf-8") as f:
+            tmp_path = f"{structured_out_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 f.write(json.dumps(structured_data, ensure_ascii=False, indent=2))
+            os.replace(tmp_path, structured_out_path)
             logger.info(f"Wrote structured LLM JSON → {structured_out_path}")
         except Exception as e:
             logger.warning(f"Could not write structured JSON to {structured_out_path}: {e}")
@@ -400,11 +477,12 @@ def video_to_static_transcript(
         "agenda_items": structured_data.get('agenda_items', []),
         "speaker_map": speaker_map,
         "speaker_overrides": speaker_overrides,
-        "paragraphs": deepgram_results.get('channels', [{}])[0].get('alternatives', [{}])[0].get('paragraphs', {}).get('paragraphs', []),
+        "paragraphs": paragraphs,
         "jurisdiction":jurisdiction
     }
 
-    # 5. Generate the Static HTML
-    generate_static_html(template_path, output_path, final_meeting_data)
+    # 5. Generate the Static HTML (skipped when only structured data was requested)
+    if output_path:
+        generate_static_html(template_path, output_path, final_meeting_data)
 
     logger.info("Process complete.")
\ No newline at end of file
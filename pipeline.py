@@ -0,0 +1,235 @@
+"""
+Stage-pipelined executor used by factory.py in batch mode.
+
+Each stage (download, transcribe, LLM structuring, HTML render, ...) has its
+own pool of worker threads and a bounded input queue. A job flows from one
+stage to the next, so while meeting N is being transcribed, meeting N+1 can be
+downloading and meeting N-1 can be with the LLM. A full queue blocks the
+upstream stage, which keeps a fast downloader from piling up dozens of
+multi-hour audio files ahead of a slow transcriber.
+"""
+import itertools
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class Deferred(Exception):
+    """Raised by a stage function that cannot run yet; the job is retried at that stage after `delay` seconds."""
+
+    def __init__(self, delay, reason=""):
+        super().__init__(reason or f"deferred for {delay:.0f}s")
+        self.delay = delay
+
+
+class Stage:
+    """
+    A named pipeline step: a function applied to each job by `workers` threads.
+
+    If `priority` is given it maps a job to a sort key, and waiting jobs are
+    taken lowest key first instead of first in, first out.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=2, priority=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.priority = priority
+        # queue_size <= 0 means unbounded, as with queue.Queue
+        self.queue = queue.PriorityQueue(maxsize=queue_size)
+        self._seq = itertools.count()
+        self.busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    def put(self, job):
+        # Entries are (0, key, seq, job); the unique seq keeps equal keys in
+        # arrival order and means jobs themselves are never compared.
+        key = self.priority(job) if self.priority else 0
+        self.queue.put((0, key, next(self._seq), job))
+
+    def put_stop(self):
+        # Sorts after every job so workers drain the queue before exiting
+        self.queue.put((1, 0, next(self._seq), _STOP))
+
+    def get(self):
+        return self.queue.get()[-1]
+
+
+class Pipeline:
+    """
+    Runs jobs through a sequence of Stages.
+
+    A stage function takes a job and returns the job to hand to the next stage,
+    or None to drop it (e.g. nothing left to do). Raising Deferred puts the job
+    back in the same stage after a delay. Any other exception marks the job as
+    failed and calls `on_error(job, stage_name, exc)`; if that returns a number
+    of seconds the job is retried at the same stage after that delay, otherwise
+    it goes no further. `on_done(job)` is called when a job leaves the last stage.
+    """
+
+    def __init__(self, stages, on_done=None, on_error=None):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage.")
+        self.stages = stages
+        self.on_done = on_done
+        self.on_error = on_error
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._delayed = 0
+        self._timers = {}
+        self._aborted = threading.Event()
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(index,),
+                    name=f"{stage.name}-{n + 1}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def submit(self, job):
+        """Queue a job at the first stage. Blocks while that stage's queue is full."""
+        if self._aborted.is_set():
+            return False
+        with self._lock:
+            self._in_flight += 1
+        self.stages[0].put(job)
+        return True
+
+    def abort(self):
+        """Stop starting new work; queued and delayed jobs are discarded."""
+        self._aborted.set()
+        with self._lock:
+            timers = list(self._timers.values())
+            self._timers.clear()
+            self._delayed = 0
+        for timer in timers:
+            timer.cancel()
+            self._finish()
+
+    @property
+    def aborted(self):
+        return self._aborted.is_set()
+
+    def join(self):
+        """Wait until every submitted job has finished, failed or been discarded."""
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+
+    def shutdown(self):
+        """Wait for outstanding jobs, then stop all worker threads."""
+        self.join()
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.put_stop()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def stats(self):
+        """Per-stage counters: queue depth, busy workers, completions and mean latency."""
+        with self._lock:
+            result = {}
+            for stage in self.stages:
+                mean = stage.total_seconds / stage.completed if stage.completed else 0.0
+                result[stage.name] = {
+                    "queued": stage.queue.qsize(),
+                    "busy": stage.busy,
+                    "workers": stage.workers,
+                    "completed": stage.completed,
+                    "failed": stage.failed,
+                    "mean_seconds": round(mean, 2),
+                }
+            return result
+
+    @property
+    def delayed(self):
+        """Jobs waiting out a retry or deferral delay before re-entering a stage."""
+        with self._lock:
+            return self._delayed
+
+    def _retry_later(self, index, job, delay):
+        """Put a job back into stage `index` after `delay` seconds without blocking a worker."""
+        def requeue():
+            with self._lock:
+                if self._timers.pop(id(timer), None) is None:
+                    return  # already discarded by abort()
+                self._delayed -= 1
+            self.stages[index].put(job)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        with self._lock:
+            aborted = self._aborted.is_set()
+            if not aborted:
+                self._timers[id(timer)] = timer
+                self._delayed += 1
+        if aborted:
+            # A stage that deferred after abort() would otherwise hold up shutdown() for the whole delay
+            self._finish()
+            return
+        timer.start()
+
+    def _finish(self):
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while True:
+            job = stage.get()
+            if job is _STOP:
+                return
+            if self._aborted.is_set():
+                self._finish()
+                continue
+
+            with self._lock:
+                stage.busy += 1
+            started = time.monotonic()
+            try:
+                result = stage.func(job)
+            except Deferred as e:
+                with self._lock:
+                    stage.busy -= 1
+                self._retry_later(index, job, e.delay)
+                continue
+            except Exception as e:
+                with self._lock:
+                    stage.busy -= 1
+                    stage.failed += 1
+                retry_delay = self.on_error(job, stage.name, e) if self.on_error else None
+                if retry_delay is not None and not self._aborted.is_set():
+                    self._retry_later(index, job, retry_delay)
+                else:
+                    self._finish()
+                continue
+
+            with self._lock:
+                stage.busy -= 1
+                stage.completed += 1
+                stage.total_seconds += time.monotonic() - started
+
+            if result is None:
+                self._finish()
+            elif is_last:
+                if self.on_done:
+                    self.on_done(result)
+                self._finish()
+            else:
+                self.stages[index + 1].put(result)
@@ -0,0 +1,290 @@
+"""
+Shared rate limiting for the paid APIs (Deepgram, OpenAI).
+
+Every call goes through `limiter.slot(provider, tokens=...)`, which waits until
+the provider has a free concurrency slot, a request in its requests-per-minute
+bucket and (for OpenAI) enough room in its tokens-per-minute bucket. The state
+lives in a small SQLite file, so the limits hold across threads *and* across
+factory processes on the same machine. When a provider answers 429 with a
+Retry-After header, `penalize()` pauses every caller of that provider for that
+long, not just the one that got the error.
+
+Limits come from environment variables (see sample.env), falling back to the
+defaults in DEFAULT_LIMITS.
+"""
+import email.utils
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from tenacity import wait_exponential
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wip", "ratelimits.db")
+
+# requests per minute, concurrent requests, tokens per minute (None = not limited)
+DEFAULT_LIMITS = {
+    "deepgram": {"rpm": 60, "concurrency": 10, "tpm": None},
+    "openai": {"rpm": 60, "concurrency": 4, "tpm": 400_000},
+}
+
+# Pause applied on a 429 that carries no Retry-After header
+DEFAULT_429_PAUSE = 10.0
+
+# A lease is presumed abandoned (e.g. its process was killed) after this long
+LEASE_TIMEOUT = 2 * 3600
+POLL_SECONDS = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name          TEXT PRIMARY KEY,
+    level         REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    provider      TEXT PRIMARY KEY,
+    blocked_until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider      TEXT NOT NULL,
+    pid           INTEGER NOT NULL,
+    acquired_at   REAL NOT NULL
+);
+"""
+
+
+def limits_for(provider):
+    """Return the provider's limits, with DEEPGRAM_RPM / OPENAI_TPM style env overrides applied."""
+    limits = dict(DEFAULT_LIMITS.get(provider, {"rpm": None, "concurrency": None, "tpm": None}))
+    for key, env_suffix in (("rpm", "RPM"), ("concurrency", "MAX_CONCURRENT"), ("tpm", "TPM")):
+        value = os.environ.get(f"{provider.upper()}_{env_suffix}")
+        if value:
+            limits[key] = int(value)
+    return limits
+
+
+def retry_after_seconds(exc):
+    """Extract a Retry-After delay (seconds) from an SDK exception, or None if it has none."""
+    headers = getattr(exc, "headers", None)
+    if headers is None and getattr(exc, "response", None) is not None:
+        headers = getattr(exc.response, "headers", None)
+    if not headers:
+        return None
+    lowered = {str(k).lower(): v for k, v in dict(headers).items()}
+    if "retry-after-ms" in lowered:
+        try:
+            return float(lowered["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    value = lowered.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def note_error(provider, exc):
+    """Pause the provider for everyone if `exc` is a rate-limit response (Retry-After or a bare 429)."""
+    delay = retry_after_seconds(exc)
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if delay is None and status == 429:
+        delay = DEFAULT_429_PAUSE
+    if delay is not None:
+        get_limiter().penalize(provider, delay)
+
+
+def wait_retry_after(fallback=None):
+    """tenacity wait strategy: the server's Retry-After when it sent one, otherwise `fallback`."""
+    fallback = fallback or wait_exponential(multiplier=2, max=60)
+
+    def wait(retry_state):
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        delay = retry_after_seconds(exc) if exc is not None else None
+        return delay if delay is not None else fallback(retry_state)
+
+    return wait
+
+
+def _pid_alive(pid):
+    if os.name != "posix":
+        # os.kill(pid, 0) would terminate the process on Windows; rely on LEASE_TIMEOUT there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RateLimiter:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections are per thread; the database file is what is shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _record(self, provider, **increments):
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                provider, {"calls": 0, "waited_seconds": 0.0, "max_wait_seconds": 0.0, "rate_limited": 0}
+            )
+            for key, value in increments.items():
+                if key == "max_wait_seconds":
+                    stats[key] = max(stats[key], value)
+                else:
+                    stats[key] += value
+
+    def stats(self):
+        """Per-provider call counts, total and worst time spent waiting, and 429s seen, for this process."""
+        with self._stats_lock:
+            return {
+                provider: dict(stats, waited_seconds=round(stats["waited_seconds"], 1),
+                               max_wait_seconds=round(stats["max_wait_seconds"], 1))
+                for provider, stats in self._stats.items()
+            }
+
+    def _refill(self, conn, name, capacity, now):
+        row = conn.execute("SELECT level, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return float(capacity)
+        level, updated_at = row
+        return min(float(capacity), level + (now - updated_at) * capacity / 60.0)
+
+    def _try_acquire(self, provider, tokens, limits):
+        """One attempt under the database write lock. Returns (lease_id, None) or (None, seconds_to_wait)."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT blocked_until FROM blocks WHERE provider = ?", (provider,)).fetchone()
+            if row and row[0] > now:
+                return None, row[0] - now
+
+            if limits["concurrency"]:
+                leases = conn.execute(
+                    "SELECT id, pid, acquired_at FROM leases WHERE provider = ?", (provider,)
+                ).fetchall()
+                live = 0
+                for lease_id, pid, acquired_at in leases:
+                    if now - acquired_at > LEASE_TIMEOUT or not _pid_alive(pid):
+                        conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+                    else:
+                        live += 1
+                if live >= limits["concurrency"]:
+                    return None, POLL_SECONDS
+
+            wanted = [(f"{provider}:requests", limits["rpm"], 1)]
+            if limits["tpm"] and tokens:
+                # A request larger than the whole bucket is let through once the bucket is full
+                wanted.append((f"{provider}:tokens", limits["tpm"], min(tokens, limits["tpm"])))
+            levels = {}
+            wait = 0.0
+            for name, capacity, amount in wanted:
+                if not capacity:
+                    continue
+                levels[name] = (self._refill(conn, name, capacity, now), amount)
+                if levels[name][0] < amount:
+                    wait = max(wait, (amount - levels[name][0]) * 60.0 / capacity)
+            if wait:
+                return None, wait
+
+            for name, (level, amount) in levels.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                    (name, level - amount, now),
+                )
+            cursor = conn.execute(
+                "INSERT INTO leases (provider, pid, acquired_at) VALUES (?, ?, ?)",
+                (provider, os.getpid(), now),
+            )
+            return cursor.lastrowid, None
+        finally:
+            conn.execute("COMMIT")
+
+    def acquire(self, provider, tokens=0):
+        """Block until a call to `provider` is allowed; returns a lease id for release()."""
+        limits = limits_for(provider)
+        started = time.monotonic()
+        while True:
+            lease_id, wait = self._try_acquire(provider, tokens, limits)
+            if lease_id is not None:
+                waited = time.monotonic() - started
+                self._record(provider, calls=1, waited_seconds=waited, max_wait_seconds=waited)
+                return lease_id
+            time.sleep(min(wait, 5.0))
+
+    def release(self, provider, lease_id, actual_tokens=None, estimated_tokens=0):
+        """Free a concurrency slot, correcting the token bucket if the real usage is known."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+            limits = limits_for(provider)
+            if limits["tpm"] and actual_tokens is not None:
+                name = f"{provider}:tokens"
+                now = time.time()
+                level = self._refill(conn, name, limits["tpm"], now)
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                    (name, level - (actual_tokens - estimated_tokens), now),
+                )
+        finally:
+            conn.execute("COMMIT")
+
+    def penalize(self, provider, seconds):
+        """Pause every caller of `provider` (in any process) for `seconds`, e.g. from a Retry-After header."""
+        self._record(provider, rate_limited=1)
+        until = time.time() + seconds
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT INTO blocks (provider, blocked_until) VALUES (?, ?)
+            ON CONFLICT(provider) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)
+            """,
+            (provider, until),
+        )
+
+    @contextmanager
+    def slot(self, provider, tokens=0):
+        """
+        Hold a rate-limited slot for one API call. The yielded dict may be given
+        an "actual_tokens" entry to correct the token estimate afterwards.
+        """
+        lease_id = self.acquire(provider, tokens)
+        usage = {}
+        try:
+            yield usage
+        finally:
+            self.release(provider, lease_id, usage.get("actual_tokens"), tokens)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide limiter (database path from RATE_LIMIT_DB, else wip/ratelimits.db)."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(os.environ.get("RATE_LIMIT_DB") or DEFAULT_DB_PATH)
+        return _limiter
@@ -0,0 +1,90 @@
+"""
+Circuit breakers for the external services the factory depends on.
+
+A breaker trips after `failure_threshold` consecutive failures and then turns
+work away for `reset_timeout` seconds, after which a single trial call is let
+through: success closes the breaker again, failure re-opens it. factory.py
+keeps one breaker per service (video host, Deepgram, OpenAI) and one per
+committee, so a flaky upstream delays only the work that needs it instead of
+failing every meeting in the run.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_timeout=300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """
+        Seconds the caller should wait before trying, or 0 if it may go ahead.
+        Once the timeout has passed, exactly one caller is admitted as a trial.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+                self._trial_in_progress = True
+                return 0
+            if self.state == HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return 0
+            return max(remaining, 1.0)
+
+    def cancel_trial(self):
+        """Give back a trial slot that was admitted but not used."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"[breaker] {self.name} closed again")
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"[breaker] {self.name} opened after {self.failures} failure(s); pausing {self.reset_timeout:.0f}s")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, failure_threshold=3, reset_timeout=300.0):
+    """Return the process-wide breaker for `name`, creating it on first use."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return _breakers[name]
+
+
+def breaker_states():
+    with _breakers_lock:
+        return {name: b.snapshot() for name, b in _breakers.items()}
@@ -0,0 +1,51 @@
+import functools
+import os
+
+from artifactstore import ArtifactStore
+from factory import _audio_in_use
+from jobstore import JobStore
+
+
+def make_audio(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return str(path)
+
+
+def test_eviction_keeps_audio_of_unfinished_jobs(tmp_path):
+    wip = tmp_path / "wip"
+    jobs = JobStore(str(wip / "factory.db"))
+    cache = ArtifactStore(str(tmp_path / "cache"), max_audio_bytes=1500)
+    cache.in_use = functools.partial(_audio_in_use, jobs, str(wip))
+
+    finished = make_audio(wip / "A" / "2024-01-01" / "audio.ogg", 1000)
+    queued = make_audio(wip / "B" / "2024-01-02" / "audio.ogg", 1000)
+    for job_id in ("A/2024-01-01", "B/2024-01-02"):
+        jobs.upsert_job({"job_id": job_id})
+    jobs.set_job_status("A/2024-01-01", "done")
+    cache.store_audio("http://a", "opus", finished)
+    cache.store_audio("http://b", "opus", queued)
+    newest = make_audio(wip / "C" / "2024-01-03" / "audio.ogg", 1000)
+    jobs.upsert_job({"job_id": "C/2024-01-03"})
+    cache.store_audio("http://c", "opus", newest)
+
+    # Both older recordings left the cache, but only the finished meeting lost its file
+    assert not os.path.exists(finished)
+    assert os.path.exists(queued)
+    assert os.path.exists(newest)
+    assert cache.stats()["audio"]["entries"] == 1
+    cache.close()
+    jobs.close()
+
+
+def test_eviction_without_hook_never_touches_meeting_folders(tmp_path):
+    cache = ArtifactStore(str(tmp_path / "cache"), max_audio_bytes=1)
+    first = make_audio(tmp_path / "m1" / "audio.ogg", 100)
+    second = make_audio(tmp_path / "m2" / "audio.ogg", 100)
+    cache.store_audio("http://1", "opus", first)
+    cache.store_audio("http://2", "opus", second)
+
+    assert os.path.exists(first) and os.path.exists(second)
+    assert not cache.fetch_audio("http://1", "opus", str(tmp_path / "m3" / "audio.ogg"))
+    cache.close()
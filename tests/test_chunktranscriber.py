@@ -0,0 +1,108 @@
+import json
+import math
+
+import chunktranscriber
+
+DURATION = 1500.0
+PAGE_SECONDS = 0.96  # stand-in packet size: cuts can only land on multiples of this
+
+
+def meeting_words():
+    """Ground truth: a word every 2 s, five per sentence, two speakers taking turns every sentence."""
+    return [
+        {"word": f"w{i}", "start": i * 2.0, "end": i * 2.0 + 0.4, "speaker": (i // 5) % 2}
+        for i in range(int(DURATION // 2))
+    ]
+
+
+def page_start(seconds):
+    return math.floor(seconds / PAGE_SECONDS + 1e-6) * PAGE_SECONDS
+
+
+def stand_in_ffmpeg(cmd, **kwargs):
+    """Writes the span a stream copy would really produce instead of audio: it starts on a page."""
+    start = page_start(float(cmd[cmd.index("-ss") + 1]))
+    length = float(cmd[cmd.index("-t") + 1])
+    with open(cmd[-1], "w") as f:
+        json.dump({"start": start, "length": length}, f)
+
+
+def stand_in_transcribe(path, output_file=None):
+    """Deepgram-shaped result for the chunk, in chunk time, with speakers numbered per chunk."""
+    with open(path) as f:
+        span = json.load(f)
+    words = [
+        dict(w, start=round(w["start"] - span["start"], 3), end=round(w["end"] - span["start"], 3))
+        for w in meeting_words()
+        if span["start"] <= w["start"] and w["end"] <= span["start"] + span["length"]
+    ]
+    first_speaker = words[0]["speaker"]
+    for word in words:
+        word["speaker"] = int(word["speaker"] != first_speaker)
+
+    sentences = {}
+    for word in words:
+        sentences.setdefault(int(word["word"][1:]) // 5, []).append(word)
+    paragraphs = {}
+    for number, sentence in sorted(sentences.items()):
+        if len(sentence) < 5:  # cut off by the chunk edge
+            continue
+        paragraphs.setdefault(number, []).append(sentence)
+    return json.dumps({
+        "metadata": {"duration": span["length"]},
+        "results": {
+            "channels": [{"alternatives": [{
+                "transcript": " ".join(w["word"] for w in words),
+                "confidence": 0.9,
+                "words": words,
+                "paragraphs": {"paragraphs": [
+                    {
+                        "speaker": paragraph[0][0]["speaker"],
+                        "sentences": [
+                            {"text": " ".join(w["word"] for w in sentence),
+                             "start": sentence[0]["start"], "end": sentence[-1]["end"]}
+                            for sentence in paragraph
+                        ],
+                        "start": paragraph[0][0]["start"],
+                        "end": paragraph[-1][-1]["end"],
+                        "num_words": 5 * len(paragraph),
+                    }
+                    for _, paragraph in sorted(paragraphs.items())
+                ]},
+            }]}],
+            "utterances": [],
+        },
+    })
+
+
+def test_chunks_stitch_at_the_packet_the_cut_really_landed_on(tmp_path, monkeypatch):
+    audio_path = str(tmp_path / "meeting.ogg")
+    open(audio_path, "wb").close()
+    monkeypatch.setattr(chunktranscriber, "probe_duration", lambda path: DURATION)
+    monkeypatch.setattr(chunktranscriber, "packet_start", lambda path, seconds: page_start(seconds))
+    monkeypatch.setattr(chunktranscriber.subprocess, "run", stand_in_ffmpeg)
+
+    merged = json.loads(chunktranscriber.transcribe_chunked(
+        audio_path, chunk_seconds=600, overlap_seconds=30, transcribe=stand_in_transcribe,
+    ))
+
+    alternative = merged["results"]["channels"][0]["alternatives"][0]
+    expected = meeting_words()
+    assert [w["word"] for w in alternative["words"]] == [w["word"] for w in expected]
+    assert [w["start"] for w in alternative["words"]] == [w["start"] for w in expected]
+    # Speaker IDs are numbered per chunk but consistent after stitching
+    assert [w["speaker"] for w in alternative["words"]] == [w["speaker"] for w in expected]
+    sentence_starts = [s["start"] for p in alternative["paragraphs"]["paragraphs"] for s in p["sentences"]]
+    assert sentence_starts == sorted(set(sentence_starts))
+    assert not (tmp_path / "meeting.chunks").exists()
+
+
+def test_split_audio_cuts_on_probed_packets(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(chunktranscriber, "packet_start", lambda path, seconds: max(0.0, seconds - 0.5))
+    monkeypatch.setattr(chunktranscriber.subprocess, "run", lambda cmd, **kwargs: calls.append(cmd))
+
+    chunks = chunktranscriber.split_audio("meeting.mp3", str(tmp_path), 1000.0, 600, 30)
+
+    assert [(offset, length) for _, offset, length in chunks] == [(0.0, 630.0), (599.5, 400.5)]
+    assert [cmd[cmd.index("-ss") + 1] for cmd in calls] == ["0.000000", "599.500000"]
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import compacttranscript
+
+
+def deepgram_result(n_paragraphs=40):
+    words, paragraphs, t = [], [], 0.0
+    for p in range(n_paragraphs):
+        sentences = []
+        for s in range(3):
+            start = t
+            for _ in range(5):
+                words.append({"word": "wörd", "punctuated_word": "Wörd,", "start": t, "end": t + 0.3,
+                              "confidence": 0.9, "speaker": p % 3})
+                t += 0.4
+            sentences.append({"text": f"Sentence {p}.{s} ünïcode.", "start": start, "end": t})
+        paragraphs.append({"speaker": p % 3, "start": sentences[0]["start"], "end": t, "num_words": 15,
+                           "sentences": sentences})
+    return {
+        "metadata": {"duration": t},
+        "results": {
+            "channels": [{"alternatives": [{"transcript": "", "words": words,
+                                            "paragraphs": {"transcript": "", "paragraphs": paragraphs}}]}],
+            "utterances": [{"start": 0, "end": 1, "transcript": "x"}] * 50,
+        },
+    }
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+    result = deepgram_result()
+    path = tmp_path / "deepgram_raw.json"
+    path.write_text(json.dumps(result), encoding="utf-8")
+    return str(path), result
+
+
+def test_streamed_conversion_matches_in_memory_one_across_word_chunks(raw_file, tmp_path, monkeypatch):
+    raw, result = raw_file
+    monkeypatch.setattr(compacttranscript, "WORD_CHUNK", 7)
+    streamed = compacttranscript.convert_file(raw, str(tmp_path / "a.npz"))
+    direct = compacttranscript.convert(result, str(tmp_path / "b.npz"))
+
+    paragraphs = result["results"]["channels"][0]["alternatives"][0]["paragraphs"]["paragraphs"]
+    assert streamed.paragraphs() == direct.paragraphs() == paragraphs
+    words = result["results"]["channels"][0]["alternatives"][0]["words"]
+    assert streamed.words["punctuated_word"] == [w["punctuated_word"] for w in words]
+    assert streamed.words["start"].tolist() == [w["start"] for w in words]
+    assert streamed.duration == result["metadata"]["duration"]
+
+
+def test_read_paragraphs_streams_only_paragraphs(raw_file):
+    raw, result = raw_file
+    assert compacttranscript.read_paragraphs(raw) == (
+        result["results"]["channels"][0]["alternatives"][0]["paragraphs"]["paragraphs"]
+    )
+
+
+def test_ensure_converts_again_when_raw_changes(raw_file, tmp_path):
+    raw, result = raw_file
+    compact = str(tmp_path / "transcript.npz")
+    compacttranscript.ensure(raw, compact)
+    assert compacttranscript.is_current(raw, compact)
+
+    result["results"]["channels"][0]["alternatives"][0]["paragraphs"]["paragraphs"] = []
+    with open(raw, "w", encoding="utf-8") as f:
+        f.write(json.dumps(result))
+    os.utime(raw, ns=(0, 0))
+    assert not compacttranscript.is_current(raw, compact)
+    assert compacttranscript.ensure(raw, compact).paragraphs() == []
+
+
+def test_render_streams_a_stale_transcript_without_converting(raw_file, tmp_path, monkeypatch):
+    import factory
+    import meetingreporter
+
+    raw, result = raw_file
+    job = {"transcript_path": raw, "compact_path": str(tmp_path / "transcript.npz"), "hint_text": "",
+           "committee": "C", "date": "2024-01-01", "video_url": "", "structured_path": None, "jurisdiction": ""}
+    seen = {}
+    monkeypatch.setattr(compacttranscript, "convert_file", lambda *a: pytest.fail("render converted the transcript"))
+    monkeypatch.setattr(meetingreporter, "video_to_static_transcript", lambda **kw: seen.update(kw))
+
+    factory._run_reporter(job, output_path=None)
+
+    assert seen["paragraphs"] is None and seen["transcript_path"] == raw
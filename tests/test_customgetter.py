@@ -0,0 +1,52 @@
+import types
+
+from bs4 import BeautifulSoup
+
+import customgetter
+
+DATES = ["03/04/24", "02/26/24", "02/19/24", "02/12/24", "02/05/24"]
+
+
+def archive(dates):
+    rows = "".join(
+        f'<tr><td headers="Board">{d}<span>Regular</span></td><td>1h&nbsp;10m</td>'
+        f'<td><a href="//sf.example/MediaPlayer.php?clip_id={i}">Video</a></td></tr>'
+        for i, d in enumerate(dates)
+    )
+    return f'<table id="archive"><tbody>{rows}</tbody></table>'.encode("utf-8")
+
+
+def listed(monkeypatch, dates, **kwargs):
+    parsed = []
+    parse_row_date = customgetter._parse_row_date
+
+    def counting_parse(columns):
+        parsed.append(columns[0].text)
+        return parse_row_date(columns)
+
+    monkeypatch.setattr(customgetter, "fetch", lambda url: types.SimpleNamespace(content=archive(dates)))
+    monkeypatch.setattr(customgetter, "_parse_row_date", counting_parse)
+    monkeypatch.setattr(customgetter, "get_video_url_from_player_page",
+                        lambda url: {"video_url": url + "&v.m3u8", "download_url": None})
+    meetings = customgetter.get_recent_meetings(start_date_str="2024_01_01", count=10, **kwargs)
+    return [m["date"] for m in meetings], len(parsed)
+
+
+def test_newest_first_archive_stops_at_the_watermark(monkeypatch):
+    dates, parsed = listed(monkeypatch, DATES, since="2024-02-19")
+    assert dates == ["2024-03-04", "2024-02-26", "2024-02-19"]
+    assert parsed == 4  # the first row older than the mark, and nothing after it
+
+
+def test_oldest_first_archive_is_filtered_not_cut_short(monkeypatch):
+    dates, parsed = listed(monkeypatch, DATES[::-1], since="2024-02-19")
+    assert dates == ["2024-03-04", "2024-02-26", "2024-02-19"]
+    assert parsed == 5
+
+
+def test_parse_row_date_leaves_the_row_alone():
+    row = BeautifulSoup(archive(DATES[:1]), "html.parser").find("tr")
+    columns = row.find_all("td")
+
+    assert customgetter._parse_row_date(columns).strftime("%Y-%m-%d") == "2024-03-04"
+    assert columns[0].span.text == "Regular"
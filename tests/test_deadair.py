@@ -0,0 +1,48 @@
+import copy
+
+import deadair
+from webhook import SAMPLE_RESULT
+
+# A 1000 s recording with a 100 s recess and silence from 900 s to the end
+SILENCES = [(200.0, 300.0), (900.0, None)]
+TRIM_MAP = [[0.0, 201.0, 0.0], [299.0, 901.0, 201.0]]
+
+
+def test_trim_map_keeps_padding_around_each_cut():
+    assert deadair.build_trim_map(SILENCES, 1000.0) == TRIM_MAP
+    assert deadair.removed_seconds(TRIM_MAP, 1000.0) == 197.0
+
+
+def test_short_and_overlapping_silences():
+    # Too short to cut once padded, and two silences whose padded cuts touch
+    assert deadair.build_trim_map([(10.0, 11.5)], 100.0) == [[0.0, 100.0, 0.0]]
+    assert deadair.build_trim_map([(10.0, 40.0), (40.5, 70.0)], 100.0) == [[0.0, 11.0, 0.0], [39.0, 41.5, 11.0], [69.0, 100.0, 13.5]]
+
+
+def test_to_original_at_boundaries_and_inside_cuts():
+    assert deadair.to_original(0.0, TRIM_MAP) == 0.0
+    assert deadair.to_original(150.0, TRIM_MAP) == 150.0
+    assert deadair.to_original(201.0, TRIM_MAP) == 299.0  # first instant after the cut
+    assert deadair.to_original(200.999, TRIM_MAP) == 200.999
+    assert deadair.to_original(250.0, TRIM_MAP) == 348.0
+    assert deadair.to_original(803.0, TRIM_MAP) == 901.0  # the end of what was kept
+    assert deadair.to_original(850.0, TRIM_MAP) == 901.0  # past it: clamped, never inside a cut
+    assert deadair.to_original(42.0, []) == 42.0
+
+
+def test_remap_times_rewrites_a_deepgram_result():
+    result = copy.deepcopy(SAMPLE_RESULT)
+    alternative = result["results"]["channels"][0]["alternatives"][0]
+    for word in alternative["words"]:
+        word["start"] += 200
+        word["end"] += 200
+    trim_map = [[0.0, 201.0, 0.0], [1000.0, 2000.0, 201.0]]
+
+    assert deadair.remap_times(result, trim_map) is result
+
+    # Words spoken before the cut keep their times; those after it move by the 799 s removed
+    assert [w["start"] for w in alternative["words"]] == [200.5, 1000.0, 1000.5, 1001.0, 1001.5, 1002.0]
+    assert alternative["words"][0]["end"] == 200.9
+    assert alternative["paragraphs"]["paragraphs"][0]["sentences"][0]["start"] == 0.5
+    assert result["results"]["utterances"][0]["end"] == 3.4
+    assert alternative["confidence"] == 0.99  # not a time
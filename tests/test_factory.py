@@ -0,0 +1,126 @@
+import json
+import sys
+
+import pytest
+
+import factory
+import webhook
+from jobstore import JobStore
+from pipeline import Stage
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["factory.py", *argv])
+    with pytest.raises(SystemExit) as exited:
+        factory.main()
+    return exited.value.code
+
+
+def test_chunking_is_refused_in_callback_mode(monkeypatch, capsys):
+    code = run_main(monkeypatch, "--url", "http://example.invalid/v.mp4",
+                    "--callback-url", "http://example.invalid/hook", "--chunk-minutes", "20")
+    assert code == 2
+    assert "--chunk-minutes cannot be combined with --callback-url" in capsys.readouterr().err
+
+
+def test_callback_stage_keys_its_transcript_as_unchunked(tmp_path):
+    transcript_path = tmp_path / "deepgram_raw.json"
+    transcript_path.write_text("{}")
+    job = {"job_id": "C/2024-01-01", "date": "2024-01-01", "chunk_seconds": 1200,
+           "transcript_path": str(transcript_path)}
+
+    assert factory.callback_transcribe_stage(job, "http://127.0.0.1:1") is job
+    assert job["chunk_seconds"] == 0
+
+
+@pytest.mark.parametrize("flag", [["--trim-silence"], ["--chunk-minutes", "20"]])
+def test_stream_asr_refuses_trimming_and_chunking(monkeypatch, capsys, flag):
+    code = run_main(monkeypatch, "--url", "http://example.invalid/v.mp4", "--stream-asr", *flag)
+    assert code == 2
+    assert "--stream-asr cannot be combined" in capsys.readouterr().err
+
+
+def test_streamed_transcript_is_keyed_as_untrimmed_and_unchunked(tmp_path, monkeypatch):
+    monkeypatch.setattr(factory, "stream_audio", lambda url, tee, profile: iter([b"audio"]))
+    monkeypatch.setattr(factory, "transcribe_stream", lambda chunks: json.dumps(webhook.SAMPLE_RESULT))
+    job = {"job_id": "C/2024-01-01", "date": "2024-01-01", "download_url": "http://example.invalid/v.mp4",
+           "use_cache": False, "trim_silence": True, "chunk_seconds": 1200,
+           "audio_path": str(tmp_path / "audio.ogg"),
+           "transcript_path": str(tmp_path / "deepgram_raw.json"),
+           "compact_path": str(tmp_path / "transcript.npz")}
+
+    assert factory.stream_transcribe_stage(job) is job
+    assert (job["trim_silence"], job["chunk_seconds"]) == (False, 0)
+
+
+def test_chunk_workers_reach_the_chunked_transcriber(tmp_path, monkeypatch):
+    calls = []
+
+    def stand_in_chunked(audio_path, chunk_seconds, workers, transcribe):
+        calls.append((chunk_seconds, workers))
+        return json.dumps(webhook.SAMPLE_RESULT)
+
+    monkeypatch.setattr(factory, "transcribe_chunked", stand_in_chunked)
+    job = factory.prepare_meeting(
+        video_url="http://example.invalid/v.mp4", meeting_date="2024-01-01", committee_name="C",
+        wip_dir=str(tmp_path / "wip"), meetings_dir=str(tmp_path / "meetings"),
+        chunk_seconds=1200, chunk_workers=8, use_cache=False,
+    )
+
+    assert factory.transcribe_stage(job) is job
+    assert calls == [(1200, 8)]
+
+
+def queued_order(policy, jobs):
+    stage = Stage("download", lambda job: job, queue_size=0, priority=factory.job_priority(policy))
+    for job in jobs:
+        stage.put(job)
+    return [stage.get()["job_id"] for _ in jobs]
+
+
+ORDER_JOBS = [
+    {"job_id": "a", "date": "2024-01-08", "priority": 0, "duration_seconds": 3600},
+    {"job_id": "b", "date": "2024-03-04", "priority": 0, "duration_seconds": 600},
+    {"job_id": "c", "date": "2023-12-18", "priority": 5, "duration_seconds": 7200},
+    {"job_id": "d", "date": "2024-02-05", "priority": 0, "duration_seconds": None},
+]
+
+
+@pytest.mark.parametrize("policy, expected", [
+    ("fifo", ["c", "a", "b", "d"]),
+    ("newest", ["c", "b", "d", "a"]),
+    ("shortest", ["c", "b", "a", "d"]),
+])
+def test_committee_priority_comes_before_the_order_policy(policy, expected):
+    assert queued_order(policy, ORDER_JOBS) == expected
+
+
+def test_failing_stage_backs_off_then_is_dead_lettered(tmp_path, capsys):
+    store = JobStore(str(tmp_path / "factory.db"))
+    job = {"job_id": "C/2024-01-01", "scope": "C", "committee": "C", "date": "2024-01-01"}
+    store.upsert_job(job)
+    error = RuntimeError("upstream down")
+
+    delays = []
+    for _ in range(4):
+        store.start_stage(job["job_id"], "transcribe")
+        store.fail_stage(job["job_id"], "transcribe", error)
+        delays.append(factory._on_job_error(job, "transcribe", error, store, max_attempts=4, retry_base=60))
+        if delays[-1] is not None:
+            assert store.is_blocked(job["job_id"])
+
+    assert delays == [60, 120, 240, None]
+    assert store.get_job(job["job_id"])["status"] == "dead"
+    assert [row["job_id"] for row in store.dead_jobs()] == [job["job_id"]]
+    store.close()
+
+
+def test_backoff_is_capped(tmp_path, capsys):
+    store = JobStore(str(tmp_path / "factory.db"))
+    job = {"job_id": "C/2024-01-01", "scope": "C", "committee": "C", "date": "2024-01-01"}
+    store.upsert_job(job)
+    for _ in range(10):
+        store.start_stage(job["job_id"], "download")
+
+    assert factory._on_job_error(job, "download", RuntimeError(), store, max_attempts=20, retry_base=60) == factory.MAX_RETRY_DELAY
+    store.close()
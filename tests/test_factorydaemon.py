@@ -0,0 +1,86 @@
+import factorydaemon
+from factorydaemon import FactoryDaemon
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class InlineExecutor:
+    """Runs submitted polls at once, so a test sees their effect on return."""
+
+    def submit(self, func, *args):
+        func(*args)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def make_daemon(monkeypatch, committees, discover, enqueue=lambda committee, meetings: len(meetings)):
+    clock = Clock()
+    monkeypatch.setattr(factorydaemon, "time", clock)
+    daemon = FactoryDaemon(committees, discover, enqueue, pipeline=None, default_interval_minutes=60)
+    daemon._executor = InlineExecutor()
+    return daemon, clock
+
+
+def test_committees_are_polled_on_their_own_intervals(monkeypatch):
+    polled = []
+
+    def discover(committee):
+        polled.append(committee["name"])
+        return [{"date": "2024-01-01"}]
+
+    daemon, clock = make_daemon(monkeypatch, [{"name": "Board", "poll_interval_minutes": 10}, {"name": "Budget"}], discover)
+
+    daemon._schedule_due()
+    assert sorted(polled) == ["Board", "Budget"]
+
+    clock.now += 9 * 60
+    daemon._schedule_due()
+    assert len(polled) == 2
+
+    clock.now += 60
+    daemon._schedule_due()
+    assert polled[2:] == ["Board"]
+
+    clock.now += 50 * 60
+    daemon._schedule_due()
+    assert sorted(polled[3:]) == ["Board", "Budget"]
+    assert daemon._polls["Budget"]["last_queued"] == 1
+
+
+def test_failed_poll_is_recorded_and_tried_again_next_interval(monkeypatch):
+    calls = []
+
+    def discover(committee):
+        calls.append(1)
+        raise RuntimeError("archive unreachable")
+
+    daemon, clock = make_daemon(monkeypatch, [{"name": "Board", "poll_interval_minutes": 5}], discover)
+
+    daemon._schedule_due()
+    entry = daemon._polls["Board"]
+    assert entry["last_error"] == "archive unreachable"
+    assert not entry["polling"]
+    assert entry["next_poll"] == clock.now + 300
+
+    clock.now += 300
+    daemon._schedule_due()
+    assert len(calls) == 2
+
+
+def test_committee_still_being_polled_is_not_polled_twice(monkeypatch):
+    daemon, clock = make_daemon(monkeypatch, [{"name": "Board", "poll_interval_minutes": 1}], lambda committee: [])
+    submitted = []
+    daemon._executor.submit = lambda func, *args: submitted.append(args)
+
+    daemon._schedule_due()
+    clock.now += 3600
+    daemon._schedule_due()
+
+    assert submitted == [("Board",)]
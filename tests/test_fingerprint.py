@@ -0,0 +1,83 @@
+import numpy as np
+
+import fingerprint
+
+RATE = fingerprint.RATE
+
+
+def synth(seconds, seed):
+    """Tone bursts at random pitches: stands in for speech, with plenty of spectral peaks."""
+    rng = np.random.default_rng(seed)
+    out = np.zeros(int(seconds * RATE), dtype=np.float32)
+    t = 0
+    while t < len(out):
+        n = int(rng.uniform(0.1, 0.5) * RATE)
+        burst = np.sin(2 * np.pi * rng.uniform(100, 3500) * np.arange(n) / RATE) * rng.uniform(0.05, 0.5) * np.hanning(n)
+        out[t:t + n] += burst[:len(out) - t]
+        t += int(n * rng.uniform(0.3, 1.0))
+    return out + 0.01 * rng.standard_normal(len(out)).astype(np.float32)
+
+
+def blocks(pcm, seconds=60):
+    step = seconds * RATE
+    return [pcm[i:i + step] for i in range(0, len(pcm), step)]
+
+
+def index_with(tmp_path, source, pcm):
+    index = fingerprint.FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    index.add(source, fingerprint.fingerprint_pcm(blocks(pcm)), transcript_path="first.json")
+    return index
+
+
+def test_reencoded_trimmed_copy_matches_with_offset(tmp_path):
+    original = synth(1200, seed=1)
+    index = index_with(tmp_path, "first", original)
+    rng = np.random.default_rng(2)
+    copy = original[int(37.3 * RATE):-20 * RATE] * 0.6
+    copy = np.convolve(copy, np.ones(3) / 3, mode="same").astype(np.float32)
+    copy += 0.02 * rng.standard_normal(len(copy)).astype(np.float32)
+
+    match = index.find_match(fingerprint.fingerprint_pcm(blocks(copy, 45)))
+
+    assert match["source"] == "first"
+    assert abs(match["offset_seconds"] - 37.3) < 0.1
+    assert match["coverage"] >= fingerprint.MIN_COVERAGE
+    index.close()
+
+
+def test_shared_intro_with_different_body_is_not_a_match(tmp_path):
+    intro = synth(6 * 60, seed=3)
+    first = np.concatenate([intro, synth(24 * 60, seed=4)])
+    second = np.concatenate([intro, synth(24 * 60, seed=5)])
+    index = index_with(tmp_path, "first", first)
+
+    assert index.find_match(fingerprint.fingerprint_pcm(blocks(second))) is None
+    index.close()
+
+
+def test_unrelated_recording_and_excluded_source_do_not_match(tmp_path):
+    original = synth(600, seed=6)
+    index = index_with(tmp_path, "first", original)
+    fp = fingerprint.fingerprint_pcm(blocks(original))
+
+    assert index.find_match(fingerprint.fingerprint_pcm(blocks(synth(600, seed=7)))) is None
+    assert index.find_match(fp, exclude_source="first") is None
+    assert index.find_match(fp)["coverage"] == 1.0
+    index.close()
+
+
+def test_shift_transcript_moves_and_drops_out_of_range():
+    result = {"metadata": {"duration": 10.0}, "results": {"channels": [{"alternatives": [{
+        "words": [{"word": "a", "start": 1.0, "end": 1.5}, {"word": "b", "start": 5.0, "end": 5.5}],
+        "paragraphs": {"paragraphs": [{"start": 1.0, "end": 5.5, "sentences": [
+            {"text": "A.", "start": 1.0, "end": 1.5}, {"text": "B.", "start": 5.0, "end": 5.5},
+        ]}]},
+    }]}]}}
+
+    fingerprint.shift_transcript(result, 2.0, 8.0)
+
+    alternative = result["results"]["channels"][0]["alternatives"][0]
+    assert [w["word"] for w in alternative["words"]] == ["b"]
+    assert alternative["words"][0]["start"] == 3.0
+    assert alternative["paragraphs"]["paragraphs"][0]["start"] == 3.0
+    assert result["metadata"]["duration"] == 8.0
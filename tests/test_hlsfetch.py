@@ -0,0 +1,153 @@
+import os
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import hlsfetch
+import videotools
+
+ARCHIVE = "/vod/_definst_/mp4:meeting.mp4"
+
+
+def segment_body(index):
+    return f"segment {index} ".encode("utf-8") * 100
+
+
+class WowzaHandler(BaseHTTPRequestHandler):
+    """
+    A synthetic Wowza archive: a master playlist with two variants, each a media
+    playlist whose segment names carry the current viewing session's token.
+    """
+
+    token = "1111111"
+    durations = (10.0, 10.0, 10.0, 10.0, 4.0)
+    missing = set()  # segment indexes answered with 404
+    seen = []
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        self.seen.append(path)
+        if path == f"{ARCHIVE}/playlist.m3u8":
+            body = "\n".join([
+                "#EXTM3U",
+                "#EXT-X-STREAM-INF:BANDWIDTH=900000,CODECS=\"avc1.4d401f,mp4a.40.2\"",
+                f"chunklist_w{self.token}_b900000.m3u8",
+                "#EXT-X-STREAM-INF:BANDWIDTH=300000",
+                f"chunklist_w{self.token}_b300000.m3u8",
+            ])
+        elif path.startswith(f"{ARCHIVE}/chunklist_w"):
+            lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:10"]
+            for i, duration in enumerate(self.durations):
+                lines += [f"#EXTINF:{duration},", f"media_w{self.token}_{i}.ts?wowzasession={self.token}"]
+            body = "\n".join(lines + ["#EXT-X-ENDLIST"])
+        elif path.startswith(f"{ARCHIVE}/media_w"):
+            index = int(path.rsplit("_", 1)[1].split(".")[0])
+            if index in self.missing:
+                self.send_error(404)
+                return
+            self._send(segment_body(index), "video/MP2T")
+            return
+        else:
+            self.send_error(404)
+            return
+        self._send(body.encode("utf-8"), "application/vnd.apple.mpegurl")
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def playlist_url(monkeypatch):
+    WowzaHandler.token = "1111111"
+    WowzaHandler.durations = (10.0, 10.0, 10.0, 10.0, 4.0)
+    WowzaHandler.missing = set()
+    WowzaHandler.seen = []
+    # Segment retries back off for seconds; the stub fails on purpose
+    monkeypatch.setattr(hlsfetch, "time", types.SimpleNamespace(sleep=lambda s: None, monotonic=hlsfetch.time.monotonic))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), WowzaHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}{ARCHIVE}/playlist.m3u8"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    """Stands in for the ffmpeg encode: writes the segments it is fed, in order, to the output."""
+    commands = []
+
+    def run_ffmpeg(cmd, log=None, progress=None, input_paths=None):
+        commands.append(cmd)
+        with open(cmd[-1], "wb") as out:
+            for path in input_paths:
+                with open(path, "rb") as f:
+                    out.write(f.read())
+        return 0
+
+    monkeypatch.setattr(hlsfetch, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(videotools, "probe_duration", lambda path: None)
+    return commands
+
+
+def segment_requests():
+    return [path.rsplit("/", 1)[1] for path in WowzaHandler.seen if "/media_w" in path]
+
+
+def test_download_hls_audio_end_to_end(playlist_url, ffmpeg, tmp_path):
+    output = str(tmp_path / "audio.mp3")
+
+    assert hlsfetch.download_hls_audio(playlist_url, output, workers=3) == output
+
+    with open(output, "rb") as f:
+        assert f.read() == b"".join(segment_body(i) for i in range(5))
+    [cmd] = ffmpeg
+    assert cmd[cmd.index("-i") + 1] == "pipe:0"
+    assert f"{ARCHIVE}/chunklist_w1111111_b300000.m3u8" in WowzaHandler.seen  # the lowest variant
+    assert f"{ARCHIVE}/chunklist_w1111111_b900000.m3u8" not in WowzaHandler.seen
+    assert sorted(segment_requests()) == [f"media_w1111111_{i}.ts" for i in range(5)]
+    assert not os.path.exists(tmp_path / "audio.segments")
+
+
+def test_resume_reuses_segments_across_session_tokens(playlist_url, ffmpeg, tmp_path):
+    output = str(tmp_path / "audio.mp3")
+    WowzaHandler.missing = {3}
+    with pytest.raises(Exception):
+        hlsfetch.download_hls_audio(playlist_url, output, workers=2)
+    assert len(os.listdir(tmp_path / "audio.segments")) == 5  # four segments and the manifest
+
+    # A new viewing session: every segment URL has changed, the segments have not
+    WowzaHandler.token = "2222222"
+    WowzaHandler.missing = set()
+    WowzaHandler.seen = []
+    hlsfetch.download_hls_audio(playlist_url, output, workers=2)
+
+    assert segment_requests() == ["media_w2222222_3.ts"]
+    with open(output, "rb") as f:
+        assert f.read() == b"".join(segment_body(i) for i in range(5))
+
+
+def test_different_playlist_discards_old_segments(playlist_url, tmp_path):
+    work_dir = str(tmp_path / "audio.segments")
+    hlsfetch.fetch_segments(playlist_url, work_dir, workers=2)
+
+    WowzaHandler.token = "2222222"
+    WowzaHandler.durations = (10.0, 10.0, 10.0, 10.0, 6.0)
+    WowzaHandler.seen = []
+    paths, duration = hlsfetch.fetch_segments(playlist_url, work_dir, workers=2)
+
+    assert len(segment_requests()) == 5 and duration == 46.0
+    assert len(paths) == 5
+
+
+def test_segment_key_drops_session_token_and_query():
+    assert hlsfetch.segment_key("https://h/a.mp4/media_w1851839137_12.ts?t=1") == "h/a.mp4/media_12.ts"
+    assert hlsfetch.segment_key("https://h/a.mp4/media_w99_12.ts") == hlsfetch.segment_key("https://h/a.mp4/media_w1_12.ts")
@@ -0,0 +1,81 @@
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from httpcache import HTTPCache
+
+LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+PAGES = {
+    "/etag": ("text/html; charset=utf-8", "Agenda – café".encode("utf-8"), {"ETag": '"abc"'}),
+    "/modified": ('text/html; charset="ISO-8859-1"', "Procès-verbal".encode("latin-1"), {"Last-Modified": LAST_MODIFIED}),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves PAGES, answering 304 when the client's validator still matches."""
+
+    seen = []
+
+    def do_GET(self):
+        content_type, body, validators = PAGES[self.path]
+        self.seen.append((self.path, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+        if ("ETag" in validators and self.headers.get("If-None-Match") == validators["ETag"]) or (
+            "Last-Modified" in validators and self.headers.get("If-Modified-Since") == validators["Last-Modified"]
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in validators.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    StubHandler.seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("path,header,expected", [
+    ("/etag", 1, "Agenda – café"),
+    ("/modified", 2, "Procès-verbal"),
+])
+def test_revalidates_with_stored_validator(base_url, tmp_path, path, header, expected):
+    cache = HTTPCache(str(tmp_path))
+    session = requests.Session()
+
+    first = cache.get(session, base_url + path)
+    second = cache.get(session, base_url + path)
+
+    assert not first.from_cache and second.from_cache
+    assert first.text == second.text == expected
+    assert StubHandler.seen[0][header] is None and StubHandler.seen[1][header] is not None
+    assert cache.stats() == {"hits": 0, "revalidated": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_fresh_entry_is_served_without_a_request(base_url, tmp_path):
+    cache = HTTPCache(str(tmp_path), ttl_rules=[(r"/etag$", 3600)])
+    session = requests.Session()
+    cache.get(session, base_url + "/etag")
+
+    assert cache.get(session, base_url + "/etag").text == "Agenda – café"
+    assert len(StubHandler.seen) == 1
+
+
+def test_text_uses_the_same_charset_as_requests(base_url, tmp_path):
+    url = base_url + "/modified"
+    assert HTTPCache(str(tmp_path)).get(requests.Session(), url).text == requests.get(url).text
@@ -0,0 +1,78 @@
+import os
+
+import factory
+import jobstore
+from jobstore import JobStore
+
+real_sha256 = jobstore.file_sha256
+
+
+def test_download_reruns_when_audio_profile_changes(tmp_path):
+    store = JobStore(str(tmp_path / "factory.db"))
+    calls = []
+
+    def download(job):
+        calls.append(job["audio_path"])
+        with open(job["audio_path"], "wb") as f:
+            f.write(b"audio" * 100)
+        return job
+
+    job = {"job_id": "C/2024-01-01", "scope": "C", "committee": "C", "date": "2024-01-01",
+           "structured_only": False, "audio_path": str(tmp_path / "audio.ogg")}
+    store.upsert_job(job)
+    store.finish_stage(job["job_id"], "transcribe", None)
+
+    factory.run_stage(job, "download", download, "audio_path", store)
+    factory.run_stage(job, "download", download, "audio_path", store)
+    assert calls == [job["audio_path"]]
+
+    # Same meeting, now wanted as mp3: the recorded download produced a different file
+    job["audio_path"] = str(tmp_path / "audio.mp3")
+    factory.run_stage(job, "download", download, "audio_path", store)
+
+    assert calls == [str(tmp_path / "audio.ogg"), str(tmp_path / "audio.mp3")]
+    assert store.get_stage(job["job_id"], "download")["artifact"] == job["audio_path"]
+    assert store.get_stage(job["job_id"], "transcribe")["status"] == "stale"
+    store.close()
+
+
+def test_requeue_by_id_only_touches_dead_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "factory.db"))
+    for job_id in ("C/2024-01-01", "C/2024-01-02"):
+        store.upsert_job({"job_id": job_id, "scope": "C", "date": job_id[2:]})
+    store.mark_dead("C/2024-01-01")
+    store.start_stage("C/2024-01-02", "download")
+
+    assert store.requeue("C/2024-01-02") == []
+    assert store.get_job("C/2024-01-02")["status"] == "running"
+    assert store.get_stage("C/2024-01-02", "download")["attempts"] == 1
+    assert store.requeue("C/2024-01-01") == ["C/2024-01-01"]
+    assert store.get_job("C/2024-01-01")["status"] == "pending"
+    store.close()
+
+
+def test_artifacts_are_hashed_only_when_verified(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "factory.db"))
+    audio = tmp_path / "audio.ogg"
+    audio.write_bytes(b"audio" * 100)
+    hashed = []
+    monkeypatch.setattr(jobstore, "file_sha256", lambda path: hashed.append(path) or real_sha256(path))
+
+    store.finish_stage("C/2024-01-01", "download", str(audio))
+    assert store.stage_done("C/2024-01-01", "download", str(audio))
+    assert hashed == []
+
+    # The first verify records the hash; a later one catches a same-size rewrite
+    assert store.stage_done("C/2024-01-01", "download", str(audio), verify=True)
+    assert store.get_stage("C/2024-01-01", "download")["sha256"] == real_sha256(str(audio))
+    stat = os.stat(audio)
+    audio.write_bytes(b"AUDIO" * 100)
+    os.utime(audio, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert store.stage_done("C/2024-01-01", "download", str(audio))
+    assert not store.stage_done("C/2024-01-01", "download", str(audio), verify=True)
+    assert len(hashed) == 2
+
+    # Without verify, a rewrite shows up as a new modification time
+    os.utime(audio, (stat.st_atime, stat.st_mtime + 10))
+    assert not store.stage_done("C/2024-01-01", "download", str(audio))
+    store.close()
@@ -0,0 +1,68 @@
+import numpy as np
+
+import compacttranscript
+import localasr
+import meetingreporter
+
+
+def word(text, start, speaker, confidence=0.9):
+    return {"word": text.strip(".?!,").lower(), "punctuated_word": text, "start": start, "end": start + 0.3,
+            "confidence": confidence, "speaker": speaker}
+
+
+def test_to_deepgram_has_the_shape_the_reporter_reads(tmp_path):
+    words = [
+        word("Good", 0.0, 0), word("morning.", 0.5, 0), word("Roll", 1.0, 0), word("call?", 1.5, 0),
+        word("Here.", 2.5, 1),
+        word("Thank", 10.0, 1), word("you.", 10.5, 1),  # same speaker after a long pause: new paragraph
+    ]
+    result = localasr.to_deepgram(words, 12.0, model_name="tiny.en")
+
+    assert result["metadata"]["duration"] == 12.0
+    assert result["metadata"]["models"] == ["faster-whisper/tiny.en"]
+    paragraphs = meetingreporter.deepgram_paragraphs(result["results"])
+    assert [(p["speaker"], p["start"], p["end"], p["num_words"]) for p in paragraphs] == [
+        (0, 0.0, 1.8, 4), (1, 2.5, 2.8, 1), (1, 10.0, 10.8, 2),
+    ]
+    assert [s["text"] for s in paragraphs[0]["sentences"]] == ["Good morning.", "Roll call?"]
+    assert [u["transcript"] for u in result["results"]["utterances"]] == ["Good morning. Roll call?", "Here.", "Thank you."]
+    alternative = result["results"]["channels"][0]["alternatives"][0]
+    assert alternative["transcript"] == "Good morning. Roll call? Here. Thank you."
+    assert alternative["confidence"] == 0.9
+
+    text, timings = meetingreporter.process_paragraphs(paragraphs)
+    assert text.startswith("[Speaker 0]: Good morning.") and len(timings) == 4
+    compact_path = str(tmp_path / "transcript.npz")
+    compacttranscript.convert(result, compact_path)
+    assert compacttranscript.load(compact_path).paragraphs() == paragraphs
+
+
+def voice(seconds, pitch, formants, rng):
+    """A crude voiced sound: a harmonic series shaped by formant peaks, with jitter."""
+    t = np.arange(int(seconds * localasr.SAMPLE_RATE)) / localasr.SAMPLE_RATE
+    signal = np.zeros_like(t)
+    for harmonic in range(1, 40):
+        f = pitch * harmonic
+        if f > 7000:
+            break
+        gain = sum(np.exp(-((f - centre) / 150.0) ** 2) for centre in formants) + 0.02
+        signal += gain * np.sin(2 * np.pi * f * t * (1 + 0.002 * rng.standard_normal()))
+    syllables = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t) ** 2
+    return (signal * syllables / np.abs(signal).max() * 0.3).astype(np.float32)
+
+
+def test_diarize_separates_two_voices():
+    rng = np.random.default_rng(0)
+    low = voice(30, 110, (500, 1500), rng)
+    high = voice(30, 230, (900, 2800), rng)
+    pcm = np.concatenate([low, high, low[::-1]])
+    words = [{"word": "w", "punctuated_word": "w", "start": s, "end": s + 0.4, "confidence": 0.9}
+             for s in np.arange(0.0, 89.5, 0.5)]
+
+    localasr.diarize(pcm, words)
+
+    expected = [0 if w["start"] < 30 or w["start"] >= 60 else 1 for w in words]
+    # Only words within a window or two of a change of speaker may be misassigned
+    mismatched = [w["start"] for w, e in zip(words, expected) if w["speaker"] != e]
+    assert all(min(abs(s - 30), abs(s - 60)) <= 2 * localasr.WINDOW_SECONDS for s in mismatched)
+    assert {w["speaker"] for w in words} == {0, 1}
@@ -0,0 +1,33 @@
+import json
+from types import SimpleNamespace
+
+import meetingreporter
+
+
+def fake_completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_llm_debug_files_go_to_the_meetings_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    meeting = tmp_path / "wip" / "Committee" / "2024-01-01"
+    meeting.mkdir(parents=True)
+    reply = {"speakers": [], "agenda_items": []}
+    monkeypatch.setattr(meetingreporter, "create_completion", lambda **kw: fake_completion(json.dumps(reply)))
+
+    text, timings = meetingreporter.process_paragraphs(
+        [{"speaker": 0, "sentences": [{"text": "Order.", "start": 1.0, "end": 2.0}]}]
+    )
+    assert meetingreporter.get_structured_data_from_llm(text, timings, "", debug_dir=str(meeting)) == reply
+
+    assert (meeting / "llm_prompt.txt").exists() and (meeting / "llm_completion.txt").exists()
+    assert not list(tmp_path.glob("temp_*.txt"))
+
+
+def test_llm_error_is_kept_per_meeting(tmp_path, monkeypatch):
+    def fail(**kw):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(meetingreporter, "create_completion", fail)
+    assert meetingreporter.get_structured_data_from_llm("", [], "", debug_dir=str(tmp_path)) is None
+    assert (tmp_path / "llm_error.txt").read_text(encoding="utf-8") == "quota exceeded"
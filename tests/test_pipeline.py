@@ -0,0 +1,117 @@
+import threading
+import time
+
+from pipeline import Deferred, Pipeline, Stage
+
+
+def run(stages, jobs, **kwargs):
+    done = []
+    pipeline = Pipeline(stages, on_done=done.append, **kwargs).start()
+    for job in jobs:
+        pipeline.submit(job)
+    pipeline.shutdown()
+    return pipeline, done
+
+
+def test_jobs_pass_every_stage_in_order():
+    seen = []
+    lock = threading.Lock()
+
+    def step(name):
+        def func(job):
+            with lock:
+                seen.append((name, job["n"]))
+            return job
+        return func
+
+    stages = [Stage("download", step("download")), Stage("transcribe", step("transcribe"))]
+    pipeline, done = run(stages, [{"n": n} for n in range(5)])
+
+    assert [job["n"] for job in done] == list(range(5))
+    for n in range(5):
+        assert seen.index(("download", n)) < seen.index(("transcribe", n))
+    assert pipeline.stats()["transcribe"]["completed"] == 5
+
+
+def test_priority_decides_which_waiting_job_runs_first():
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def func(job):
+        if job["n"] == 0:
+            started.set()
+            release.wait(5)
+        order.append(job["n"])
+        return job
+
+    pipeline = Pipeline([Stage("s", func, queue_size=0, priority=lambda job: -job["n"])]).start()
+    pipeline.submit({"n": 0})
+    started.wait(5)  # the worker is busy, so the rest queue up
+    for n in (1, 2, 3):
+        pipeline.submit({"n": n})
+    release.set()
+    pipeline.shutdown()
+    assert order == [0, 3, 2, 1]
+
+
+def test_deferred_job_is_requeued_at_the_same_stage():
+    calls = []
+
+    def wait_once(job):
+        calls.append(job["n"])
+        if calls.count(job["n"]) == 1:
+            raise Deferred(0.05, "not ready")
+        return job
+
+    pipeline, done = run([Stage("prepare", lambda job: job), Stage("wait", wait_once)], [{"n": 1}])
+
+    assert calls == [1, 1]
+    assert [job["n"] for job in done] == [1]
+    assert pipeline.delayed == 0
+    assert pipeline.stats()["wait"]["failed"] == 0
+
+
+def test_on_error_retries_until_it_gives_up():
+    attempts = []
+    errors = []
+
+    def flaky(job):
+        attempts.append(job["n"])
+        raise RuntimeError("service down")
+
+    def on_error(job, stage_name, exc):
+        errors.append((job["n"], stage_name, str(exc)))
+        return 0.01 if len(errors) < 3 else None
+
+    pipeline, done = run([Stage("transcribe", flaky)], [{"n": 7}], on_error=on_error)
+
+    assert attempts == [7, 7, 7]
+    assert errors == [(7, "transcribe", "service down")] * 3
+    assert done == []
+    assert pipeline.stats()["transcribe"]["failed"] == 3
+
+
+def test_abort_discards_delayed_jobs_and_shutdown_does_not_wait_them_out():
+    entered = threading.Event()
+    release = threading.Event()
+
+    def slow(job):
+        if job["n"] == 0:
+            raise Deferred(60)  # waiting when abort() comes
+        entered.set()
+        release.wait(5)
+        raise Deferred(60)  # deferring after abort()
+
+    pipeline = Pipeline([Stage("s", slow, workers=2, queue_size=0)]).start()
+    pipeline.submit({"n": 0})
+    pipeline.submit({"n": 1})
+    entered.wait(5)
+    pipeline.abort()
+    release.set()
+
+    started = time.monotonic()
+    pipeline.shutdown()
+    assert time.monotonic() - started < 5
+    assert pipeline.aborted and pipeline.delayed == 0
+    assert pipeline.submit({"n": 2}) is False
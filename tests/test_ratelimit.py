@@ -0,0 +1,95 @@
+import types
+
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter
+
+
+class Clock:
+    """Stands in for the time module: sleeping moves the clock instead of waiting."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RateLimited(Exception):
+    def __init__(self, status_code=429, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    for name in ("TEST_RPM", "TEST_MAX_CONCURRENT", "TEST_TPM"):
+        monkeypatch.delenv(name, raising=False)
+    return str(tmp_path / "ratelimits.db")
+
+
+def test_request_bucket_refills_over_the_minute(db_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    monkeypatch.setenv("TEST_RPM", "2")
+    limiter = RateLimiter(db_path)
+
+    for _ in range(2):
+        limiter.release("test", limiter.acquire("test"))
+    assert clock.now == 1_000_000.0  # a full bucket lets the first two through at once
+
+    limiter.release("test", limiter.acquire("test"))
+    assert clock.now - 1_000_000.0 == pytest.approx(30.0, abs=0.01)  # one request per 30 s after that
+    assert limiter.stats()["test"]["calls"] == 3
+    assert limiter.stats()["test"]["max_wait_seconds"] == pytest.approx(30.0, abs=0.1)
+
+
+def test_concurrency_is_shared_by_limiters_on_one_database(db_path, monkeypatch):
+    monkeypatch.setenv("TEST_MAX_CONCURRENT", "1")
+    first, second = RateLimiter(db_path), RateLimiter(db_path)
+    limits = ratelimit.limits_for("test")
+
+    lease, _ = first._try_acquire("test", 0, limits)
+    assert lease is not None
+    assert second._try_acquire("test", 0, limits) == (None, ratelimit.POLL_SECONDS)
+
+    first.release("test", lease)
+    lease, wait = second._try_acquire("test", 0, limits)
+    assert lease is not None and wait is None
+
+
+def test_retry_after_pauses_every_limiter(db_path, monkeypatch):
+    limiter, other = RateLimiter(db_path), RateLimiter(db_path)
+    monkeypatch.setattr(ratelimit, "_limiter", limiter)
+    limits = ratelimit.limits_for("test")
+
+    ratelimit.note_error("test", RateLimited(429, {"Retry-After": "30"}))
+    lease, wait = other._try_acquire("test", 0, limits)
+    assert lease is None and 29 < wait <= 30
+
+    # A bare 429 pauses for the default; other errors pause nobody
+    ratelimit.note_error("fresh", RateLimited(429))
+    lease, wait = other._try_acquire("fresh", 0, limits)
+    assert lease is None and wait == pytest.approx(ratelimit.DEFAULT_429_PAUSE, abs=1)
+    ratelimit.note_error("other", RateLimited(500))
+    assert other._try_acquire("other", 0, limits)[0] is not None
+    assert limiter.stats()["test"]["rate_limited"] == 1
+
+
+def test_wait_retry_after_prefers_the_server_delay():
+    wait = ratelimit.wait_retry_after(fallback=lambda state: 7.0)
+
+    def state(exc):
+        return types.SimpleNamespace(outcome=types.SimpleNamespace(exception=lambda: exc))
+
+    assert wait(state(RateLimited(429, {"retry-after-ms": "1500"}))) == 1.5
+    assert wait(state(RateLimited(429, {"Retry-After": "12"}))) == 12.0
+    assert wait(state(RateLimited(503))) == 7.0
+    assert wait(types.SimpleNamespace(outcome=None)) == 7.0
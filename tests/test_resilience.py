@@ -0,0 +1,62 @@
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_breaker_opens_then_admits_one_trial_then_closes(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker("deepgram", failure_threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.retry_after() == 0
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 60
+
+    clock.now += 45
+    assert breaker.retry_after() == 15
+
+    # Once the timeout has passed, exactly one caller gets through as a trial
+    clock.now += 15
+    assert breaker.retry_after() == 0
+    assert breaker.state == HALF_OPEN
+    assert breaker.retry_after() > 0
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+    assert breaker.retry_after() == 0
+
+
+def test_failed_trial_reopens_the_breaker(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker("openai", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now += 30
+    assert breaker.retry_after() == 0
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 30
+
+
+def test_unused_trial_is_given_back(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker("video", failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.retry_after() == 0
+    breaker.cancel_trial()
+    assert breaker.retry_after() == 0
@@ -0,0 +1,56 @@
+import json
+
+import httpx
+import pytest
+from deepgram.core.api_error import ApiError
+from tenacity import wait_none
+
+import ratelimit
+import transcription
+
+
+@pytest.fixture(autouse=True)
+def limiter(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(str(tmp_path / "ratelimits.db")))
+    monkeypatch.setattr(ratelimit, "DEFAULT_429_PAUSE", 0.0)
+
+
+def failing(*errors):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return func, calls
+
+
+@pytest.mark.parametrize("status", [400, 401, 402, 415])
+def test_permanent_errors_are_not_retried(status):
+    func, calls = failing(ApiError(status_code=status, body="bad request"))
+    with pytest.raises(ApiError):
+        transcription.call_deepgram.retry_with(wait=wait_none())(func)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("error", [
+    ApiError(status_code=503, body="unavailable"),
+    ApiError(status_code=429, body="slow down"),
+    httpx.ConnectError("connection refused"),
+    httpx.ReadTimeout("timed out"),
+])
+def test_transient_errors_are_retried(error):
+    func, calls = failing(error, error)
+    assert transcription.call_deepgram.retry_with(wait=wait_none())(func) == "ok"
+    assert len(calls) == 3
+
+
+def test_command_line_output_is_indented(tmp_path, monkeypatch):
+    monkeypatch.setitem(transcription.BACKENDS, "deepgram", lambda input_file, topics=False: '{"results": {"utterances": []}}')
+    output = tmp_path / "out.json"
+
+    transcription.main("meeting.mp3", str(output))
+
+    assert output.read_text() == json.dumps({"results": {"utterances": []}}, indent=4)
@@ -0,0 +1,154 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import videotools
+
+BODY = bytes(range(256)) * 400  # 100 KB
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves BODY with byte-range support, answering 416 for a range past its end."""
+
+    requests_seen = []
+    unknown_total = False  # answer ranges with "bytes N-M/*", as some servers do
+
+    def do_GET(self):
+        self.requests_seen.append(self.headers.get("Range"))
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+            if start >= len(BODY):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(BODY)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            total = "*" if self.unknown_total else len(BODY)
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{total}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(BODY) - start))
+        self.end_headers()
+        self.wfile.write(BODY[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    RangeHandler.requests_seen = []
+    RangeHandler.unknown_total = False
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/audio.mp3"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_oversized_part_is_discarded_and_download_restarts(server, tmp_path):
+    dest = str(tmp_path / "audio.mp3")
+    with open(f"{dest}.part", "wb") as f:
+        f.write(b"x" * (len(BODY) + 500))  # left over from a different, larger file
+
+    assert videotools.fetch_resumable(server, dest) == dest
+
+    with open(dest, "rb") as f:
+        assert f.read() == BODY
+    assert RangeHandler.requests_seen == [f"bytes={len(BODY) + 500}-", None]
+    assert not os.path.exists(f"{dest}.part") and not os.path.exists(f"{dest}.part.json")
+
+
+def test_complete_part_is_promoted_without_refetching(server, tmp_path):
+    dest = str(tmp_path / "audio.mp3")
+    with open(f"{dest}.part", "wb") as f:
+        f.write(BODY)
+
+    videotools.fetch_resumable(server, dest)
+
+    with open(dest, "rb") as f:
+        assert f.read() == BODY
+    assert RangeHandler.requests_seen == [f"bytes={len(BODY)}-"]
+
+
+def test_partial_download_resumes_from_its_offset(server, tmp_path):
+    dest = str(tmp_path / "audio.mp3")
+    with open(f"{dest}.part", "wb") as f:
+        f.write(BODY[:30000])
+
+    videotools.fetch_resumable(server, dest)
+
+    with open(dest, "rb") as f:
+        assert f.read() == BODY
+    assert RangeHandler.requests_seen == ["bytes=30000-"]
+
+
+def test_resume_accepts_a_range_of_unknown_total(server, tmp_path):
+    RangeHandler.unknown_total = True
+    dest = str(tmp_path / "audio.mp3")
+    with open(f"{dest}.part", "wb") as f:
+        f.write(BODY[:30000])
+
+    videotools.fetch_resumable(server, dest)
+
+    with open(dest, "rb") as f:
+        assert f.read() == BODY
+    assert RangeHandler.requests_seen == ["bytes=30000-"]
+
+
+class FailingYoutubeDL:
+    def __init__(self, options):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def download(self, urls):
+        raise RuntimeError("yt-dlp unavailable")
+
+
+def test_mp4_audio_is_streamed_without_downloading_the_video(server, tmp_path, monkeypatch):
+    commands = []
+
+    def run_ffmpeg(cmd, log=None, progress=None):
+        commands.append(cmd)
+        with open(cmd[-1], "wb") as f:
+            f.write(b"audio")
+        return 0
+
+    monkeypatch.setattr(videotools, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(videotools, "probe_duration", lambda path: None)
+    url = server.replace("audio.mp3", "video.mp4")
+
+    result = videotools.download_audio(url, str(tmp_path / "audio.mp3"))
+
+    assert result == str(tmp_path / "audio.mp3")
+    [cmd] = commands
+    assert cmd[cmd.index("-i") + 1] == url and "-reconnect" in cmd
+    assert RangeHandler.requests_seen == []  # ffmpeg read the URL; nothing fetched the video
+    assert not os.path.exists(tmp_path / "audio.source.mp4")
+
+
+def test_downloaded_video_is_removed_when_extraction_fails(server, tmp_path, monkeypatch):
+    inputs = []
+
+    def run_ffmpeg(cmd, log=None, progress=None):
+        inputs.append(cmd[cmd.index("-i") + 1])
+        return 1
+
+    monkeypatch.setattr(videotools, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(videotools.yt_dlp, "YoutubeDL", FailingYoutubeDL)
+    url = server.replace("audio.mp3", "video.mp4")
+
+    assert videotools.download_audio(url, str(tmp_path / "audio.mp3")) is None
+
+    assert inputs == [url, str(tmp_path / "audio.source.mp4")]  # streamed first, then the resumable copy
+    assert not os.path.exists(tmp_path / "audio.source.mp4")
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+import pytest
+
+import compacttranscript
+import factory
+import ratelimit
+import transcription
+import webhook
+from jobstore import JobStore
+from pipeline import Deferred
+
+JOB_ID = "Finance/2024-05-01"
+
+
+@pytest.fixture
+def meeting(tmp_path):
+    wip_dir = str(tmp_path / "wip")
+    folder = os.path.join(wip_dir, "Finance", "2024-05-01")
+    os.makedirs(folder)
+    job = {
+        "job_id": JOB_ID, "scope": "Finance", "committee": "Finance", "date": "2024-05-01",
+        "structured_only": False, "use_cache": False,
+        "audio_path": os.path.join(folder, "audio.ogg"),
+        "transcript_path": os.path.join(folder, webhook.TRANSCRIPT_FILE),
+        "compact_path": os.path.join(folder, compacttranscript.COMPACT_FILE),
+    }
+    with open(job["audio_path"], "wb") as f:
+        f.write(b"OggS" + bytes(4096))
+    store = JobStore(str(tmp_path / "factory.db"))
+    store.upsert_job(job)
+    store.finish_stage(JOB_ID, "structure", None)
+    yield wip_dir, folder, job, store
+    store.close()
+
+
+def test_callback_round_trip_through_stand_in_deepgram(meeting, monkeypatch, tmp_path):
+    wip_dir, folder, job, store = meeting
+    monkeypatch.setenv("RATE_LIMIT_DB", str(tmp_path / "ratelimits.db"))
+    monkeypatch.setattr(ratelimit, "_limiter", None)
+    deepgram = webhook.StandInDeepgram(delay=0.5).start()
+    receiver = webhook.WebhookReceiver(wip_dir, 0, store=store, invalidates=["structure"]).start()
+    monkeypatch.setenv("DEEPGRAM_API_KEY", "test-key")
+    monkeypatch.setenv("DEEPGRAM_BASE_URL", deepgram.url)
+    monkeypatch.setattr(transcription, "_deepgram_client", None)
+    base_url = f"http://127.0.0.1:{receiver.port}"
+    try:
+        with pytest.raises(Deferred):
+            factory.callback_transcribe_stage(job, base_url)
+        deadline = time.time() + 10
+        while receiver.received == 0 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        transcription.close_clients()
+        receiver.stop()
+        deepgram.stop()
+
+    assert receiver.received == 1
+    [request] = deepgram.requests
+    assert request["bytes"] == os.path.getsize(job["audio_path"])
+    assert request["callback"] == webhook.callback_url(base_url, JOB_ID)
+
+    with open(job["transcript_path"], encoding="utf-8") as f:
+        result = json.load(f)
+    assert result["metadata"]["request_id"] == request["request_id"]
+    assert compacttranscript.is_current(job["transcript_path"], job["compact_path"])
+    assert webhook.read_pending(folder) is None
+    assert store.get_stage(JOB_ID, "transcribe")["status"] == "done"
+    assert store.get_stage(JOB_ID, "structure")["status"] == "stale"
+    # The next look at the deferred job finds the transcript instead of resubmitting
+    assert factory.callback_transcribe_stage(job, base_url) is job
+
+
+def test_callbacks_are_matched_to_their_job(meeting):
+    wip_dir, folder, job, store = meeting
+    receiver = webhook.WebhookReceiver(wip_dir, 0, store=store)
+    path = webhook.callback_url("", JOB_ID)
+    result = json.loads(json.dumps(webhook.SAMPLE_RESULT))
+    result["metadata"]["request_id"] = "current"
+    body = json.dumps(result).encode("utf-8")
+
+    assert receiver.handle(path, body)[0] == 410  # nothing submitted yet
+    webhook.write_pending(folder, {"request_id": "current", "submitted_at": time.time(),
+                                   "trim_map": None, "upload_path": None})
+
+    other = webhook.callback_url("", "Finance/2024-05-02")
+    assert receiver.handle(other.replace("2024-05-02", "2024-05-01"), body) == (403, "bad signature")
+
+    result["metadata"]["request_id"] = "superseded"
+    assert receiver.handle(path, json.dumps(result).encode("utf-8")) == (200, "stale request ignored")
+    assert not os.path.exists(job["transcript_path"])
+
+    assert receiver.handle(path, body) == (200, "ok")
+    assert os.path.exists(job["transcript_path"])
+    assert store.get_stage(JOB_ID, "transcribe")["status"] == "done"
+    assert receiver.handle(path, body) == (200, "already received")
+    assert receiver.received == 1
+
+
+def test_error_callback_fails_the_stage(meeting):
+    wip_dir, folder, job, store = meeting
+    receiver = webhook.WebhookReceiver(wip_dir, 0, store=store)
+    webhook.write_pending(folder, {"request_id": "r1", "submitted_at": time.time(),
+                                   "trim_map": None, "upload_path": None})
+    body = json.dumps({"request_id": "r1", "err_msg": "audio could not be decoded"}).encode("utf-8")
+
+    assert receiver.handle(webhook.callback_url("", JOB_ID), body) == (200, "error recorded")
+    with pytest.raises(RuntimeError, match="could not be decoded"):
+        factory.callback_transcribe_stage(job, "http://127.0.0.1:1")
+    assert webhook.read_pending(folder) is None
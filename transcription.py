@@ -1,71 +1,296 @@
-from tenacity import retry, stop_after_attempt, wait_fixed, after_log, before_log, RetryError
+from tenacity import retry, retry_if_exception, stop_after_attempt, after_log, before_log, RetryError
 import functools
+import json
 
+import asyncio
 import httpx
-from deepgram import DeepgramClient
+from deepgram import AsyncDeepgramClient, DeepgramClient
+from deepgram.environment import DeepgramClientEnvironment
 import os
 import pickle
 import logging
 import argparse
+import threading
+
+from ratelimit import get_limiter, limits_for, note_error, wait_retry_after
 
 logger = logging.getLogger(__name__)
 
+def call_deepgram_once(func, *args, **kwargs):
+    """One Deepgram request within the shared rate limit. Used directly when the request body can't be replayed."""
+    logger.info(f"call deepgram called")
+    # Every Deepgram request, from any thread or process, shares one rate/concurrency budget
+    with get_limiter().slot("deepgram"):
+        try:
+            response=func(*args,**kwargs)
+        except Exception as e:
+            note_error("deepgram", e)
+            raise
+    logger.info('good return')
+    return response
+
+def is_retryable(exc):
+    """
+    Whether a failed Deepgram call is worth repeating: rate limits, server
+    errors and network trouble. Other 4xx (bad key, unsupported media, invalid
+    options) fail the same way every time.
+    """
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError))
+
 @retry(
-    stop=stop_after_attempt(3),                  # Stop after 3 attempts
-    wait=wait_fixed(2),                          # Wait 2 seconds between retries
+    retry=retry_if_exception(is_retryable),      # Only rate limits, 5xx and network errors
+    stop=stop_after_attempt(5),                  # Stop after 5 attempts
+    wait=wait_retry_after(),                     # Honor Retry-After, else exponential backoff
     before=before_log(logger, logging.INFO),     # Log before each retry attempt
     after=after_log(logger, logging.INFO)        # Log after each retry attempt
     )
 def call_deepgram(func, *args, **kwargs):
-    logger.info(f"call deepgram called")
-    response=func(*args,**kwargs)
-    logger.info('good return')
-    return response
+    return call_deepgram_once(func, *args, **kwargs)
 
-def transcribe_audio(input_file, output_file=None, topics=False):
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+class FileUpload:
     """
-    This version runs with deepgram-sdk>=5.0.0.
+    A file sent as a request body in fixed-size chunks, so an upload holds about
+    one chunk in memory however long the meeting is. Every iteration reopens the
+    file, so a retried request (by tenacity or the SDK) sends it again from the start.
     """
+    def __init__(self, path, chunk_size=UPLOAD_CHUNK_BYTES):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return os.path.getsize(self.path)
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+TRANSCRIBE_OPTIONS = dict(
+    model="nova-2-meeting",
+    utterances=True,
+    punctuate=True,
+    diarize=True,
+    smart_format=True,
+    paragraphs=True,
+)
+
+# --- Shared Clients ---
+
+_deepgram_client = None
+_async_deepgram_client = None
+_deepgram_client_lock = threading.Lock()
+
+def _load_api_key():
     if 'DEEPGRAM_API_KEY' not in os.environ:
         from dotenv import load_dotenv
         load_dotenv()
     assert 'DEEPGRAM_API_KEY' in os.environ,"no API Key for Deepgram!"
+    return os.environ["DEEPGRAM_API_KEY"]
 
-    # Initialize the client (v5 style) with custom timeout via httpx_client
-    deepgram: DeepgramClient = DeepgramClient(
-        api_key=os.environ["DEEPGRAM_API_KEY"],
-        httpx_client=httpx.Client(timeout=httpx.Timeout(600.0, connect=100.0))
+def _http_options():
+    """
+    Timeout and connection-pool settings shared by the sync and async clients.
+    The pool defaults to the Deepgram concurrency limit, since no more requests
+    than that are ever in flight; DEEPGRAM_POOL_CONNECTIONS and
+    DEEPGRAM_KEEPALIVE_SECONDS override it.
+    """
+    connections = int(os.environ.get("DEEPGRAM_POOL_CONNECTIONS") or limits_for("deepgram")["concurrency"] or 10)
+    return dict(
+        timeout=httpx.Timeout(600.0, connect=100.0),
+        limits=httpx.Limits(
+            max_connections=connections,
+            max_keepalive_connections=connections,
+            keepalive_expiry=float(os.environ.get("DEEPGRAM_KEEPALIVE_SECONDS") or 60),
+        ),
     )
 
-    with open(input_file, "rb") as file:
-        buffer_data = file.read()
+def _environment():
+    """Deepgram's production hosts, or DEEPGRAM_BASE_URL for the REST API (e.g. `webhook.py --stand-in`)."""
+    production = DeepgramClientEnvironment.PRODUCTION
+    base_url = os.environ.get("DEEPGRAM_BASE_URL")
+    if not base_url:
+        return production
+    return DeepgramClientEnvironment(
+        base=base_url.rstrip("/"), production=production.production,
+        agent=production.agent, agent_rest=production.agent_rest,
+    )
+
+def get_deepgram_client():
+    """Return a process-wide Deepgram client so every meeting in a run reuses its connections."""
+    global _deepgram_client
+    with _deepgram_client_lock:
+        if _deepgram_client is None:
+            # Initialize the client (v5 style) with custom timeout via httpx_client
+            _deepgram_client = DeepgramClient(
+                api_key=_load_api_key(),
+                environment=_environment(),
+                httpx_client=httpx.Client(**_http_options())
+            )
+        return _deepgram_client
+
+def get_async_deepgram_client():
+    """The asyncio counterpart of get_deepgram_client, for callers running in an event loop."""
+    global _async_deepgram_client
+    with _deepgram_client_lock:
+        if _async_deepgram_client is None:
+            _async_deepgram_client = AsyncDeepgramClient(
+                api_key=_load_api_key(),
+                environment=_environment(),
+                httpx_client=httpx.AsyncClient(**_http_options())
+            )
+        return _async_deepgram_client
+
+def _http_client(client):
+    return client._client_wrapper.httpx_client.httpx_client
+
+def _detach_clients():
+    global _deepgram_client, _async_deepgram_client
+    with _deepgram_client_lock:
+        clients = _deepgram_client, _async_deepgram_client
+        _deepgram_client = _async_deepgram_client = None
+    return clients
+
+def close_clients():
+    """
+    Close the shared clients' connection pools. Call once at the end of a run;
+    a later get_deepgram_client() starts a fresh client.
+    """
+    client, async_client = _detach_clients()
+    if client is not None:
+        _http_client(client).close()
+    if async_client is not None:
+        try:
+            asyncio.run(_http_client(async_client).aclose())
+        except RuntimeError as e:
+            # Called from inside a running loop: the caller should await aclose_clients() instead
+            logger.warning(f"could not close async Deepgram client: {e}")
+
+async def aclose_clients():
+    """close_clients() for code running in an event loop."""
+    client, async_client = _detach_clients()
+    if client is not None:
+        _http_client(client).close()
+    if async_client is not None:
+        await _http_client(async_client).aclose()
+
+def _write_json(result_json, output_file):
+    if output_file:
+        with open(output_file,'w') as f:
+            f.write(result_json)
+    return result_json
+
+def _write_response(response, output_file):
+    return _write_json(response.model_dump_json(), output_file)
+
+# --- Backends ---
+# A backend takes (input_file, topics) and returns a Deepgram-shaped result as
+# a JSON string, so everything downstream works the same whichever produced it.
+
+def _deepgram_backend(input_file, topics=False):
+    """
+    This version runs with deepgram-sdk>=5.0.0.
+    """
+    deepgram: DeepgramClient = get_deepgram_client()
+
+    upload = FileUpload(input_file)
 
     # Define the API call using v5 syntax
     # Note: Options are now passed as kwargs directly
+    # The length is sent up front so the upload is a plain body, not a chunked one
     transcribe_func = functools.partial(
         deepgram.listen.v1.media.transcribe_file,
-        request=buffer_data,
-        model="nova-2-meeting",
+        request=upload,
         topics=topics,
-        utterances=True,
-        punctuate=True,
-        diarize=True,
-        smart_format=True,
-        paragraphs=True,
+        request_options={"additional_headers": {"Content-Length": str(len(upload))}},
+        **TRANSCRIBE_OPTIONS,
     )
 
     response = call_deepgram(transcribe_func)
     logger.info("returned from deepgram")
+    return response.model_dump_json()
 
-    if output_file:
-        with open(output_file,'w') as f:
-            f.write(response.model_dump_json(indent=4))
-    
-    return response.model_dump_json(indent=4)
+def _local_backend(input_file, topics=False):
+    """faster-whisper on this machine's CPU (see localasr.py); topics are not supported."""
+    from localasr import transcribe_local
+    return json.dumps(transcribe_local(input_file))
+
+BACKENDS = {
+    "deepgram": _deepgram_backend,
+    "local": _local_backend,
+}
+
+def transcribe_audio(input_file, output_file=None, topics=False, backend=None):
+    """
+    Transcribe input_file with `backend` (default: TRANSCRIBE_BACKEND, else
+    "deepgram") and return the Deepgram-shaped result as JSON.
+    """
+    backend = backend or os.environ.get("TRANSCRIBE_BACKEND") or "deepgram"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend {backend!r}; choose from {', '.join(sorted(BACKENDS))}")
+    return _write_json(BACKENDS[backend](input_file, topics), output_file)
+
+def submit_transcription(input_file, callback_url, topics=False):
+    """
+    Submit input_file in Deepgram's callback mode and return the request id.
+    Deepgram answers as soon as the upload is accepted and later POSTs the
+    result to callback_url (see webhook.py), so no connection is held open
+    while the audio is transcribed.
+    """
+    deepgram: DeepgramClient = get_deepgram_client()
+
+    upload = FileUpload(input_file)
+    transcribe_func = functools.partial(
+        deepgram.listen.v1.media.transcribe_file,
+        request=upload,
+        callback=callback_url,
+        callback_method="POST",
+        topics=topics,
+        request_options={"additional_headers": {"Content-Length": str(len(upload))}},
+        **TRANSCRIBE_OPTIONS,
+    )
+
+    response = call_deepgram(transcribe_func)
+    request_id = getattr(response, "request_id", None)
+    if not request_id and getattr(response, "metadata", None) is not None:
+        request_id = response.metadata.request_id
+    logger.info(f"deepgram accepted callback request {request_id}")
+    return request_id
+
+def transcribe_stream(chunks, output_file=None, topics=False):
+    """
+    Transcribe audio that is still being produced, e.g. by videotools.stream_audio.
+    `chunks` is an iterator of bytes sent as a chunked upload, so Deepgram starts
+    receiving audio while the download is still running. An iterator can only be
+    consumed once, so a failed request is not retried here; the caller starts a
+    fresh stream instead.
+    """
+    deepgram: DeepgramClient = get_deepgram_client()
+
+    transcribe_func = functools.partial(
+        deepgram.listen.v1.media.transcribe_file,
+        request=chunks,
+        topics=topics,
+        **TRANSCRIBE_OPTIONS,
+    )
+
+    response = call_deepgram_once(transcribe_func)
+    logger.info("returned from deepgram")
+
+    return _write_response(response, output_file)
     
-def main(audio: str, output: str = None, doprint: bool = False):
+def main(audio: str, output: str = None, doprint: bool = False, backend: str = None):
     """Main entry point."""
-    result_json = transcribe_audio(audio, output)
+    # The pipeline stores transcripts unindented; output from the command line is for people to read
+    result_json = json.dumps(json.loads(transcribe_audio(audio, backend=backend)), indent=4)
+    _write_json(result_json, output)
     if doprint:
         print(result_json)
  
@@ -74,6 +299,7 @@ if __name__ == "__main__":
     parser.add_argument("--audio", required=True, help="Path to input audio file.")
     parser.add_argument("--output", help="Optional path to write JSON output.")
     parser.add_argument("--print",dest="doprint",action="store_true", help="Print the JSON result to stdout.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), help="Transcription backend (default: TRANSCRIBE_BACKEND or deepgram).")
     args = parser.parse_args()
 
-    main(audio=args.audio, output=args.output, doprint=args.doprint)
+    main(audio=args.audio, output=args.output, doprint=args.doprint, backend=args.backend)
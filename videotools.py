@@ -1,120 +1,513 @@
 import yt_dlp
 import argparse
 import os
-import sys
 import shutil
+import subprocess
+import json
+import threading
+import time
+from datetime import datetime
 
-def download_audio(stream_url, output_filename):
+import requests
+
+# Audio encodings for download_audio / stream_audio. "archive" is the original
+# high-quality stereo MP3; the asr-* profiles are 16 kHz mono, which is all a
+# speech recognizer uses and a fraction of the upload size.
+#   ext:          file extension of the result
+#   format:       ffmpeg muxer used when streaming to a pipe
+#   ffmpeg_args:  encoder arguments for the direct ffmpeg path
+#   ytdlp_codec / ytdlp_quality / ytdlp_args: the same encoding via yt-dlp's FFmpegExtractAudio
+ASR_RESAMPLE = ['-ac', '1', '-ar', '16000']
+AUDIO_PROFILES = {
+    'archive': {
+        'ext': 'mp3', 'format': 'mp3',
+        'ffmpeg_args': ['-acodec', 'libmp3lame', '-q:a', '2'],
+        'ytdlp_codec': 'mp3', 'ytdlp_quality': '192', 'ytdlp_args': [],
+    },
+    'asr-mp3': {
+        'ext': 'mp3', 'format': 'mp3',
+        'ffmpeg_args': ASR_RESAMPLE + ['-acodec', 'libmp3lame', '-b:a', '32k'],
+        'ytdlp_codec': 'mp3', 'ytdlp_quality': '32', 'ytdlp_args': ASR_RESAMPLE,
+    },
+    'asr-opus': {
+        'ext': 'opus', 'format': 'ogg',
+        'ffmpeg_args': ASR_RESAMPLE + ['-acodec', 'libopus', '-b:a', '24k', '-application', 'voip'],
+        'ytdlp_codec': 'opus', 'ytdlp_quality': '24', 'ytdlp_args': ASR_RESAMPLE,
+    },
+    'asr-flac': {
+        'ext': 'flac', 'format': 'flac',
+        'ffmpeg_args': ASR_RESAMPLE + ['-acodec', 'flac'],
+        'ytdlp_codec': 'flac', 'ytdlp_quality': None, 'ytdlp_args': ASR_RESAMPLE,
+    },
+}
+DEFAULT_PROFILE = 'archive'
+
+def audio_filename(base_filename, profile=DEFAULT_PROFILE):
+    """The file name download_audio produces for `base_filename` (extension ignored) under a profile."""
+    return f"{base_filename.rsplit('.', 1)[0]}.{AUDIO_PROFILES[profile]['ext']}"
+
+# For HTTP inputs: on a dropped connection ffmpeg re-requests from the byte it had reached
+HTTP_RECONNECT_ARGS = ['-reconnect', '1', '-reconnect_on_network_error', '1', '-reconnect_delay_max', '30']
+
+def ffmpeg_audio_command(stream_url, output, profile=DEFAULT_PROFILE):
+    """ffmpeg command extracting the audio of stream_url into output ('pipe:1' to stream it)."""
+    settings = AUDIO_PROFILES[profile]
+    input_args = HTTP_RECONNECT_ARGS if stream_url.lower().startswith(('http://', 'https://')) else []
+    cmd = ['ffmpeg', '-nostdin', '-y'] + input_args + ['-i', stream_url, '-vn'] + settings['ffmpeg_args']
+    if output == 'pipe:1':
+        cmd += ['-f', settings['format']]
+    return cmd + [output]
+
+# A download is only promoted to its final name if its duration is within this
+# tolerance of what was expected: of the source itself (tight) or of the length
+# listed on the archive page, which is rounded and may include pre-roll (loose).
+SOURCE_DURATION_TOLERANCE = (10.0, 0.02)  # seconds, fraction - whichever is larger
+LISTED_DURATION_TOLERANCE = (180.0, 0.05)
+RESUME_ATTEMPTS = 5
+REQUEST_TIMEOUT = 60
+
+class IncompleteDownload(Exception):
+    """A download ended early or failed its integrity check; any partial data is kept for resuming."""
+
+def probe_duration(path):
+    """Duration of a media file in seconds via ffprobe, or None if it can't be determined."""
+    if shutil.which('ffprobe') is None:
+        return None
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        capture_output=True, text=True,
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+def check_audio(path, expected_seconds=None, tolerance=SOURCE_DURATION_TOLERANCE):
+    """
+    Raise IncompleteDownload unless `path` is a non-empty file whose duration
+    is not short of expected_seconds by more than the tolerance. Without an
+    expected duration, or without ffprobe, only emptiness is checked.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise IncompleteDownload(f"{path} is missing or empty")
+    if not expected_seconds:
+        return
+    actual = probe_duration(path)
+    if actual is None:
+        return
+    allowed = max(tolerance[0], expected_seconds * tolerance[1])
+    if actual < expected_seconds - allowed:
+        raise IncompleteDownload(f"{path} is {actual:.0f}s long, expected about {expected_seconds:.0f}s")
+
+class DownloadLog:
+    """
+    The log file of one download. Downloads running in different threads each
+    write to their own log and never touch sys.stdout / sys.stderr. It also
+    serves as the yt-dlp `logger`; a DownloadLog(None) discards everything.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+
+    def write(self, message):
+        if not self.file:
+            return
+        with self._lock:
+            self.file.write(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}\n")
+            self.file.flush()
+
+    # yt-dlp logger interface
+    def debug(self, message):
+        self.write(message)
+
+    def info(self, message):
+        self.write(message)
+
+    def warning(self, message):
+        self.write(f"WARNING: {message}")
+
+    def error(self, message):
+        self.write(f"ERROR: {message}")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def report_progress(callback, phase, started, bytes_done=None, total_bytes=None, media_seconds=None, new_bytes=None, **extra):
+    """
+    Hand one progress update to a download's callback, if it has one. Updates are dicts:
+        phase             'download' (fetching the source) or 'encode' (ffmpeg extracting audio)
+        bytes             bytes fetched or written so far
+        total_bytes       expected total, when known
+        media_seconds     media time processed so far (encode phase)
+        bytes_per_second  average throughput since `started` (of new_bytes, if some
+                          of bytes_done were already on disk from an earlier run)
+    plus any phase-specific extras (e.g. segments_done for HLS, speed for ffmpeg).
+    """
+    if callback is None:
+        return
+    elapsed = time.monotonic() - started
+    new_bytes = bytes_done if new_bytes is None else new_bytes
+    callback(dict(
+        phase=phase,
+        bytes=bytes_done,
+        total_bytes=total_bytes,
+        media_seconds=media_seconds,
+        bytes_per_second=round(new_bytes / elapsed) if new_bytes and elapsed > 0 else None,
+        **extra,
+    ))
+
+def run_ffmpeg(cmd, log=None, progress=None, input_paths=None):
+    """
+    Run an ffmpeg command built by ffmpeg_audio_command. Its messages go to `log`
+    and its -progress output is turned into 'encode' progress updates. If
+    input_paths is given, those files are concatenated into ffmpeg's stdin in
+    order (the command must read 'pipe:0'). Returns ffmpeg's exit code.
+    """
+    cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    if log:
+        log.write(f"Running: {' '.join(cmd)}")
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if input_paths else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=log.file if log and log.file else subprocess.DEVNULL,
+    )
+    started = time.monotonic()
+
+    def read_progress():
+        fields = {}
+        for raw in process.stdout:
+            key, _, value = raw.decode('utf-8', errors='replace').strip().partition('=')
+            fields[key] = value
+            if key != 'progress':
+                continue
+            out_time = fields.get('out_time_us') or fields.get('out_time_ms')
+            size = fields.get('total_size')
+            speed = fields.get('speed', '').rstrip('x')
+            report_progress(
+                progress, 'encode', started,
+                bytes_done=int(size) if size and size.isdigit() else None,
+                media_seconds=int(out_time) / 1_000_000 if out_time and out_time.isdigit() else None,
+                speed=float(speed) if speed.replace('.', '', 1).isdigit() else None,
+            )
+            fields = {}
+
+    reader = threading.Thread(target=read_progress, name="ffmpeg-progress", daemon=True)
+    reader.start()
+    if input_paths:
+        try:
+            for path in input_paths:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, process.stdin)
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+    returncode = process.wait()
+    reader.join()
+    process.stdout.close()
+    return returncode
+
+def fetch_resumable(url, dest, attempts=RESUME_ATTEMPTS, log=None, progress=None):
+    """
+    Download url to dest with HTTP byte-range resume. Progress lives in
+    dest + '.part' (never deleted on failure) alongside the validators of the
+    response it came from; a later call continues from where it stopped, or
+    starts over if the server's copy has changed (If-Range) or ranges aren't
+    supported. dest only appears once the byte count matches the server's size.
+    """
+    if os.path.exists(dest):
+        return dest
+    log = log or DownloadLog(None)
+    part_path = f"{dest}.part"
+    meta_path = f"{dest}.part.json"
+    session = requests.Session()
+    started = time.monotonic()
+    transferred = 0  # bytes fetched by this call, for throughput
+    restarted = False
+
+    for attempt in range(1, attempts + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        meta = {}
+        if offset and os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        headers = {}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            validator = meta.get('etag') or meta.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                if response.status_code == 416:
+                    # Asked for bytes past the end: either the part is already complete, or
+                    # it is stale (larger than the server's copy) and must go
+                    server_total = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                    total = int(server_total) if server_total.isdigit() else meta.get('total')
+                    if total == offset:
+                        meta['total'] = total
+                        break  # everything was already on disk
+                    if restarted:
+                        raise IncompleteDownload(f"{url}: server refused the range again after a fresh start")
+                    log.write(f"Partial download of {offset} bytes does not match the server's {total}; starting over.")
+                    for path in (part_path, meta_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    restarted = True
+                    continue
+                response.raise_for_status()
+                if response.status_code == 206:
+                    server_total = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                    total = int(server_total) if server_total.isdigit() else None  # '*': size unknown
+                    mode = 'ab'
+                    log.write(f"Resuming {url} at byte {offset}")
+                else:
+                    # Full body: no range support, or the file changed since the partial download
+                    length = response.headers.get('Content-Length')
+                    total = int(length) if length else None
+                    offset, mode = 0, 'wb'
+                meta = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'total': total,
+                }
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+                received = offset
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+                        received += len(chunk)
+                        transferred += len(chunk)
+                        report_progress(
+                            progress, 'download', started, bytes_done=received, total_bytes=total,
+                            new_bytes=transferred,
+                        )
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == attempts:
+                raise IncompleteDownload(f"{url}: {e}") from e
+            log.write(f"Download interrupted at {os.path.getsize(part_path) if os.path.exists(part_path) else 0} bytes ({e}); resuming.")
+            time.sleep(min(2 ** attempt, 30))
+            continue
+        if meta.get('total') is None or os.path.getsize(part_path) >= meta['total']:
+            break
+        log.write(f"Download ended early at {os.path.getsize(part_path)} of {meta['total']} bytes; resuming.")
+
+    size = os.path.getsize(part_path)
+    if meta.get('total') is not None and size != meta['total']:
+        raise IncompleteDownload(f"{url}: got {size} of {meta['total']} bytes")
+    os.replace(part_path, dest)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    return dest
+
+def _promote(temp_path, final_filename, expected_duration, tolerance=LISTED_DURATION_TOLERANCE):
+    """Check a finished download and rename it into place; a failed check removes it."""
+    try:
+        check_audio(temp_path, expected_duration, tolerance)
+    except IncompleteDownload:
+        os.remove(temp_path)
+        raise
+    shutil.move(temp_path, final_filename)
+    return final_filename
+
+def _promote_extracted(temp_path, final_filename, source_duration, expected_duration):
+    """_promote audio extracted from a whole source: held to the source's own duration when it is known."""
+    if source_duration:
+        return _promote(temp_path, final_filename, source_duration, SOURCE_DURATION_TOLERANCE)
+    return _promote(temp_path, final_filename, expected_duration)
+
+def download_audio(stream_url, output_filename, profile=DEFAULT_PROFILE, expected_duration=None, log_path=None, progress=None):
     """
     Downloads audio from a stream, saving to a temporary file first,
     and then renaming upon successful completion.
-    Redirects all yt-dlp output to progress.log.
+    `profile` picks the encoding from AUDIO_PROFILES and decides the extension.
+
+    Interrupted downloads resume: direct MP4s are streamed through ffmpeg, which
+    reconnects at the byte it reached (failing that, the file is fetched whole by
+    byte range), HLS streams by segment, yt-dlp from its own .part file. The
+    result is only renamed into place after check_audio; `expected_duration`
+    (e.g. the length listed on the archive page) is checked when the source's
+    own duration is unknown.
+
+    Safe to call from several threads at once: ffmpeg and yt-dlp output goes to
+    this download's own log (log_path, default '<output>.download.log') and
+    live progress is passed to `progress(update)` as described in report_progress.
     """
-    log_file_path = 'progress.log'
+    settings = AUDIO_PROFILES[profile]
+    ext = settings['ext']
     base_filename = output_filename.rsplit('.', 1)[0]
     temp_filename = f"{base_filename}.part"
-    final_filename = f"{base_filename}.mp3"
+    final_filename = audio_filename(base_filename, profile)
 
     # If the final file already exists, we're done.
     if os.path.exists(final_filename):
         print(f"'{final_filename}' already exists. Skipping download.")
         return final_filename
-        
-    # If a partial file exists, remove it to start fresh.
-    if os.path.exists(temp_filename):
-        os.remove(temp_filename)
 
-    with open(log_file_path, 'a', encoding='utf-8') as log_file:
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-        sys.stdout = log_file
-        sys.stderr = log_file
+    log = DownloadLog(log_path or f"{base_filename}.download.log")
+    try:
+        # OPTIMIZATION: HLS archives (playlist.m3u8) are fetched with parallel segment
+        # downloads instead of yt-dlp's one-segment-at-a-time loop.
+        if '.m3u8' in stream_url.lower():
+            from hlsfetch import download_hls_audio
+            log.write(f"Detected HLS URL. Using parallel segment download for: {stream_url}")
+            try:
+                download_hls_audio(
+                    stream_url, final_filename, profile,
+                    expected_duration=expected_duration, log=log, progress=progress,
+                )
+                print(f"Successfully downloaded HLS audio to {final_filename}")
+                return final_filename
+            except Exception as e:
+                log.write(f"Parallel HLS download failed ({e}). Falling back to yt-dlp.")
 
-        try:
-            # OPTIMIZATION: If it's a direct MP4 link, use ffmpeg to stream and extract audio directly.
-            # This avoids downloading the huge video file first.
-            if stream_url.lower().endswith('.mp4'):
-                print(f"Detected MP4 URL. Using direct ffmpeg streaming for: {stream_url}")
-                import subprocess
-                
-                # ffmpeg -i "url" -vn -acodec libmp3lame -q:a 2 "output.mp3"
-                # -vn: Disable video recording
-                # -acodec libmp3lame: Use LAME mp3 encoder
-                # -q:a 2: Variable bit rate, quality level 2 (good balance)
-                # -y: Overwrite output files without asking
-                
-                cmd = [
-                    'ffmpeg',
-                    '-y',
-                    '-i', stream_url,
-                    '-vn',
-                    '-acodec', 'libmp3lame',
-                    '-q:a', '2',
-                    final_filename
-                ]
-                
-                # Run ffmpeg, capturing output to the log file we opened
-                # We need to flush the python buffers to ensure log file order is roughly correct
-                sys.stdout.flush()
-                sys.stderr.flush()
-                
-                result = subprocess.run(cmd, stdout=log_file, stderr=log_file, text=True)
-                
-                if result.returncode == 0 and os.path.exists(final_filename):
-                     # Restore stdout to print success message
-                    sys.stdout = original_stdout
+        # OPTIMIZATION: If it's a direct MP4 link, let ffmpeg stream it and keep only the
+        # audio, so the huge video file is never written to disk and encoding overlaps
+        # the download. A dropped connection is resumed by ffmpeg itself (HTTP_RECONNECT_ARGS).
+        if stream_url.lower().endswith('.mp4'):
+            temp_output_file = f"{temp_filename}.{ext}"
+            log.write(f"Detected MP4 URL. Using direct ffmpeg streaming for: {stream_url}")
+            returncode = run_ffmpeg(ffmpeg_audio_command(stream_url, temp_output_file, profile), log, progress)
+            if returncode == 0 and os.path.exists(temp_output_file):
+                try:
+                    _promote_extracted(temp_output_file, final_filename, probe_duration(stream_url), expected_duration)
                     print(f"Successfully streamed and extracted audio to {final_filename}")
                     return final_filename
-                else:
-                    print(f"FFmpeg direct stream failed with return code {result.returncode}. Falling back to yt-dlp.")
-                    # Fall through to yt-dlp logic below if this fails
-
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': f'{temp_filename}',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'noplaylist': True,
-                'progress': True,
-            }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([stream_url])
-            
-            # After download, the temp file will have an extension like .mp3 or .webm
-            # We need to find it and rename it to the final mp3 filename.
-            # Note: The postprocessor ensures the final output is mp3.
-            temp_output_file = f"{temp_filename}.mp3"
-
-            if os.path.exists(temp_output_file):
-                shutil.move(temp_output_file, final_filename)
-                # Restore stdout to print success message
-                sys.stdout = original_stdout
+                except IncompleteDownload as e:
+                    log.write(f"Streamed audio failed its check ({e}).")
+            else:
+                log.write(f"FFmpeg direct stream failed with return code {returncode}.")
+
+            # Fall back to fetching the whole file with byte-range resume, which survives
+            # repeated drops and restarts; the video is deleted as soon as it has been used
+            log.write(f"Trying a resumable download of {stream_url}")
+            source_filename = None
+            try:
+                source_filename = fetch_resumable(
+                    stream_url, f"{base_filename}.source.mp4", log=log, progress=progress
+                )
+                returncode = run_ffmpeg(
+                    ffmpeg_audio_command(source_filename, temp_output_file, profile), log, progress
+                )
+                if returncode == 0 and os.path.exists(temp_output_file):
+                    _promote_extracted(temp_output_file, final_filename, probe_duration(source_filename), expected_duration)
+                    print(f"Successfully downloaded and extracted audio to {final_filename}")
+                    return final_filename
+                log.write(f"FFmpeg audio extraction failed with return code {returncode}. Falling back to yt-dlp.")
+            except Exception as e:
+                log.write(f"Resumable MP4 download failed ({e}). Falling back to yt-dlp.")
+            finally:
+                if source_filename and os.path.exists(source_filename):
+                    os.remove(source_filename)
+
+        extract_audio = {
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': settings['ytdlp_codec'],
+        }
+        if settings['ytdlp_quality']:
+            extract_audio['preferredquality'] = settings['ytdlp_quality']
+        started = time.monotonic()
+
+        def progress_hook(d):
+            if d.get('status') == 'downloading':
+                report_progress(
+                    progress, 'download', started,
+                    bytes_done=d.get('downloaded_bytes'),
+                    total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                )
+
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': f'{temp_filename}',
+            'postprocessors': [extract_audio],
+            'postprocessor_args': {'extractaudio': settings['ytdlp_args']},
+            'noplaylist': True,
+            'continuedl': True,  # pick up an interrupted download from its .part file
+            # All output goes to this download's log, never to the shared console streams
+            'logger': log,
+            'quiet': True,
+            'noprogress': True,
+            'progress_hooks': [progress_hook],
+        }
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([stream_url])
+
+        # After download, the temp file will have an extension like .mp3 or .webm
+        # We need to find it and rename it to the final filename.
+        # Note: The postprocessor ensures the final output has the profile's extension.
+        # If it is missing, the downloaded file may have kept its original extension.
+        for candidate in [f"{temp_filename}.{ext}"] + [f"{temp_filename}{other_ext}" for other_ext in ['.webm', '.m4a', '.ogg']]:
+            if os.path.exists(candidate):
+                _promote(candidate, final_filename, expected_duration)
                 print(f"Successfully downloaded and moved audio to {final_filename}")
                 return final_filename
-            else:
-                # This case might happen if the downloaded file had a different extension
-                # before ffmpeg converted it. Let's try to find it.
-                for ext in ['.webm', '.m4a', '.ogg']:
-                    if os.path.exists(f"{temp_filename}{ext}"):
-                        shutil.move(f"{temp_filename}{ext}", final_filename)
-                        sys.stdout = original_stdout
-                        print(f"Successfully downloaded and moved audio to {final_filename}")
-                        return final_filename
-                
-                # If we still can't find it, something went wrong.
-                print(f"Error: Post-processing failed. Could not find temp file for {temp_filename}")
-                return None
-
-        except Exception as e:
-            print(f"An error occurred during download: {e}")
-            return None
-        finally:
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
+
+        # If we still can't find it, something went wrong.
+        log.write(f"Error: Post-processing failed. Could not find temp file for {temp_filename}")
+        print(f"Error: Post-processing failed for {final_filename}; see {log.path}")
+        return None
+
+    except Exception as e:
+        log.write(f"An error occurred during download: {e}")
+        print(f"An error occurred during download of {final_filename}: {e} (see {log.path})")
+        return None
+    finally:
+        log.close()
+
+def stream_audio(stream_url, tee_filename=None, chunk_size=64 * 1024, profile=DEFAULT_PROFILE, log_path=None):
+    """
+    Yield the audio of a stream, encoded per `profile`, while ffmpeg is still extracting it,
+    for handing straight to a chunked upload (transcription.transcribe_stream).
+    If tee_filename is given, the same bytes are written to disk and the file is
+    only put in place once ffmpeg has finished cleanly, so a broken stream never
+    leaves a truncated audio file behind. ffmpeg's messages go to log_path
+    (default '<tee>.download.log', or nowhere without a tee file).
+    """
+    if tee_filename:
+        tee_filename = audio_filename(tee_filename, profile)
+        base_filename = tee_filename.rsplit('.', 1)[0]
+        temp_filename = f"{base_filename}.part.{AUDIO_PROFILES[profile]['ext']}"
+        log_path = log_path or f"{base_filename}.download.log"
+    else:
+        temp_filename = None
+
+    cmd = ffmpeg_audio_command(stream_url, 'pipe:1', profile)
+    log = DownloadLog(log_path)
+    log.write(f"Streaming: {' '.join(cmd)}")
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log.file or subprocess.DEVNULL)
+    tee_file = open(temp_filename, 'wb') if temp_filename else None
+    completed = False
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            if tee_file:
+                tee_file.write(chunk)
+            yield chunk
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {process.returncode} while streaming {stream_url}")
+        completed = True
+    finally:
+        # Also reached when the consumer stops early (e.g. the upload failed)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        log.close()
+        if tee_file:
+            tee_file.close()
+            if completed:
+                shutil.move(temp_filename, tee_filename)
+            elif os.path.exists(temp_filename):
+                os.remove(temp_filename)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Download audio from a video stream.")
@@ -128,20 +521,33 @@ if __name__ == '__main__':
         '--output',
         type=str,
         default="temp_audio.mp3",
-        help="The desired final output filename (with extension)."
+        help="The desired final output filename (the extension follows --profile)."
+    )
+    parser.add_argument(
+        '--profile',
+        choices=sorted(AUDIO_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="Audio encoding profile (see AUDIO_PROFILES)."
     )
     args = parser.parse_args()
 
+    log_path = f"{args.output.rsplit('.', 1)[0]}.download.log"
     print(f"--- Testing Audio Download ---")
     print(f"URL: {args.url}")
     print(f"Output will be saved to {args.output}")
-    print(f"All verbose download output is being redirected to progress.log")
+    print(f"All verbose download output is being written to {log_path}")
+
+    def show_progress(update):
+        done = f"{update['media_seconds']:.0f}s of media" if update['media_seconds'] is not None else f"{(update['bytes'] or 0) / 1e6:.1f} MB"
+        rate = f", {update['bytes_per_second'] / 1e6:.2f} MB/s" if update['bytes_per_second'] else ""
+        print(f"\r  {update['phase']}: {done}{rate}    ", end="", flush=True)
 
-    result_path = download_audio(args.url, args.output)
+    result_path = download_audio(args.url, args.output, args.profile, log_path=log_path, progress=show_progress)
+    print()
 
     if result_path:
         print(f"\n--- SUCCESS ---")
         print(f"Audio successfully downloaded to: {result_path}")
     else:
         print(f"\n--- FAILURE ---")
-        print(f"Audio download failed. Check progress.log for details.")
+        print(f"Audio download failed. Check {log_path} for details.")
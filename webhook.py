@@ -0,0 +1,318 @@
+"""
+Receiver for Deepgram's callback mode (factory.py --callback-url).
+
+A normal transcription request holds its HTTP connection, and the worker
+thread behind it, open until Deepgram has finished, which takes minutes for a long
+meeting. In callback mode the audio is submitted with a callback URL and
+Deepgram answers at once with a request id. The worker moves on to the next
+meeting. When the transcript is ready, Deepgram POSTs it to that URL, and this
+receiver writes it to the meeting's deepgram_raw.json and marks the transcribe
+stage done in the job store.
+
+Deepgram has to be able to reach the receiver, so --callback-url is the public
+address (a reverse proxy or tunnel) that forwards to --webhook-port here.
+Each meeting's URL carries an HMAC of its job id keyed by
+DEEPGRAM_CALLBACK_SECRET. Without that variable a random key is used for the
+life of the process, and callbacks for meetings submitted before a restart are
+refused; those meetings are resubmitted after CALLBACK_TIMEOUT_SECONDS.
+
+To test the round trip without Deepgram, run a local stand-in for its API and
+point the factory at it:
+
+    python webhook.py --stand-in --port 8767
+    $env:DEEPGRAM_BASE_URL = "http://127.0.0.1:8767"
+    python factory.py --url "..." --callback-url http://127.0.0.1:8766 --webhook-port 8766
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import requests
+
+import compacttranscript
+import deadair
+
+PENDING_FILE = "deepgram_pending.json"
+TRANSCRIPT_FILE = "deepgram_raw.json"
+CALLBACK_TIMEOUT_SECONDS = 3 * 3600  # resubmit if no callback arrives within this
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _callback_secret():
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            _secret = (os.environ.get("DEEPGRAM_CALLBACK_SECRET") or secrets.token_hex(32)).encode("utf-8")
+        return _secret
+
+
+def sign(job_id):
+    return hmac.new(_callback_secret(), job_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def callback_url(base_url, job_id):
+    """The URL Deepgram should POST job_id's transcript to."""
+    return f"{base_url.rstrip('/')}/{sign(job_id)}/{quote(job_id, safe='')}"
+
+
+# --- Pending submissions ---
+# A meeting awaiting its callback has a deepgram_pending.json next to where its
+# transcript will go: the request id, when it was submitted and, if the audio
+# was trimmed first, the trim map needed to put times back on the video's clock.
+
+def read_pending(folder):
+    path = os.path.join(folder, PENDING_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_pending(folder, pending):
+    path = os.path.join(folder, PENDING_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pending, f)
+    os.replace(tmp_path, path)
+
+
+def clear_pending(folder):
+    path = os.path.join(folder, PENDING_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class WebhookReceiver:
+    """
+    HTTP server that accepts Deepgram callbacks for meetings under wip_dir.
+
+    With a JobStore, the receiving stage is marked done as each transcript is
+    written and the stages in `invalidates` are marked stale, as run_stage does.
+    """
+
+    def __init__(self, wip_dir, port, host="127.0.0.1", store=None, stage="transcribe", invalidates=()):
+        self.wip_dir = wip_dir
+        self.port = port
+        self.host = host
+        self.store = store
+        self.stage = stage
+        self.invalidates = list(invalidates)
+        self.received = 0
+        self._server = None
+
+    def start(self):
+        receiver = self
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                status, message = receiver.handle(self.path, body)
+                reply = message.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), CallbackHandler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="webhook-receiver", daemon=True).start()
+        print(f"Deepgram callbacks received on http://{self.host}:{self.port}/")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, path, body):
+        """Process one callback; returns (HTTP status, message)."""
+        parts = urlsplit(path).path.rstrip("/").split("/")
+        if len(parts) < 2:
+            return 404, "unknown callback"
+        token, job_id = parts[-2], unquote(parts[-1])
+        if not hmac.compare_digest(token, sign(job_id)):
+            return 403, "bad signature"
+
+        folder = os.path.join(self.wip_dir, *job_id.split("/"))
+        transcript_path = os.path.join(folder, TRANSCRIPT_FILE)
+        pending = read_pending(folder)
+        if pending is None:
+            # Deepgram retries a callback it thinks failed; a second copy is harmless
+            if os.path.exists(transcript_path):
+                return 200, "already received"
+            return 410, "no transcription pending for this meeting"
+
+        try:
+            result = json.loads(body)
+        except ValueError:
+            return 400, "body is not JSON"
+        request_id = (result.get("metadata") or {}).get("request_id") or result.get("request_id")
+        if pending.get("request_id") and request_id and request_id != pending["request_id"]:
+            return 200, "stale request ignored"
+
+        if "results" not in result:
+            pending["error"] = result.get("err_msg") or result.get("error") or "callback without results"
+            write_pending(folder, pending)
+            print(f"  - Deepgram callback for {job_id} reported an error: {pending['error']}")
+            return 200, "error recorded"
+
+        if pending.get("trim_map"):
+            deadair.remap_times(result, pending["trim_map"])
+        tmp_path = f"{transcript_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(result))
+        os.replace(tmp_path, transcript_path)
+        compacttranscript.convert(result, os.path.join(folder, compacttranscript.COMPACT_FILE), transcript_path)
+        if pending.get("upload_path") and os.path.exists(pending["upload_path"]):
+            os.remove(pending["upload_path"])  # the trimmed copy sent instead of the audio
+        if self.store is not None:
+            self.store.finish_stage(job_id, self.stage, transcript_path, started_at=pending.get("submitted_at"))
+            self.store.invalidate_stages(job_id, self.invalidates)
+        clear_pending(folder)
+        self.received += 1
+        print(f"  - Deepgram callback received for {job_id}")
+        return 200, "ok"
+
+
+# --- Local stand-in for Deepgram, for end-to-end tests ---
+
+SAMPLE_RESULT = {
+    "metadata": {"request_id": None, "duration": 4.0, "channels": 1},
+    "results": {
+        "channels": [{
+            "alternatives": [{
+                "transcript": "The meeting will come to order.",
+                "confidence": 0.99,
+                "words": [
+                    {"word": w, "punctuated_word": p, "start": s, "end": s + 0.4, "confidence": 0.99, "speaker": 0}
+                    for w, p, s in [
+                        ("the", "The", 0.5), ("meeting", "meeting", 1.0), ("will", "will", 1.5),
+                        ("come", "come", 2.0), ("to", "to", 2.5), ("order", "order.", 3.0),
+                    ]
+                ],
+                "paragraphs": {
+                    "transcript": "\nSpeaker 0: The meeting will come to order.\n",
+                    "paragraphs": [{
+                        "speaker": 0, "start": 0.5, "end": 3.4, "num_words": 6,
+                        "sentences": [{"text": "The meeting will come to order.", "start": 0.5, "end": 3.4}],
+                    }],
+                },
+            }],
+        }],
+        "utterances": [{
+            "start": 0.5, "end": 3.4, "confidence": 0.99, "channel": 0, "speaker": 0,
+            "transcript": "The meeting will come to order.", "id": "00000000-0000-0000-0000-000000000000",
+        }],
+    },
+}
+
+
+class StandInDeepgram:
+    """
+    Imitates Deepgram's pre-recorded /v1/listen endpoint: reads the upload,
+    then either returns `result` directly or, if a callback URL was given,
+    answers with a request id and POSTs `result` to the callback after `delay` seconds.
+    """
+
+    def __init__(self, port=0, result=None, delay=1.0, host="127.0.0.1"):
+        self.port = port
+        self.host = host
+        self.result = result or SAMPLE_RESULT
+        self.delay = delay
+        self.requests = []
+        self._server = None
+
+    def _respond(self, request_id, callback):
+        time.sleep(self.delay)
+        result = json.loads(json.dumps(self.result))
+        result.setdefault("metadata", {})["request_id"] = request_id
+        response = requests.post(callback, json=result, timeout=30)
+        print(f"[stand-in] Posted {request_id} to {callback}: {response.status_code}")
+
+    def start(self):
+        stand_in = self
+
+        class ListenHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                remaining = int(self.headers.get("Content-Length") or 0)
+                received = 0
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    remaining -= len(chunk)
+                query = parse_qs(urlsplit(self.path).query)
+                callback = query.get("callback", [None])[0]
+                request_id = str(uuid.uuid4())
+                stand_in.requests.append({"request_id": request_id, "bytes": received, "callback": callback})
+                if callback:
+                    reply = {"request_id": request_id}
+                    threading.Thread(target=stand_in._respond, args=(request_id, callback), daemon=True).start()
+                else:
+                    reply = json.loads(json.dumps(stand_in.result))
+                    reply.setdefault("metadata", {})["request_id"] = request_id
+                body = json.dumps(reply).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), ListenHandler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="deepgram-stand-in", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deepgram callback receiver, or a local stand-in for Deepgram.")
+    parser.add_argument("--stand-in", action="store_true", help="Run the Deepgram stand-in instead of the receiver.")
+    parser.add_argument("--port", type=int, default=8766, help="Port to listen on (localhost).")
+    parser.add_argument("--wip", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "wip"), help="WIP folder callbacks are written under.")
+    parser.add_argument("--result", help="With --stand-in: Deepgram JSON file to return instead of a built-in sample.")
+    parser.add_argument("--delay", type=float, default=1.0, help="With --stand-in: seconds before the callback is posted.")
+    args = parser.parse_args()
+
+    if args.stand_in:
+        result = None
+        if args.result:
+            with open(args.result, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        server = StandInDeepgram(args.port, result, args.delay).start()
+        print(f"Deepgram stand-in listening on {server.url} (set DEEPGRAM_BASE_URL to this)")
+    else:
+        server = WebhookReceiver(args.wip, args.port).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()